@@ -26,12 +26,17 @@ from . import cllinecache  # noqa: F401
 from . import irafnames  # noqa: F401
 from . import irafexecute  # noqa: F401
 from . import clcache
+from . import irafpar
 
 
 # set up exit handler to close caches
 def _cleanup():
     if iraf:
         iraf.gflush()
+        irafpar.parWriter.flush()
+    if hasattr(irafexecute, 'taskExecutor'):
+        # do not wait for submitted tasks at exit
+        irafexecute.taskExecutor.shutdown(wait=False, cancel_futures=True)
     if hasattr(irafexecute, 'processCache'):
         del irafexecute.processCache
     if hasattr(clcache, 'codeCache'):
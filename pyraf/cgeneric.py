@@ -34,23 +34,15 @@ class ContextSensitiveScanner:
         if start is None:
             start = self.start
         self.current = [start]
+        scanners = self.scanners
         iend = 0
         slen = len(s)
         while iend < slen:
             if not self.current:
                 self.current = [start]
-            scanner = self.scanners[self.current[-1]]
+            scanner = scanners[self.current[-1]]
             m = scanner.re.match(s, iend)
             assert m
-            groups = m.groups()
-            for i in scanner.indexlist:
-                if groups[i] is not None:
-                    scanner.index2func[i](groups[i], m, self)
-                    # assume there is only a single match
-                    break
-            else:
-                print('cgeneric: No group found in match?')
-                print('Returning match object for debug')
-                self.rv = m
-                return
+            # m.lastgroup is the primary pattern that matched
+            scanner.group2func[m.lastgroup](m.group(), m, self)
             iend = m.end()
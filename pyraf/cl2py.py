@@ -4,9 +4,12 @@ R. White, 1999 December 20
 """
 
 
+import importlib.util
 import io
+import marshal
 import os
 import sys
+import types
 
 from .generic import GenericASTTraversal
 from .clast import AST
@@ -153,8 +156,9 @@ def cl2py(filename=None,
     # attach tokens to the code object too
     pycode = Pycode(tree2python)
 
-    # add to cache
+    # add to cache, together with the compiled code
     if index is not None:
+        pycode.compile()
         codeCache.add(index, pycode)
     pycode.index = index
     if Verbose > 1:
@@ -184,12 +188,52 @@ class Container:
     pass
 
 
+def getCodeObject(pycode, scriptname):
+    """Return executable code object for pycode
+
+    The code object is compiled only if pycode does not have one for the
+    running Python version yet; in that case the cache entry is updated
+    so that the next session can use it directly.
+    """
+    codeObject = pycode.getCodeObject(scriptname)
+    if codeObject is None:
+        codeObject = pycode.compile(scriptname)
+        if pycode.index is not None:
+            codeCache.add(pycode.index, pycode)
+    return codeObject
+
+
+def _renameCode(codeObject, filename):
+    """Return copy of code object (and nested code) with new filename"""
+    consts = tuple(
+        _renameCode(c, filename) if isinstance(c, types.CodeType) else c
+        for c in codeObject.co_consts)
+    if hasattr(codeObject, 'replace'):
+        return codeObject.replace(co_filename=filename, co_consts=consts)
+    # Python < 3.8
+    c = codeObject
+    return types.CodeType(c.co_argcount, c.co_kwonlyargcount, c.co_nlocals,
+                          c.co_stacksize, c.co_flags, c.co_code, consts,
+                          c.co_names, c.co_varnames, filename, c.co_name,
+                          c.co_firstlineno, c.co_lnotab, c.co_freevars,
+                          c.co_cellvars)
+
+
 class Pycode:
-    """Container for Python CL translation"""
+    """Container for Python CL translation
+
+    Besides the Python source, the compiled code is kept in marshal format
+    for every Python version (bytecode magic number) that used it, so a
+    cached Pycode need not be compiled again.
+    """
+
+    # placeholder filename used when compiling outside a task
+    DFT_SCRIPTNAME = '<CL script>'
 
     def __init__(self, tree2python):
 
         self.code = tree2python.code
+        self.marshalled = {}
         self.vars = Container()
         self.vars.local_vars_dict = tree2python.vars.local_vars_dict
         self.vars.local_vars_list = tree2python.vars.local_vars_list
@@ -204,8 +248,40 @@ class Pycode:
         object created from some other file and attach it to the current file.
         """
 
+        self.filename = filename
         self.vars.parList.setFilename(filename)
 
+    def __getstate__(self):
+        # the file is attached after loading from the cache
+        state = self.__dict__.copy()
+        state.pop('filename', None)
+        return state
+
+    def compile(self, scriptname=DFT_SCRIPTNAME):
+        """Compile the code and keep the marshalled code object"""
+        # force compile to inherit future div. so we don't rely on 2.x div.
+        codeObject = compile(self.code, scriptname, 'exec', 0, 0)
+        if getattr(self, 'marshalled', None) is None:
+            self.marshalled = {}
+        self.marshalled[importlib.util.MAGIC_NUMBER] = \
+            marshal.dumps(codeObject)
+        return codeObject
+
+    def getCodeObject(self, scriptname):
+        """Return marshalled code object for this Python version or None"""
+        # Pycode objects pickled by older versions have no marshalled code
+        data = getattr(self, 'marshalled', {}).get(
+            importlib.util.MAGIC_NUMBER)
+        if data is None:
+            return None
+        try:
+            codeObject = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+        if codeObject.co_filename != scriptname:
+            codeObject = _renameCode(codeObject, scriptname)
+        return codeObject
+
 
 def _checkVars(vars, parlist, parfile):
     """Check variable list for consistency with the given parlist"""
@@ -1500,14 +1576,96 @@ class CheckArgList(GenericASTTraversal, ErrorTracker):
                        f"in call to {self.taskname[-1]}", self.tasknode[-1])
 
 
+# local variable types that can be kept as native Python values
+
+_nativeTypes = ('int', 'real', 'bool')
+
+_scanFunctions = ("scan", "fscan", "scanf", "fscanf")
+
+
+def _identNames(node):
+    """Return translated names of all variables referenced in node"""
+    if isinstance(node, Token):
+        if node.type == "IDENT":
+            return [irafutils.translateName(node.attr).split('.')[0]]
+        return []
+    names = []
+    for kid in node:
+        names.extend(_identNames(kid))
+    return names
+
+
+def _argNodes(node):
+    """Return the argument nodes of a task or function argument list"""
+    if isinstance(node, Token):
+        return []
+    if node.type in ("non_empty_arg", "empty_arg"):
+        return [node]
+    args = []
+    for kid in node:
+        args.extend(_argNodes(kid))
+    return args
+
+
+class NativeLocals(GenericASTTraversal):
+    """Find local variables that can be kept as Python local variables
+
+    Reading and setting a variable through the Vars parameter list is
+    slow (minimum match lookup, type coercion and range checks on every
+    access).  Scalar int, real and bool local variables with an initial
+    value and without range or choice constraints are translated to
+    Python variables instead, except where the CL semantics need the
+    parameter object: variables passed by name to the scan functions and
+    references to parameter fields (x.p_value etc.)  Such variables stay
+    in Vars, and so do variables without an initial value, so that
+    reading them before an assignment raises the CL error.
+    """
+
+    def __init__(self, ast, vars):
+        GenericASTTraversal.__init__(self, ast)
+        self.names = set()
+        for name in vars.local_vars_list[vars.local_vars_count:]:
+            v = vars.local_vars_dict[name]
+            if (v.type in _nativeTypes and v.shape is None and
+                    not v.list_flag and name not in vars.proc_args_dict and
+                    v.init_value is not None and
+                    v.options["min"] is None and
+                    v.options["max"] is None and
+                    v.options["enum"] is None):
+                self.names.add(name)
+        if self.names:
+            self.preorder()
+
+    def n_IDENT(self, node):
+        s = irafutils.translateName(node.attr)
+        if '.' in s:
+            # field reference needs the parameter object
+            self.names.discard(s.split('.')[0])
+
+    def n_function_call(self, node):
+        if node[0].attr in _scanFunctions:
+            self.names.difference_update(_identNames(node[2]))
+
+    def n_task_call_stmt(self, node):
+        if node[0].attr in _scanFunctions:
+            self.names.difference_update(_identNames(node[1]))
+
+
 class Tree2Python(GenericASTTraversal, ErrorTracker):
 
-    def __init__(self, ast, vars, filename='', taskObj=None):
+    def __init__(self, ast, vars, filename='', taskObj=None, native=None):
         self._ecl_iferr_entered = 0
         GenericASTTraversal.__init__(self, ast)
         self.filename = filename
         self.column = 0
         self.vars = vars
+        # local variables translated to Python variables (see NativeLocals)
+        if native is None:
+            native = pyrafglobals._native_locals
+        if native and vars.mode != "single":
+            self.native = NativeLocals(ast, vars).names
+        else:
+            self.native = set()
         self.inSwitch = 0
         self.caseCount = []
         # printPass is an array of flags indicating whether the
@@ -1522,6 +1680,8 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
         self.pipeOut = []
         self.pipeIn = []
         self.pipeCount = 0
+        # variable names set by specialized scan calls (see scanTargets)
+        self.scanList = []
         # These three are used only by n_while_stmt, n_for_stmt, n_next_stmt,
         # and decrIndent; they are for incrementing the loop variable before
         # writing "continue" in a "for" loop (but not in a "while" loop).
@@ -1667,8 +1827,12 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
 
         if not noHdr:
             self.write("from pyraf import iraf")
-            self.writeIndent(
-                "from pyraf.irafpar import makeIrafPar, IrafParList")
+            if self.native:
+                self.writeIndent("from pyraf.irafpar import makeIrafPar, "
+                                 "IrafParList, coerceLocal")
+            else:
+                self.writeIndent(
+                    "from pyraf.irafpar import makeIrafPar, IrafParList")
             self.writeIndent("from pyraf.tools.irafglobals import *")
             self.writeIndent("from pyraf.pyrafglobals import *")
             self.write("\n")
@@ -1724,6 +1888,8 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
         # add local variables to deflist
         for p in self.vars.local_vars_list[self.vars.local_vars_count:]:
             v = self.vars.local_vars_dict[p]
+            if p in self.native:
+                continue
             try:
                 deflist.append(v.parDefLine(local=1))
             except AttributeError as e:
@@ -1741,6 +1907,22 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
                     self.write("))")
             self.write("\n")
 
+        # initialize native local variables (all have an initial value)
+        if self.native:
+            for p in self.vars.local_vars_list[self.vars.local_vars_count:]:
+                v = self.vars.local_vars_dict[p]
+                if p in self.native:
+                    self.writeIndent(f"Vars_{p} = coerceLocal("
+                                     f"{v.init_value!r}, {v.type!r})")
+            self.write("\n")
+
+        # parameters set by specialized scan calls
+        for i, names in enumerate(self.scanList):
+            self.writeIndent(f"Scan{i + 1} = iraf.ScanTargets(Vars, "
+                             f"{tuple(names)!r})")
+        if self.scanList:
+            self.write("\n")
+
         if pyrafglobals._use_ecl:
             self.writeIndent("from pyraf.irafecl import EclState")
             self.writeIndent(
@@ -1833,7 +2015,9 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
 
     def n_IDENT(self, node, array_ref=0):
         s = irafutils.translateName(node.attr)
-        if s in self.vars and s not in _SpecialArgs:
+        if s in self.native:
+            self.write('Vars_' + s, node.requireType, node.exprType)
+        elif s in self.vars and s not in _SpecialArgs:
 
             # Prepend 'Vars.' to all procedure and local variable references
             # except for special args, which are normal Python variables.
@@ -1930,21 +2114,75 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
         if newname is None:
             # just add "iraf." prefix
             newname = "iraf." + functionname
-        self.write(newname + "(")
         # argument list for scan statement
         sargs = self.captureArgs(node[2])
-        if functionname in ["scan", "fscan", "scanf", "fscanf"]:
+        if functionname in _scanFunctions:
             # scan is weird -- effectively uses call-by-name
             # call special routine to change the args
-            sargs = self.modify_scan_args(functionname, sargs)
+            newname, sargs = self.modify_scan_args(functionname, sargs,
+                                                   newname, node[2])
+        self.write(newname + "(")
         self.writeChunks(sargs)
         self.write(")")
         if cf:
             self.write(")")
         self.prune()
 
-    def modify_scan_args(self, functionname, sargs):
-        # modify argument list for scan statement
+    def scanTargets(self, functionname, argnode):
+        """Return names of the variables set by a scan or fscan call
+
+        Returns None unless all of them are procedure parameters or
+        local variables in Vars, which are set by the specialized
+        iraf.scanPars/fscanPars functions.
+        """
+        if functionname not in ("scan", "fscan") or \
+                self.vars.mode == "single":
+            return None
+        args = _argNodes(argnode)
+        if functionname == "fscan":
+            # first argument is the line to read from
+            if not args or args[0].type != "non_empty_arg" or \
+                    args[0][0].type in ("redir_arg", "keyword_arg",
+                                        "bool_arg"):
+                return None
+            args = args[1:]
+        names = []
+        for arg in args:
+            if arg.type != "non_empty_arg":
+                return None
+            ident = arg[0]
+            if ident.type == "redir_arg":
+                continue
+            if ident.type == "atom" and len(ident) == 3:
+                # parenthesized single argument
+                ident = ident[1]
+            if ident.type != "IDENT":
+                return None
+            s = irafutils.translateName(ident.attr)
+            if '.' in s or s not in self.vars or s in _SpecialArgs or \
+                    s in self.native:
+                return None
+            names.append(s)
+        return names
+
+    def modify_scan_args(self, functionname, sargs, newname, argnode):
+        # modify argument list and function name for scan statement
+        # returns new function name and argument list
+
+        # Scans setting only procedure variables get specialized code:
+        # fscanPars(ScanN, lambda: line), scanPars(ScanN, redirections)
+        names = self.scanTargets(functionname, argnode)
+        args = _argNodes(argnode)
+        if names is not None and len(args) == len(sargs):
+            self.scanList.append(names)
+            scanname = f"Scan{len(self.scanList)}"
+            if functionname == "fscan":
+                return "iraf.fscanPars", [scanname, "lambda: " + sargs[0]]
+            redir = [
+                sarg for sarg, arg in zip(sargs, args)
+                if arg[0].type == "redir_arg"
+            ]
+            return "iraf.scanPars", [scanname] + redir
 
         # If fscan, first argument is the string to read from.
         # But we still want to pass it by name because if the
@@ -1958,7 +2196,7 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
 
         # pass in locals dictionary so we can get names of variables to set
         sargs.insert(0, "locals()")
-        return sargs
+        return newname, sargs
 
     def default(self, node):
         """Handle other tokens"""
@@ -2056,8 +2294,56 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
         self.write("iraf.clOscmd(" + repr(node[0].attr) + ")")
         self.prune()
 
+    def _isNativeInt(self, node):
+        """Check whether expression is an int computed from native ints
+
+        Such values need no coercion when assigned to an int variable.
+        """
+        if isinstance(node, Token):
+            if node.type == "INTEGER":
+                return True
+            if node.type != "IDENT":
+                return False
+            s = irafutils.translateName(node.attr)
+            return s in self.native and self.vars.get(s).type == 'int'
+        if node.type in ("atom", "factor"):
+            # parenthesized expression or unary sign
+            return self._isNativeInt(node[1])
+        if node.type in ("arith_expr", "term") and len(node) == 3:
+            op = node[1]
+            return ((op.type in ("+", "-", "*", "%") or
+                     getattr(op, 'trunc_int_div', False)) and
+                    self._isNativeInt(node[0]) and self._isNativeInt(node[2]))
+        return False
+
     def n_assignment_stmt(self, node):
-        if node[1].type == "ASSIGNOP":
+        s = None
+        if node[0].type == "IDENT":
+            s = irafutils.translateName(node[0].attr)
+        if s in self.native:
+            # assignment to native local variable: do the type conversion
+            # of the parameter object unless the result is an int anyway
+            var = self.vars.get(s)
+            if node[1].type == "ASSIGNOP":
+                op = node[1].attr[0]
+                coerce = not (var.type == 'int' and op in "+-*" and
+                              self._isNativeInt(node[2]))
+            else:
+                op = None
+                coerce = not (var.type == 'int' and
+                              self._isNativeInt(node[2]))
+            self.preorder(node[0])
+            self.write(" = ")
+            if coerce:
+                self.write("coerceLocal(")
+            if op:
+                self.preorder(node[0])
+                self.write(" " + op + " ")
+            self.preorder(node[2])
+            if coerce:
+                self.write(f", {var.type!r})")
+            self.prune()
+        elif node[1].type == "ASSIGNOP":
             # convert +=, -=, etc.
             self.preorder(node[0])
             self.write(" = ")
@@ -2273,6 +2559,7 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
 
     # ------------------------------
     # pipes implemented using redirection + task return values
+    # (a list of lines or a StreamPipe, see iraffunctions.setPipeMode)
     # ------------------------------
 
     def n_task_pipe_stmt(self, node):
@@ -2308,8 +2595,9 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
             # read from existing input line list
             self.additionalArguments.append("Stdin=" + self.pipeIn[-1])
         if self.pipeOut:
+            # iraf.PIPE acts like Stdout=1 unless the pipe is streamed
             self.write(self.pipeOut[-1] + " = ")
-            self.additionalArguments.append("Stdout=1")
+            self.additionalArguments.append("Stdout=iraf.PIPE")
         # add extra arguments for task, package commands
         newname = _taskList.get(taskname, taskname)
         newname = "iraf." + irafutils.translateName(newname)
@@ -2330,7 +2618,11 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
         # add extra argument to save parameters if in "single" mode
         if self.vars.mode == "single":
             self.additionalArguments.append("_save=1")
-        self.write(newname)
+        if self.currentTaskname in _scanFunctions:
+            # n_task_arglist writes the name (the function may change)
+            self.scanName = newname
+        else:
+            self.write(newname)
         self.preorder(node[1])
 
         if self.pipeIn:
@@ -2382,10 +2674,13 @@ class Tree2Python(GenericASTTraversal, ErrorTracker):
             if s[:1] == "(" and s[-1:] == ")":
                 sargs[0] = s[1:-1]
 
-        if self.currentTaskname in ["scan", "fscan", "scanf", "fscanf"]:
+        if self.currentTaskname in _scanFunctions:
             # scan is weird -- effectively uses call-by-name
             # call special routine to change the args
-            sargs = self.modify_scan_args(self.currentTaskname, sargs)
+            newname, sargs = self.modify_scan_args(self.currentTaskname,
+                                                   sargs, self.scanName,
+                                                   node[i])
+            self.write(newname)
 
         # combine CL arguments with additional (redirection) arguments
         sargs = sargs + self.additionalArguments
@@ -2,9 +2,12 @@
 
 R. White, 2000 January 19
 """
+import copy
 import os
 import sys
 import hashlib
+import pickle
+import time
 
 from .tools.irafglobals import Verbose, userIrafHome
 
@@ -29,6 +32,9 @@ else:
             print(f'Could not create directory {userCacheDir}')
     clcache_path = [userCacheDir, pyrafglobals.pyrafDir]
 
+# WAL journaling does not work on network filesystems
+clcache_wal = os.environ.get('PYRAF_CLCACHE_WAL', 'yes') != 'no'
+
 
 # Code cache is implemented using a dictionary clFileDict and
 # a list of persistent dictionaries (shelves) in cacheList.
@@ -49,9 +55,26 @@ else:
 
 def _currentVersion():
     v = "4e" if pyrafglobals._use_ecl else "4c"
+    if pyrafglobals._native_locals:
+        v = v + "n"
     return v + str(sqliteshelve.pickle_protocol)
 
 
+def _parVersion():
+    """Version of cached parameter lists (read from .par files)"""
+    return "p" + str(sqliteshelve.pickle_protocol)
+
+
+def _knownVersions():
+    """Versions of cached code usable by this PyRAF (with CL or ECL)"""
+    return {v + str(sqliteshelve.pickle_protocol)
+            for v in ("4c", "4e", "4cn", "4en", "p")}
+
+
+# length of the md5 digest in the cache keys, followed by the version
+_DIGEST_LENGTH = 32
+
+
 class _FileContentsCache(filecache.FileCacheDict):
 
     def __init__(self):
@@ -62,10 +85,10 @@ class _FileContentsCache(filecache.FileCacheDict):
 class _CodeCache:
     """Python code cache class
 
-    Note that old out-of-date cached code never gets
-    removed in this system.  That's because another CL
-    script might still exist with the same code.  Need a
-    utility to clean up the cache by looking for unused keys...
+    Note that old out-of-date cached code is not removed automatically,
+    since another CL script might still exist with the same code.  Use
+    clean (or python -m pyraf.clean_clcache) to evict entries that have
+    not been used for a long time.
     """
 
     def __init__(self, cacheFileList):
@@ -76,7 +99,8 @@ class _CodeCache:
         if cacheFileList:
             try:
                 fname = cacheFileList[0]
-                self.writeCache = sqliteshelve.open(fname, 'w')
+                self.writeCache = sqliteshelve.open(fname, 'w',
+                                                    wal=clcache_wal)
                 self.cacheList.append(self.writeCache)
                 self.cacheFileList.append(fname)
                 cacheFileList = cacheFileList[1:]
@@ -100,6 +124,8 @@ class _CodeCache:
                              f"{fname} for reading", 1)
 
         self.clFileDict = _FileContentsCache()
+        self.hits = 0
+        self.misses = 0
 
     def warning(self, msg, level=0):
         """Print warning message to stderr, using verbose flag"""
@@ -112,6 +138,14 @@ class _CodeCache:
     def close(self):
         """Close all cache files"""
 
+        if self.hits or self.misses:
+            # keep the hit ratio in the database for report
+            try:
+                self.writeCache.addCounters({'hits': self.hits,
+                                             'misses': self.misses})
+            except (AttributeError, OSError, sqliteshelve.sqlite3.Error):
+                pass
+            self.hits = self.misses = 0
         for cache in self.cacheList:
             try:
                 cache.close()
@@ -144,6 +178,62 @@ class _CodeCache:
         if index is not None and self.writeCache is not None:
             self.writeCache[index] = pycode
 
+    def update(self, items):
+        """Add many pycode objects (dictionary index: pycode) to the cache
+
+        A database cache writes them all in a single transaction.
+        """
+        if items and self.writeCache is not None:
+            self.writeCache.update(items)
+
+    def getParIndex(self, filename):
+        """Get cache key and stamp for the parameter list of a .par file
+
+        The key depends on the path of the file only, so a changed file
+        replaces the entry of its old version.  The stamp (size and
+        modification time of the file) is cached with the parameter
+        list and must match when the list is read.  Raises OSError if
+        the file does not exist.
+        """
+        filename = os.path.abspath(filename)
+        st = os.stat(filename)
+        h = hashlib.md5()
+        h.update(f"par\0{filename}".encode())
+        return h.hexdigest() + _parVersion(), (st.st_size, st.st_mtime_ns)
+
+    def getPars(self, index):
+        """Get a new copy of a cached parameter list (None if not found)"""
+        for cache in self.cacheList:
+            data = cache.get(index)
+            if data is not None:
+                # lists are kept pickled since the shelves hand out the
+                # same object for repeated gets
+                return pickle.loads(data)
+        return None
+
+    def addPars(self, index, pars):
+        """Add parameter list to cache with key = index"""
+        protocol = sqliteshelve.pickle_protocol
+        self.add(index, pickle.dumps(pars, protocol=protocol))
+
+    def _getParDirKey(self, dirname):
+        """Get cache key for the index of the .par files in a directory"""
+        h = hashlib.md5()
+        h.update(f"dir\0{os.path.abspath(dirname)}".encode())
+        return h.hexdigest() + _parVersion()
+
+    def getParDir(self, dirname):
+        """Get the cached index of the .par files in dirname (or None)"""
+        return self.getPars(self._getParDirKey(dirname))
+
+    def addParDir(self, dirname, index):
+        """Add the index of the .par files in dirname to the cache"""
+        self.addPars(self._getParDirKey(dirname), index)
+
+    def __contains__(self, index):
+        """True if index is in any of the caches"""
+        return any(index in cache for cache in self.cacheList)
+
     def get(self, filename, mode="proc", source=None):
         """Get pycode from cache for this file.
 
@@ -160,14 +250,92 @@ class _CodeCache:
             return None, None
 
         for cache in self.cacheList:
-            if index in cache:
-                pycode = cache[index]
+            pycode = cache.get(index)
+            if pycode is not None:
+                # the shelves hand out the same object for repeated gets;
+                # don't steal it from a file with the same contents
+                if getattr(pycode, 'filename', filename) != filename:
+                    pycode = copy.deepcopy(pycode)
                 pycode.index = index
                 pycode.setFilename(filename)
+                self.hits += 1
                 return index, pycode
         else:
+            self.misses += 1
             return index, None
 
+    def clean(self, maxAge=None, maxSize=None, vacuum=True):
+        """Evict entries from the writable cache
+
+        Removes entries for other versions of PyRAF, entries not used for
+        more than maxAge days, and then the least recently used entries
+        until the total size is at most maxSize bytes.  The database file
+        is vacuumed afterwards.  Returns a tuple (number of entries
+        removed, bytes freed).
+        """
+        if not isinstance(self.writeCache, sqliteshelve.Shelf):
+            return 0, 0
+        entries = self.writeCache.entries()
+        versions = _knownVersions()
+        evict = []
+        keep = []
+        for key, size, atime in entries:
+            if key[_DIGEST_LENGTH:] not in versions:
+                evict.append((key, size))
+            else:
+                keep.append((atime or 0, key, size or 0))
+        if maxAge is not None:
+            tmin = time.time() - maxAge * 86400
+            evict.extend((key, size) for atime, key, size in keep
+                         if atime < tmin)
+            keep = [k for k in keep if k[0] >= tmin]
+        if maxSize is not None:
+            keep.sort()
+            total = sum(size for atime, key, size in keep)
+            for atime, key, size in keep:
+                if total <= maxSize:
+                    break
+                evict.append((key, size))
+                total -= size
+        self.writeCache.evict(key for key, size in evict)
+        if vacuum:
+            self.writeCache.vacuum()
+        return len(evict), sum(size or 0 for key, size in evict)
+
+    def report(self):
+        """Print size, version and hit ratio report for the writable cache"""
+        fname = self.cacheFileList[0]
+        if not isinstance(self.writeCache, sqliteshelve.Shelf):
+            print(f"{fname}: no database")
+            return
+        entries = self.writeCache.entries()
+        versions = {}
+        for key, size, atime in entries:
+            version = key[_DIGEST_LENGTH:]
+            nentries, nbytes = versions.get(version, (0, 0))
+            versions[version] = (nentries + 1, nbytes + (size or 0))
+        try:
+            fsize = os.path.getsize(fname + '.sqlite3')
+        except OSError:
+            fsize = 0
+        print(f"{fname}: {len(entries)} entries, "
+              f"{fsize / 2**20:.1f} MB on disk")
+        for version, (nentries, nbytes) in sorted(versions.items()):
+            flag = "" if version in _knownVersions() else " (obsolete)"
+            print(f"  version {version}: {nentries} entries, "
+                  f"{nbytes / 2**20:.1f} MB{flag}")
+        atimes = [atime for key, size, atime in entries if atime]
+        if atimes:
+            age = (time.time() - min(atimes)) / 86400
+            print(f"  least recently used entry: {age:.0f} days ago")
+        counters = self.writeCache.counters()
+        counters['hits'] = counters.get('hits', 0) + self.hits
+        counters['misses'] = counters.get('misses', 0) + self.misses
+        ntotal = counters['hits'] + counters['misses']
+        if ntotal:
+            print(f"  {counters['hits']} hits, {counters['misses']} misses "
+                  f"({100.0 * counters['hits'] / ntotal:.0f}% hit ratio)")
+
     def remove(self, filename):
         """Remove pycode from cache for this file or IrafTask object.
 
@@ -0,0 +1,62 @@
+"""clean_clcache.py: Evict old entries from the CL script cache
+
+Entries for other PyRAF versions are always removed; entries can also
+be evicted by age (days since last use) and to fit a size budget.
+A report with the cache size and hit ratio is printed afterwards.
+
+Usage: python -m pyraf.clean_clcache [--max-age days] [--max-size MB]
+           [--no-vacuum] [--report] [--system | cachefile]
+"""
+import argparse
+import os
+
+from . import clcache
+
+
+def clean_clcache(cachefile=None, max_age=None, max_size=None,
+                  vacuum=True, report_only=False):
+    """Clean a CL script cache (default: the user cache) and report on it
+
+    max_age is in days, max_size in bytes.
+    """
+    if cachefile is None:
+        cachefile = os.path.join(clcache.clcache_path[0], 'clcache')
+    codeCache = clcache._CodeCache([cachefile])
+    try:
+        if not report_only:
+            nentries, nbytes = codeCache.clean(maxAge=max_age,
+                                               maxSize=max_size,
+                                               vacuum=vacuum)
+            print(f"Removed {nentries} entries ({nbytes / 2**20:.1f} MB)")
+        codeCache.report()
+    finally:
+        codeCache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evict old entries from the CL script cache")
+    parser.add_argument('--max-age', type=float, default=None,
+                        help="remove entries not used for this many days")
+    parser.add_argument('--max-size', type=float, default=None,
+                        help="remove least recently used entries to keep "
+                        "the cache below this many MB")
+    parser.add_argument('--no-vacuum', action='store_true',
+                        help="do not compact the database file")
+    parser.add_argument('--report', action='store_true',
+                        help="only report on the cache contents")
+    parser.add_argument('--system', action='store_true',
+                        help="clean the system cache")
+    parser.add_argument('cachefile', nargs='?', default=None,
+                        help="cache database (without .sqlite3 extension)")
+    args = parser.parse_args()
+    cachefile = args.cachefile
+    if args.system:
+        cachefile = os.path.join(clcache.clcache_path[-1], 'clcache')
+    max_size = args.max_size * 2**20 if args.max_size is not None else None
+    clean_clcache(cachefile, max_age=args.max_age, max_size=max_size,
+                  vacuum=not args.no_vacuum, report_only=args.report)
+
+
+if __name__ == '__main__':
+    main()
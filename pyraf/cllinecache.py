@@ -82,6 +82,9 @@ def updateCLscript(filename):
         taskname = filename[11:-1]
         taskobj = iraf.getTask(taskname)
         fullname = taskobj.getFullpath()
+        if fullname is None:
+            # task defined from a string, no file to check
+            return []
         stat = os.stat(fullname)
         size = stat[ST_SIZE]
         mtime = stat[ST_MTIME]
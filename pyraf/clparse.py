@@ -8,6 +8,50 @@ from .generic import GenericASTBuilder, GenericASTTraversal
 from .clast import AST
 from .cltoken import Token
 
+# list of tokens that should not be flattened by nonterminal()
+_primaryTypes = (
+    'proc_stmt',
+    'param_declaration_block',
+    'declaration_stmt',
+    'declaration_block',
+    'var_name',
+    'decl_init_list',
+    'decl_init_value',
+    'decl_array_dims',
+    'array_subscript',
+    'list_flag',
+    'body_block',
+    'statement_block',
+    'nonnull_stmt',
+    'osescape_stmt',
+    'assignment_stmt',
+    'task_call_stmt',
+    'if_stmt',
+    'for_stmt',
+    'while_stmt',
+    'break_stmt',
+    'next_stmt',
+    'return_stmt',
+    'goto_stmt',
+    'label_stmt',
+    'switch_stmt',
+    'case_block',
+    'case_stmt_block',
+    'case_value',
+    'compound_stmt',
+    'empty_compound_stmt',
+    'task_arglist',
+    'comma_arglist',
+    'fn_arglist',
+    'arg',
+    'empty_arg',
+    'non_empty_arg',
+    'no_arg',
+    'param_name',
+    'opt_comma',
+    'bool_expr',
+)
+
 
 class CLStrictParser(GenericASTBuilder):
     """Strict version of CL parser (flags some program errors that CL accepts)
@@ -19,49 +63,7 @@ class CLStrictParser(GenericASTBuilder):
 
     def __init__(self, AST, start='program'):
         GenericASTBuilder.__init__(self, AST, start)
-        # list of tokens that should not be flattened by nonterminal()
-        self.primaryTypes = {
-            'proc_stmt': 1,
-            'param_declaration_block': 1,
-            'declaration_stmt': 1,
-            'declaration_block': 1,
-            'var_name': 1,
-            'decl_init_list': 1,
-            'decl_init_value': 1,
-            'decl_array_dims': 1,
-            'array_subscript': 1,
-            'list_flag': 1,
-            'body_block': 1,
-            'statement_block': 1,
-            'nonnull_stmt': 1,
-            'osescape_stmt': 1,
-            'assignment_stmt': 1,
-            'task_call_stmt': 1,
-            'if_stmt': 1,
-            'for_stmt': 1,
-            'while_stmt': 1,
-            'break_stmt': 1,
-            'next_stmt': 1,
-            'return_stmt': 1,
-            'goto_stmt': 1,
-            'label_stmt': 1,
-            'switch_stmt': 1,
-            'case_block': 1,
-            'case_stmt_block': 1,
-            'case_value': 1,
-            'compound_stmt': 1,
-            'empty_compound_stmt': 1,
-            'task_arglist': 1,
-            'comma_arglist': 1,
-            'fn_arglist': 1,
-            'arg': 1,
-            'empty_arg': 1,
-            'non_empty_arg': 1,
-            'no_arg': 1,
-            'param_name': 1,
-            'opt_comma': 1,
-            'bool_expr': 1,
-        }
+        self.primaryTypes = dict.fromkeys(_primaryTypes, 1)
         self._currentFname = None
 
     def parse(self, tokens, fname=None):
@@ -373,6 +375,696 @@ class EclParser(CLParser):
         pass
 
 
+#
+# Deterministic parser
+#
+
+
+class _NoParse(Exception):
+    """Input not handled by CLDescentParser"""
+
+
+_NUMBER = frozenset(['INTEGER', 'FLOAT', 'SEXAGESIMAL', 'INDEF'])
+_FACTOR_START = _NUMBER | frozenset(
+    ['IDENT', 'STRING', 'QSTRING', 'EOF', 'BOOL', '(', '-', '+'])
+_EXPR_START = _FACTOR_START | frozenset(['!'])
+_ARG_START = _EXPR_START | frozenset(['REDIR'])
+_CONSTANT_START = _NUMBER | frozenset(
+    ['-', '+', 'STRING', 'QSTRING', 'EOF', 'BOOL'])
+_CASE_VALUE = frozenset(['INTEGER', 'STRING', 'QSTRING', 'EOF'])
+_END_OF_LINE = frozenset(['NEWLINE', ';'])
+_STMT_START = frozenset([
+    'TYPE', 'NEWLINE', ';', 'IDENT', 'OSESCAPE', 'IF', 'FOR', 'WHILE',
+    'SWITCH', 'BREAK', 'NEXT', 'RETURN', 'GOTO', '=', '{'
+])
+_KEYWORD_STMT = {
+    'OSESCAPE': 'osescape_stmt',
+    'BREAK': 'break_stmt',
+    'NEXT': 'next_stmt',
+    'RETURN': 'return_stmt',
+}
+_NON_EXPR_ARG = frozenset(['keyword_arg', 'bool_arg', 'redir_arg'])
+
+
+class CLDescentParser:
+    """Recursive descent version of CLParser
+
+    The grammar of CLStrictParser, CLParser or EclParser (the fallback
+    class) is parsed with one token of lookahead (a few more in places)
+    and the tree is built as GenericASTBuilder and
+    CLStrictParser.nonterminal would, so the result is identical to that
+    of the Earley parser, including the resolution of ambiguities (an
+    else belongs to the innermost if).  Anything this parser does not
+    handle, including every syntax error, is parsed again by the Earley
+    parser, which is created only then; so error messages do not change.
+    """
+
+    def __init__(self, fallback=CLParser):
+        self.fallback = fallback
+        self.primaryTypes = frozenset(_primaryTypes + ('iferr_stmt',))
+        self._earleyParser = None
+        self._sloppy = issubclass(fallback, CLParser)
+        self._ecl = issubclass(fallback, EclParser)
+        if self._ecl:
+            self._stmtStart = _STMT_START | frozenset(['IFERR', 'IFNOERR'])
+        else:
+            self._stmtStart = _STMT_START
+        self.tokens = self.types = None
+        self.pos = 0
+
+    def parse(self, tokens, fname=None):
+        self.tokens = tokens
+        # sentinels so lookahead past the last token needs no checks
+        self.types = [token.type for token in tokens] + [None, None, None]
+        self.pos = 0
+        try:
+            return self.program()
+        except (_NoParse, RecursionError):
+            pass
+        finally:
+            self.tokens = self.types = None
+        if self._earleyParser is None:
+            self._earleyParser = self.fallback(AST)
+        return self._earleyParser.parse(tokens, fname=fname)
+
+    # helpers
+
+    def nonterminal(self, atype, args):
+        # same flattening as CLStrictParser.nonterminal
+        if len(args) == 1 and atype not in self.primaryTypes:
+            return args[0]
+        rv = AST(atype)
+        rv[:] = args
+        return rv
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, atype):
+        if self.types[self.pos] != atype:
+            raise _NoParse()
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def end_of_line(self):
+        if self.types[self.pos] not in _END_OF_LINE:
+            raise _NoParse()
+        return self.next()
+
+    def opt_newline(self):
+        if self.types[self.pos] == 'NEWLINE':
+            return self.next()
+        return AST('opt_newline')
+
+    def peek_newline(self, atype):
+        """Is the next token atype, possibly after a NEWLINE?"""
+        types = self.types
+        pos = self.pos
+        if types[pos] == 'NEWLINE':
+            pos += 1
+        return types[pos] == atype
+
+    # program and declarations
+
+    def program(self):
+        types = self.types
+        last = len(self.tokens)
+        if types[0] == 'PROCEDURE':
+            rv = self.nonterminal('program', [
+                self.proc_stmt(),
+                self.nonterminal('param_declaration_block',
+                                 [self.declaration_block()]),
+                self.body_block()
+            ])
+        else:
+            rv = self.statement_block()
+            if (self._sloppy and types[self.pos] == 'END' and
+                    types[self.pos + 1] == 'NEWLINE' and
+                    self.pos + 2 == last):
+                rv = self.nonterminal('program',
+                                      [rv, self.next(), self.next()])
+        if self.pos != last:
+            raise _NoParse()
+        return rv
+
+    def proc_stmt(self):
+        args = [self.expect('PROCEDURE'), self.expect('IDENT')]
+        if self.types[self.pos] == '(':
+            paren = self.next()
+            if self.types[self.pos] == 'IDENT':
+                arglist = self.next()
+            else:
+                arglist = self.nonterminal('proc_arglist', [])
+            while self.types[self.pos] == ',':
+                arglist = self.nonterminal(
+                    'proc_arglist',
+                    [arglist, self.next(),
+                     self.expect('IDENT')])
+            args.append(
+                self.nonterminal('proc_arguments',
+                                 [paren, arglist,
+                                  self.expect(')')]))
+        else:
+            args.append(self.nonterminal('proc_arguments', []))
+        args.append(self.end_of_line())
+        return self.nonterminal('proc_stmt', args)
+
+    def declaration_block(self):
+        if self.types[self.pos] != 'TYPE':
+            return self.nonterminal('declaration_block', [])
+        declist = self.nonterminal(
+            'declaration_list',
+            [self.declaration_stmt(), self.end_of_line()])
+        while self.types[self.pos] == 'TYPE':
+            declist = self.nonterminal(
+                'declaration_list',
+                [declist, self.declaration_stmt(),
+                 self.end_of_line()])
+        return self.nonterminal('declaration_block', [declist])
+
+    def declaration_stmt(self):
+        typetoken = self.expect('TYPE')
+        speclist = self.decl_spec()
+        while self.types[self.pos] == ',':
+            speclist = self.nonterminal(
+                'decl_spec_list', [speclist, self.next(),
+                                   self.decl_spec()])
+        return self.nonterminal('declaration_stmt', [typetoken, speclist])
+
+    def decl_spec(self):
+        types = self.types
+        if types[self.pos] == '*':
+            list_flag = self.nonterminal('list_flag', [self.next()])
+        else:
+            list_flag = self.nonterminal('list_flag', [])
+        name = [self.expect('IDENT')]
+        if types[self.pos] == '[':
+            name.append(self.next())
+            dims = self.nonterminal('decl_array_dims',
+                                    [self.expect('INTEGER')])
+            while types[self.pos] == ',':
+                dims = self.nonterminal(
+                    'decl_array_dims',
+                    [dims, self.next(),
+                     self.expect('INTEGER')])
+            name += [dims, self.expect(']')]
+        var_name = self.nonterminal('var_name', name)
+        if types[self.pos] == '=':
+            init_val = self.nonterminal(
+                'opt_init_val', [self.next(),
+                                 self.decl_init_list()])
+        else:
+            init_val = self.nonterminal('opt_init_val', [])
+        if types[self.pos] == '{':
+            args = [self.next()]
+            hasOptions = True
+            if types[self.pos] != 'IDENT':
+                args.append(self.decl_init_list())
+                hasOptions = types[self.pos] == ','
+                if hasOptions:
+                    args.append(self.next())
+            if hasOptions:
+                optlist = self.decl_option()
+                while types[self.pos] == ',':
+                    optlist = self.nonterminal(
+                        'decl_options_list',
+                        [optlist, self.next(),
+                         self.decl_option()])
+                args.append(optlist)
+            args += [self.expect('NEWLINE'), self.expect('}')]
+            options = self.nonterminal('declaration_options', args)
+        else:
+            options = self.nonterminal('declaration_options', [])
+        return self.nonterminal('decl_spec',
+                                [list_flag, var_name, init_val, options])
+
+    def decl_init_list(self):
+        # the list ends at a comma that is not followed by a constant
+        types = self.types
+        initlist = self.nonterminal('decl_init_value', [self.constant()])
+        while (types[self.pos] == ',' and
+               types[self.pos + 1] in _CONSTANT_START):
+            initlist = self.nonterminal(
+                'tdecl_init_list',
+                [initlist, self.next(),
+                 self.nonterminal('decl_init_value', [self.constant()])])
+        return self.nonterminal('decl_init_list', [initlist])
+
+    def decl_option(self):
+        return self.nonterminal(
+            'decl_option',
+            [self.expect('IDENT'), self.expect('='),
+             self.constant()])
+
+    def constant(self):
+        atype = self.types[self.pos]
+        if atype in _NUMBER:
+            return self.next()
+        elif atype in ('-', '+'):
+            sign = self.next()
+            if self.types[self.pos] not in _NUMBER:
+                raise _NoParse()
+            return self.nonterminal('constant', [sign, self.next()])
+        elif atype in _CONSTANT_START:
+            return self.next()
+        raise _NoParse()
+
+    # statements
+
+    def body_block(self):
+        return self.nonterminal('body_block', [
+            self.expect('BEGIN'),
+            self.end_of_line(),
+            self.statement_block(),
+            self.expect('END'),
+            self.end_of_line()
+        ])
+
+    def statement_block(self):
+        return self.nonterminal('statement_block', [self.statement_list()])
+
+    def statement_list(self):
+        stmtlist = self.nonterminal('statement_list', [])
+        stmtStart = self._stmtStart
+        while self.types[self.pos] in stmtStart:
+            stmtlist = self.nonterminal('statement_list',
+                                        [stmtlist, self.statement()])
+        return stmtlist
+
+    def statement(self):
+        types = self.types
+        atype = types[self.pos]
+        if atype in _END_OF_LINE:
+            return self.nonterminal('statement', [self.next()])
+        elif atype == 'TYPE':
+            stmt = self.declaration_stmt()
+        elif atype == 'IDENT' and types[self.pos + 1] == ':':
+            label = self.nonterminal('label_stmt',
+                                     [self.next(), self.next()])
+            return self.nonterminal('statement', [label, self.statement()])
+        else:
+            stmt = self.nonnull_stmt()
+        return self.nonterminal('statement', [stmt, self.end_of_line()])
+
+    def nonnull_stmt(self):
+        types = self.types
+        atype = types[self.pos]
+        if atype == 'IDENT':
+            nexttype = types[self.pos + 1]
+            if nexttype in ('=', 'ASSIGNOP', '['):
+                if (nexttype == '=' and self._sloppy and
+                        types[self.pos + 2] not in _EXPR_START):
+                    stmt = self.nonterminal('inspect_stmt',
+                                            [self.next(), self.next()])
+                else:
+                    stmt = self.assignment_stmt()
+            else:
+                stmt = self.task_stmt()
+        elif atype in _KEYWORD_STMT:
+            stmt = self.nonterminal(_KEYWORD_STMT[atype], [self.next()])
+        elif atype == 'IF':
+            stmt = self.if_stmt()
+        elif atype == 'FOR':
+            stmt = self.for_stmt()
+        elif atype == 'WHILE':
+            stmt = self.nonterminal('while_stmt', [
+                self.next(),
+                self.expect('('),
+                self.bool_expr(),
+                self.expect(')'),
+                self.compound_stmt()
+            ])
+        elif atype == 'SWITCH':
+            stmt = self.switch_stmt()
+        elif atype == 'GOTO':
+            stmt = self.nonterminal('goto_stmt',
+                                    [self.next(),
+                                     self.expect('IDENT')])
+        elif atype == '=':
+            stmt = self.nonterminal('inspect_stmt',
+                                    [self.next(), self.expr()])
+        elif atype == '{':
+            return self.nonterminal('nonnull_stmt', [
+                self.next(),
+                self.statement_list(),
+                self.expect('}')
+            ])
+        elif atype in ('IFERR', 'IFNOERR') and self._ecl:
+            stmt = self.iferr_stmt()
+        else:
+            raise _NoParse()
+        return self.nonterminal('nonnull_stmt', [stmt])
+
+    def compound_stmt(self):
+        newline = self.opt_newline()
+        if self.types[self.pos] == ';':
+            stmt = self.nonterminal('empty_compound_stmt', [self.next()])
+        else:
+            stmt = self.nonnull_stmt()
+        return self.nonterminal('compound_stmt', [newline, stmt])
+
+    def assignment_stmt(self):
+        types = self.types
+        if types[self.pos + 1] == '[':
+            target = self.array_ref()
+        else:
+            target = self.expect('IDENT')
+        if types[self.pos] not in ('=', 'ASSIGNOP'):
+            raise _NoParse()
+        return self.nonterminal('assignment_stmt',
+                                [target, self.next(),
+                                 self.expr()])
+
+    def if_stmt(self):
+        args = [
+            self.next(),
+            self.expect('('),
+            self.bool_expr(),
+            self.expect(')'),
+            self.compound_stmt()
+        ]
+        if self.peek_newline('ELSE'):
+            args.append(
+                self.nonterminal('else_clause', [
+                    self.opt_newline(),
+                    self.next(),
+                    self.compound_stmt()
+                ]))
+        else:
+            args.append(self.nonterminal('else_clause', []))
+        return self.nonterminal('if_stmt', args)
+
+    def for_stmt(self):
+        args = [self.next(), self.expect('(')]
+        if self.types[self.pos] == 'IDENT':
+            args.append(self.assignment_stmt())
+        else:
+            args.append(self.nonterminal('opt_assign_stmt', []))
+        args.append(self.expect(';'))
+        if self.types[self.pos] == ';':
+            args.append(self.nonterminal('opt_bool', []))
+        else:
+            args.append(self.bool_expr())
+        args.append(self.expect(';'))
+        if self.types[self.pos] == 'IDENT':
+            args.append(self.assignment_stmt())
+        else:
+            args.append(self.nonterminal('opt_assign_stmt', []))
+        args += [self.expect(')'), self.compound_stmt()]
+        return self.nonterminal('for_stmt', args)
+
+    def switch_stmt(self):
+        args = [
+            self.next(),
+            self.expect('('),
+            self.expr(),
+            self.expect(')')
+        ]
+        block = [self.opt_newline(), self.expect('{')]
+        caselist = self.case_stmt_block()
+        while self.peek_newline('CASE'):
+            caselist = self.nonterminal('case_stmt_list',
+                                        [caselist,
+                                         self.case_stmt_block()])
+        block.append(caselist)
+        if self.peek_newline('DEFAULT'):
+            block.append(
+                self.nonterminal('default_stmt_block', [
+                    self.opt_newline(),
+                    self.next(),
+                    self.expect(':'),
+                    self.compound_stmt()
+                ]))
+        else:
+            block.append(self.nonterminal('default_stmt_block', []))
+        block += [self.expect('NEWLINE'), self.expect('}')]
+        args.append(self.nonterminal('case_block', block))
+        return self.nonterminal('switch_stmt', args)
+
+    def case_stmt_block(self):
+        args = [self.opt_newline(), self.expect('CASE')]
+        values = self.case_value()
+        while self.types[self.pos] == ',':
+            values = self.nonterminal('case_value_list',
+                                      [values, self.next(),
+                                       self.case_value()])
+        args += [values, self.expect(':'), self.compound_stmt()]
+        return self.nonterminal('case_stmt_block', args)
+
+    def case_value(self):
+        if self.types[self.pos] not in _CASE_VALUE:
+            raise _NoParse()
+        return self.nonterminal('case_value', [self.next()])
+
+    def iferr_stmt(self):
+        # The Earley parser reports a parsing ambiguity for a guarded
+        # statement starting with a newline and for an except action
+        # without then that does not: leave those to it
+        kind = self.next()
+        guarded = [self.expect('{')]
+        if self.types[self.pos] == 'NEWLINE':
+            raise _NoParse()
+        guarded += [
+            self.opt_newline(),
+            self.statement_list(),
+            self.expect('}')
+        ]
+        args = [kind, self.nonterminal('guarded_stmt', guarded)]
+        if self.peek_newline('THEN'):
+            args += [self.opt_newline(), self.next(), self.compound_stmt()]
+            if self.peek_newline('ELSE'):
+                args += [
+                    self.opt_newline(),
+                    self.next(),
+                    self.compound_stmt()
+                ]
+        elif self.types[self.pos] == 'NEWLINE':
+            args.append(self.compound_stmt())
+        else:
+            raise _NoParse()
+        return self.nonterminal('iferr_stmt', args)
+
+    # task calls
+
+    def task_stmt(self):
+        stmt = self.task_call_stmt()
+        types = self.types
+        if types[self.pos] == 'PIPE':
+            while types[self.pos] == 'PIPE':
+                stmt = self.nonterminal(
+                    'task_pipe_stmt',
+                    [stmt, self.next(),
+                     self.task_call_stmt()])
+        if types[self.pos] == 'BKGD':
+            stmt = self.nonterminal('task_bkgd_stmt', [stmt, self.next()])
+        return stmt
+
+    def task_call_stmt(self):
+        return self.nonterminal('task_call_stmt',
+                                [self.expect('IDENT'),
+                                 self.task_arglist()])
+
+    def task_arglist(self):
+        types = self.types
+        if types[self.pos] == '(':
+            # try a parenthesized argument list
+            start = self.pos
+            paren = self.next()
+            args, commas = self.arg_list()
+            if types[self.pos] == ')':
+                if commas:
+                    arglist = self.comma_arglist2(args, commas)
+                elif args[0] is None:
+                    arglist = self.nonterminal('no_arg', [])
+                elif args[0].type in _NON_EXPR_ARG:
+                    arglist = args[0]
+                else:
+                    # a single expression starts a comma_arglist
+                    arglist = None
+                if arglist is not None:
+                    return self.nonterminal('task_arglist',
+                                            [paren, arglist,
+                                             self.next()])
+                self.pos = start
+            elif self._sloppy:
+                # missing closing parenthesis
+                return self.nonterminal('task_arglist',
+                                        [paren,
+                                         self.comma_arglist(args, commas)])
+            else:
+                raise _NoParse()
+        arglist = self.comma_arglist(*self.arg_list())
+        if self._sloppy and types[self.pos] == ')':
+            # missing opening parenthesis
+            return self.nonterminal('task_arglist', [arglist, self.next()])
+        return self.nonterminal('task_arglist', [arglist])
+
+    def arg_list(self):
+        """Return lists of arguments (None if empty) and separating commas"""
+        args = [self.arg()]
+        commas = []
+        types = self.types
+        while types[self.pos] == ',':
+            commas.append(self.next())
+            args.append(self.arg())
+        return args, commas
+
+    def arg(self):
+        types = self.types
+        atype = types[self.pos]
+        if atype == 'IDENT':
+            nexttype = types[self.pos + 1]
+            if nexttype == '=':
+                return self.nonterminal('keyword_arg', [
+                    self.nonterminal('param_name', [self.next()]),
+                    self.next(),
+                    self.expr()
+                ])
+            elif (nexttype in ('+', '-') and
+                  types[self.pos + 2] not in _FACTOR_START):
+                return self.nonterminal('bool_arg', [
+                    self.nonterminal('param_name', [self.next()]),
+                    self.next()
+                ])
+        elif atype == 'REDIR':
+            return self.nonterminal('redir_arg', [self.next(), self.expr()])
+        elif atype not in _ARG_START:
+            return None
+        return self.expr()
+
+    def comma_arglist(self, args, commas):
+        if not commas:
+            if args[0] is None:
+                return self.nonterminal('comma_arglist', [])
+            arglist = self.nonterminal('non_empty_arg', args)
+        elif args[0] is None:
+            arglist = self.nonterminal('empty_arg', [])
+        else:
+            arglist = self.nonterminal('non_empty_arg', [args[0]])
+        for comma, arg in zip(commas, args[1:]):
+            arglist = self.nonterminal('ncomma_arglist',
+                                       [arglist, comma,
+                                        self.make_arg(arg)])
+        return self.nonterminal('comma_arglist', [arglist])
+
+    def comma_arglist2(self, args, commas):
+        arglist = self.make_arg(args[0])
+        for comma, arg in zip(commas, args[1:]):
+            arglist = self.nonterminal('comma_arglist2',
+                                       [arglist, comma,
+                                        self.make_arg(arg)])
+        return arglist
+
+    def make_arg(self, arg):
+        if arg is None:
+            arg = self.nonterminal('empty_arg', [])
+        else:
+            arg = self.nonterminal('non_empty_arg', [arg])
+        return self.nonterminal('arg', [arg])
+
+    # expressions
+
+    def bool_expr(self):
+        return self.nonterminal('bool_expr', [self.expr()])
+
+    def expr(self):
+        left = self.not_expr()
+        while self.types[self.pos] == 'LOGOP':
+            left = self.nonterminal('expr',
+                                    [left, self.next(),
+                                     self.not_expr()])
+        return left
+
+    def not_expr(self):
+        if self.types[self.pos] == '!':
+            return self.nonterminal('not_expr',
+                                    [self.next(),
+                                     self.comp_expr()])
+        return self.comp_expr()
+
+    def comp_expr(self):
+        left = self.concat_expr()
+        while self.types[self.pos] == 'COMPOP':
+            left = self.nonterminal('comp_expr',
+                                    [left, self.next(),
+                                     self.concat_expr()])
+        return left
+
+    def concat_expr(self):
+        left = self.arith_expr()
+        while self.types[self.pos] == '//':
+            left = self.nonterminal('concat_expr',
+                                    [left, self.next(),
+                                     self.arith_expr()])
+        return left
+
+    def arith_expr(self):
+        left = self.term()
+        types = self.types
+        while types[self.pos] in ('+', '-'):
+            left = self.nonterminal('arith_expr',
+                                    [left, self.next(),
+                                     self.term()])
+        return left
+
+    def term(self):
+        left = self.factor()
+        types = self.types
+        while types[self.pos] in ('*', '/', '%'):
+            left = self.nonterminal('term',
+                                    [left, self.next(),
+                                     self.factor()])
+        return left
+
+    def factor(self):
+        if self.types[self.pos] in ('-', '+'):
+            return self.nonterminal('factor', [self.next(), self.factor()])
+        power = self.atom()
+        while self.types[self.pos] == '**':
+            power = self.nonterminal('power',
+                                     [power, self.next(),
+                                      self.atom()])
+        return power
+
+    def atom(self):
+        types = self.types
+        atype = types[self.pos]
+        if atype == 'IDENT':
+            nexttype = types[self.pos + 1]
+            if nexttype == '[':
+                return self.array_ref()
+            elif nexttype == '(':
+                return self.nonterminal('function_call', [
+                    self.next(),
+                    self.next(),
+                    self.nonterminal('fn_arglist',
+                                     [self.comma_arglist(*self.arg_list())]),
+                    self.expect(')')
+                ])
+            return self.next()
+        elif atype == '(':
+            return self.nonterminal('atom',
+                                    [self.next(),
+                                     self.expr(),
+                                     self.expect(')')])
+        elif atype in _FACTOR_START and atype not in ('-', '+'):
+            return self.next()
+        raise _NoParse()
+
+    def array_ref(self):
+        args = [self.expect('IDENT'), self.expect('[')]
+        subscript = self.nonterminal('array_subscript', [self.expr()])
+        while self.types[self.pos] == ',':
+            subscript = self.nonterminal('array_subscript',
+                                         [subscript, self.next(),
+                                          self.expr()])
+        args += [subscript, self.expect(']')]
+        return self.nonterminal('array_ref', args)
+
+
 #
 # list tree
 #
@@ -486,9 +1178,9 @@ def treelist(ast, terminal=1):
 def getParser():
     from . import pyrafglobals
     if pyrafglobals._use_ecl:
-        _parser = EclParser(AST)
+        _parser = CLDescentParser(EclParser)
     else:
-        _parser = CLParser(AST)
+        _parser = CLDescentParser(CLParser)
     return _parser
 
 
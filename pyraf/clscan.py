@@ -777,6 +777,24 @@ _boolDict = {
 # only need to create these once, since they are designed to
 # contain no state information
 
+
+class _ScannerDict(dict):
+    """Dictionary of scanners for each state
+
+    A scanner is created when its state is first used: compiling the
+    regular expression of a scanner takes milliseconds and many CL
+    statements need only a few of the states.
+    """
+
+    def __init__(self, classes):
+        dict.__init__(self)
+        self.classes = classes
+
+    def __missing__(self, mode):
+        scanner = self[mode] = self.classes[mode]()
+        return scanner
+
+
 _scannerDict = None
 _strictScannerDict = None
 
@@ -784,15 +802,15 @@ _strictScannerDict = None
 def _getScannerDict():
     global _scannerDict
     if _scannerDict is None:
-        _scannerDict = {
-            _START_LINE_MODE: _StartScanner(),
-            _COMMAND_MODE: _CommandScanner(),
-            _COMPUTE_START_MODE: _ComputeStartScanner(),
-            _COMPUTE_EQN_MODE: _ComputeEqnScanner(),
-            _COMPUTE_MODE: _ComputeScanner(),
-            _SWALLOW_NEWLINE_MODE: _SwallowNewlineScanner(),
-            _ACCEPT_REDIR_MODE: _AcceptRedirScanner(),
-        }
+        _scannerDict = _ScannerDict({
+            _START_LINE_MODE: _StartScanner,
+            _COMMAND_MODE: _CommandScanner,
+            _COMPUTE_START_MODE: _ComputeStartScanner,
+            _COMPUTE_EQN_MODE: _ComputeEqnScanner,
+            _COMPUTE_MODE: _ComputeScanner,
+            _SWALLOW_NEWLINE_MODE: _SwallowNewlineScanner,
+            _ACCEPT_REDIR_MODE: _AcceptRedirScanner,
+        })
     return _scannerDict
 
 
@@ -800,15 +818,15 @@ def _getStrictScannerDict():
     global _strictScannerDict
     # create strict scanners
     if _strictScannerDict is None:
-        _strictScannerDict = {
-            _START_LINE_MODE: _StrictStartScanner(),
-            _COMMAND_MODE: _StrictCommandScanner(),
-            _COMPUTE_START_MODE: _StrictComputeStartScanner(),
-            _COMPUTE_EQN_MODE: _StrictComputeEqnScanner(),
-            _COMPUTE_MODE: _StrictComputeScanner(),
-            _SWALLOW_NEWLINE_MODE: _StrictSwallowNewlineScanner(),
-            _ACCEPT_REDIR_MODE: _StrictAcceptRedirScanner(),
-        }
+        _strictScannerDict = _ScannerDict({
+            _START_LINE_MODE: _StrictStartScanner,
+            _COMMAND_MODE: _StrictCommandScanner,
+            _COMPUTE_START_MODE: _StrictComputeStartScanner,
+            _COMPUTE_EQN_MODE: _StrictComputeEqnScanner,
+            _COMPUTE_MODE: _StrictComputeScanner,
+            _SWALLOW_NEWLINE_MODE: _StrictSwallowNewlineScanner,
+            _ACCEPT_REDIR_MODE: _StrictAcceptRedirScanner,
+        })
     return _strictScannerDict
 
 
@@ -853,23 +871,29 @@ class CLScanner(ContextSensitiveScanner):
 
         if type is None:
             return
+        rv = self.rv
+        last = rv[-1].type if rv else None
 
-        # insert NEWLINE before '}'
+        if type == 'NEWLINE':
 
-        if type == '}' and self.rv and self.rv[-1].type != 'NEWLINE':
-            self.rv.append(Token(type='NEWLINE', attr=None,
-                                 lineno=self.lineno))
+            # compress out multiple/leading newlines
+            # suppress newline after '{'
 
-        # suppress newline after '{' or ';'
-        # if type != 'NEWLINE' or (self.rv and self.rv[-1].type != 'NEWLINE' and
-        #                                               self.rv[-1].type != '{' and
-        #                                               self.rv[-1].type != ';'):
+            if last is not None and last != 'NEWLINE' and last != '{':
+                rv.append(Token(type, attr, self.lineno))
 
-        # compress out multiple/leading newlines
-        # suppress newline after '{'
+        elif type == '}':
 
-        if type != 'NEWLINE' or (self.rv and self.rv[-1].type != 'NEWLINE' and
-                                 self.rv[-1].type != '{'):
+            # insert NEWLINE before and after '}'
+            # go to start-line mode
+
+            if last is not None and last != 'NEWLINE':
+                rv.append(Token('NEWLINE', None, self.lineno))
+            rv.append(Token(type, attr, self.lineno))
+            rv.append(Token('NEWLINE', None, self.lineno))
+            self.startLine()
+
+        else:
 
             # Another ugly hack -- the syntax
             #
@@ -878,17 +902,10 @@ class CLScanner(ContextSensitiveScanner):
             # causes parsing problems.  To help solve them, delete any
             # comma that just precedes a PIPE
 
-            if type == 'PIPE' and self.rv and self.rv[-1].type == ',':
-                del self.rv[-1]
-
-            self.rv.append(Token(type=type, attr=attr, lineno=self.lineno))
+            if type == 'PIPE' and last == ',':
+                del rv[-1]
 
-        # insert NEWLINE after '}' too
-        # go to start-line mode
-        if type == '}' and self.rv and self.rv[-1].type != 'NEWLINE':
-            self.rv.append(Token(type='NEWLINE', attr=None,
-                                 lineno=self.lineno))
-            self.startLine()
+            rv.append(Token(type, attr, self.lineno))
 
     def addIdent(self, name, mode=None, usekey=1):
         # Add identifier token, recognizing keywords if usekey parameter is set
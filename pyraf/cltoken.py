@@ -35,6 +35,11 @@ verbose = 0
 
 class Token(compmixin.ComparableMixin):
 
+    # scripts have many thousands of tokens, so no instance dictionary;
+    # the other slots are set by the type checking in cl2py
+    __slots__ = ('type', 'attr', 'lineno', 'exprType', 'requireType',
+                 'trunc_int_div')
+
     def __init__(self, type=None, attr=None, lineno=None):
         self.type = type
         self.attr = attr
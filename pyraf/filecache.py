@@ -18,6 +18,13 @@ getValue and updateValue methods.
 MD5Cache is an implementation of a FileCache that returns the MD5 digest
 value for a file's contents, updating it only if the file has changed.
 
+The file attributes are shared by all caches through statCache, a
+StatCache object that reuses the attributes of a file for a short time
+(statCache.interval seconds, the value of the PYRAF_STAT_INTERVAL
+environment variable) instead of calling os.stat on every access.  By
+default the interval is 0 and every access checks the file.  Code that writes a cached file itself should call
+statCache.invalidate(filename).
+
 FileCacheDict is a dictionary-like class that keeps FileCache objects
 for a list of filenames.  It is instantiated with the *class* (not an
 instance) of the objects to be created for each entry.  New files
@@ -30,15 +37,82 @@ R. White, 2000 October 1
 import os
 import stat
 import sys
+import time
 import hashlib
 
 
+class StatCache:
+    """Session-level cache of file attributes
+
+    The attributes (size, creation and modification times) of a file
+    are reused for interval seconds after os.stat was called for it;
+    with interval=0 the file is checked on every access (and nothing is
+    kept).  At most maxsize entries are kept; expired entries are dropped
+    when the cache is full.  The stats and avoided counters give the
+    number of os.stat calls made and avoided.
+    """
+
+    def __init__(self, interval=0.0, maxsize=1000):
+        self.interval = interval
+        self.maxsize = maxsize
+        self.data = {}
+        self.stats = 0
+        self.avoided = 0
+
+    def getAttributes(self, filename, refresh=0):
+        """Return (size, ctime, mtime) of filename
+
+        If refresh is set, the file is checked even if its attributes
+        are still valid.  Raises OSError if the file does not exist.
+        """
+        key = os.path.abspath(filename)
+        now = time.monotonic()
+        if not refresh:
+            entry = self.data.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                self.avoided += 1
+                return entry[1]
+        self.stats += 1
+        try:
+            st = os.stat(filename)
+        except OSError:
+            self.data.pop(key, None)
+            raise
+        attributes = st[stat.ST_SIZE], st[stat.ST_CTIME], st[stat.ST_MTIME]
+        if self.interval > 0:
+            if key not in self.data and len(self.data) >= self.maxsize:
+                self._evict(now)
+            self.data[key] = (now, attributes)
+        else:
+            self.data.pop(key, None)
+        return attributes
+
+    def _evict(self, now):
+        """Drop the expired entries (all entries if none has expired)"""
+        expired = [key for key, (checked, attributes) in self.data.items()
+                   if now - checked >= self.interval]
+        for key in expired:
+            del self.data[key]
+        if len(self.data) >= self.maxsize:
+            self.data.clear()
+
+    def invalidate(self, filename=None):
+        """Forget the attributes of filename (default all files)"""
+        if filename is None:
+            self.data.clear()
+        else:
+            self.data.pop(os.path.abspath(filename), None)
+
+
+statCache = StatCache(float(os.environ.get("PYRAF_STAT_INTERVAL", 0)))
+
+
 class FileCache:
     """File cache base class"""
 
     def __init__(self, filename):
         self.filename = filename
-        self.attributes = self._getAttributes()
+        self.attributes = self._getAttributes(refresh=1)
         self.newValue()
 
     # methods that should be supplied in extended class
@@ -86,14 +160,13 @@ class FileCache:
                 self.attributes = newattr
         return self.getValue()
 
-    def _getAttributes(self):
+    def _getAttributes(self, refresh=0):
         """Get file attributes for a file or filehandle"""
 
         if not self.filename:
             return None
-        st = os.stat(self.filename)
         # file attributes are size, creation, and modification times
-        return st[stat.ST_SIZE], st[stat.ST_CTIME], st[stat.ST_MTIME]
+        return statCache.getAttributes(self.filename, refresh)
 
     def _warning(self, msg):
         """Print warning message to stderr, using verbose flag"""
@@ -1,23 +1,111 @@
-import os
+"""fill_clcache.py: Fill the system cache with precompiled CL code
+
+The CL scripts below $iraf are translated in parallel worker processes.
+Scripts that are already in the cache (same file contents) are skipped,
+and the new translations are written to the cache in a single
+transaction.
+
+Usage: python -m pyraf.fill_clcache [-j jobs] [-n slowest] [-v]
+"""
+import argparse
+import concurrent.futures
 import glob
+import os
+import time
+
 from . import cl2py, clcache
 
 
-def fill_clcache():
-    """Fill the system cache with precompiled CL code"""
-    cl2py.codeCache = clcache._CodeCache([os.path.join(
+def _compile(cl_script):
+    """Translate a single CL script (run in a worker process)
+
+    Returns a tuple (cl_script, pycode, seconds, error message); pycode
+    is None if the translation failed.
+    """
+    t0 = time.perf_counter()
+    try:
+        pycode = cl2py.cl2py(cl_script, usecache=False)
+        pycode.compile()
+        error = None
+    except Exception as e:
+        pycode = None
+        error = f"{e.__class__.__name__}: {str(e).strip()}"
+    return cl_script, pycode, time.perf_counter() - t0, error
+
+
+def fill_clcache(jobs=None, slowest=10, verbose=False):
+    """Fill the system cache with precompiled CL code
+
+    jobs is the number of worker processes (default: number of CPUs).
+    The translation times of the slowest scripts are listed at the end;
+    with verbose, the time for every script is printed.
+    """
+    codeCache = clcache._CodeCache([os.path.join(
         clcache.clcache_path[-1], 'clcache')])
-    n_compiled = 0
-    n_fail = 0
+    cl2py.codeCache = codeCache
+    t0 = time.perf_counter()
+
+    # find scripts not in the cache yet
+    todo = {}
+    indices = set()
+    n_cached = 0
     for cl_script in glob.glob(os.path.join(os.environ['iraf'], '**/*.cl'),
                                recursive=True):
         try:
-            cl2py.cl2py(cl_script)
-            n_compiled += 1
-        except Exception:
-            n_fail += 1
-    print(f"Compiled: {n_compiled}, Failed: {n_fail}")
+            index = codeCache.getIndex(cl_script)
+        except OSError:
+            continue
+        if index in codeCache:
+            n_cached += 1
+        elif index not in indices:
+            # identical copies of a script only need one translation
+            todo[cl_script] = index
+            indices.add(index)
+
+    # translate them in parallel
+    results = {}
+    timing = []
+    n_fail = 0
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        for cl_script, pycode, dt, error in executor.map(_compile,
+                                                         sorted(todo),
+                                                         chunksize=4):
+            timing.append((dt, cl_script))
+            if pycode is None:
+                n_fail += 1
+                if verbose:
+                    print(f"{dt:7.3f}s {cl_script} FAILED: {error}")
+                continue
+            if verbose:
+                print(f"{dt:7.3f}s {cl_script}")
+            results[todo[cl_script]] = pycode
+
+    # write everything in a single transaction
+    codeCache.update(results)
+    codeCache.close()
+
+    if slowest and timing:
+        timing.sort(reverse=True)
+        print(f"Slowest {min(slowest, len(timing))} scripts:")
+        for dt, cl_script in timing[:slowest]:
+            print(f"{dt:7.3f}s {cl_script}")
+    print(f"Compiled: {len(results)}, Failed: {n_fail}, "
+          f"Already cached: {n_cached}, "
+          f"Time: {time.perf_counter() - t0:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill the system cache with precompiled CL code")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument('-n', '--slowest', type=int, default=10,
+                        help="number of slowest scripts to list")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print translation time of every script")
+    args = parser.parse_args()
+    fill_clcache(jobs=args.jobs, slowest=args.slowest, verbose=args.verbose)
 
 
 if __name__ == '__main__':
-    fill_clcache()
+    main()
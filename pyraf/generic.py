@@ -26,10 +26,9 @@
 # - Allow named groups in scanner patterns (other than the ones
 #   inserted by the class constructor.)
 # - Speed up GenericScanner.tokenize().
-#   + Keep a list (indexlist) of the group numbers to check.
-#   + Break out of loop after finding a match, since more than
-#     one of the primary patterns cannot match (by construction of
-#     the pattern.)
+#   + Dispatch on the name of the last matched group (m.lastgroup),
+#     which is the group of the primary pattern that matched, since
+#     only one of them can match (by construction of the pattern.)
 # - Add optional value parameter to GenericParser.error.
 # - Add check for assertion error in ambiguity resolution.
 
@@ -59,13 +58,13 @@ class GenericScanner:
         pattern = self.reflect()
         self.re = re.compile(pattern, re.VERBOSE)
 
-        self.index2func = {}
-        self.indexlist = []
-        for name, number in self.re.groupindex.items():
+        # the group of the matching pattern is always m.lastgroup, since
+        # it encloses any other groups in the pattern
+        self.group2func = {}
+        for name in self.re.groupindex:
             # allow other named groups
             if hasattr(self, 't_' + name):
-                self.index2func[number - 1] = getattr(self, 't_' + name)
-                self.indexlist.append(number - 1)
+                self.group2func[name] = getattr(self, 't_' + name)
 
     def makeRE(self, name):
         doc = getattr(self, name).__doc__
@@ -88,19 +87,13 @@ class GenericScanner:
         pos = 0
         n = len(s)
         match = self.re.match
-        indexlist = self.indexlist
-        index2func = self.index2func
+        group2func = self.group2func
         while pos < n:
             m = match(s, pos)
             if m is None:
                 self.error(s, pos)
 
-            groups = m.groups()
-            for i in indexlist:
-                if groups[i] is not None:
-                    index2func[i](groups[i])
-                    # assume there is only a single match
-                    break
+            group2func[m.lastgroup](m.group())
             pos = m.end()
 
     def t_default(self, s):
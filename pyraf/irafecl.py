@@ -388,7 +388,8 @@ class EclTraceback(EclBase):
         try:
             with open(cl_file, errors="ignore") as fh:
                 cl_code = fh.readlines()[lineno - 1].strip()
-        except OSError:
+        except (OSError, TypeError):
+            # TypeError: no file for tasks defined from a string
             cl_code = "<source code not available>"
         if hasattr(e, "_ecl_suppress_first_trace") and \
                 e._ecl_suppress_first_trace:
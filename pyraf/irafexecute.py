@@ -2,11 +2,16 @@
 """
 
 
+import collections
+import concurrent.futures
 import os
+import queue
 import re
 import signal
 import struct
 import sys
+import threading
+import time
 import numpy
 import io
 from .tools import irafutils
@@ -23,6 +28,17 @@ from . import iraf
 
 IPC_PREFIX = b'P\x02'
 
+# IPC record header: magic number followed by the number of data bytes
+_ipc_header = struct.Struct('=2sh')
+IPC_HEADERSIZE = _ipc_header.size
+
+# maximum number of data bytes in a single IPC record
+IPC_BLOCKSIZE = 4096
+
+# size of the chunks read from the process pipe; many records can be
+# fetched with a single read
+IPC_READSIZE = 16 * (IPC_BLOCKSIZE + IPC_HEADERSIZE)
+
 # weirdo protocol to get output from task back to subprocess
 # definitions from cl/task.h and lib/clio.h
 IPCOUT = "IPC$IPCIO-OUT"
@@ -70,9 +86,10 @@ class _ProcessProxy(filecache.FileCache):
     Restart is triggered by change of executable on disk.
     """
 
-    def __init__(self, process):
+    def __init__(self, process, launch=None):
         self.process = process
         self.envdict = {}
+        self.launch = launch
         # pass executable filename to FileCache
         filecache.FileCache.__init__(self, process.executable)
 
@@ -86,8 +103,11 @@ class _ProcessProxy(filecache.FileCache):
         # seems to be necessary to delete this process before starting
         # next one to avoid some weird problems...
         del self.process
-        self.process = IrafProcess(self.filename)
-        self.process.initialize(self.envdict)
+        if self.launch is not None:
+            self.process = self.launch(self.filename, self.envdict)
+        else:
+            self.process = IrafProcess(self.filename)
+            self.process.initialize(self.envdict)
 
     def getProcess(self, envdict):
         """Get the process; create & initialize using envdict if needed"""
@@ -98,16 +118,103 @@ class _ProcessProxy(filecache.FileCache):
         return self.process
 
 
+class _ExecutableStats:
+    """Usage statistics of the processes for one executable"""
+
+    def __init__(self):
+        self.launches = 0  # number of processes started
+        self.reuses = 0  # number of tasks run with a cached process
+        self.connectTime = 0.0  # seconds spent starting processes
+        self.nbytes = 0  # bytes transferred through the IPC pipes
+
+    def asDict(self):
+        return {
+            'launches': self.launches,
+            'reuses': self.reuses,
+            'connect_time': self.connectTime,
+            'bytes': self.nbytes,
+        }
+
+
+def _memoryAvailable():
+    """Return fraction of physical memory available, or None if unknown"""
+    try:
+        with open('/proc/meminfo') as fh:
+            meminfo = {}
+            for line in fh:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0])
+        return meminfo['MemAvailable'] / meminfo['MemTotal']
+    except (OSError, ValueError, KeyError, ZeroDivisionError):
+        pass
+    try:
+        return (os.sysconf('SC_AVPHYS_PAGES') /
+                os.sysconf('SC_PHYS_PAGES'))
+    except (AttributeError, ValueError, OSError, ZeroDivisionError):
+        return None
+
+
+def _expandExecutable(arg):
+    """Get executable pathname, also accepting IRAF filenames
+
+    A bare executable name like `x_images.e' is looked for in bin$.
+    """
+    if isinstance(arg, str) and not os.path.exists(arg):
+        if arg.endswith('.e') and '$' not in arg and '/' not in arg:
+            arg = 'bin$' + arg
+        if '$' in arg:
+            expanded = iraf.Expand(arg, noerror=1)
+            if os.path.exists(expanded):
+                return expanded
+    return _getExecutable(arg)
+
+
 class _ProcessCache:
-    """Cache of active processes indexed by executable path"""
+    """Cache of active processes indexed by executable path
+
+    The processes are kept in least recently used order.  In adaptive
+    mode (see setAdaptive) the size limit is raised when tasks keep
+    restarting processes that were pushed out of the cache, and lowered
+    again when the system runs short of memory.
+
+    The cache can also keep initialized spare processes for selected
+    executables (see warm), which are started in a background thread and
+    replaced as they are consumed, so that the first run of a task does
+    not have to wait for its process to start.
+    """
 
     DFT_LIMIT = 8
+    DFT_SPARES = 1
+    # adaptive sizing: the limit grows by one (up to ADAPT_MAXLIMIT) when
+    # more than ADAPT_MISSRATE of the last ADAPT_WINDOW tasks restarted an
+    # evicted process, and shrinks when less than ADAPT_MINMEMORY of the
+    # physical memory is available
+    ADAPT_WINDOW = 20
+    ADAPT_MISSRATE = 0.25
+    ADAPT_MAXLIMIT = 32
+    ADAPT_MINMEMORY = 0.1
 
     def __init__(self, limit=DFT_LIMIT):
-        self._data = {}  # dictionary with active process proxies
+        # active process proxies, least recently used first
+        self._data = collections.OrderedDict()
         self._pcount = 0  # total number of processes started
         self._plimit = limit  # number of active processes allowed
         self._locked = {}  # processes locked into cache
+        self._stats = {}  # _ExecutableStats by executable
+        self._evicted = set()  # executables evicted to make room
+        self._adaptive = False
+        self._recent = collections.deque(maxlen=self.ADAPT_WINDOW)
+        self._hits = 0  # tasks run with a cached process
+        self._spareHits = 0  # tasks run with a spare process
+        self._misses = 0  # tasks that had to start a new process
+        # spare processes; the following are shared with the
+        # background thread and protected by _spareLock
+        self._spareLock = threading.Lock()
+        self._warm = {}  # number of spare processes wanted by executable
+        self._spares = {}  # lists of (process, mtime) by executable
+        self._pending = {}  # number of spares being started by executable
+        self._envSerial = 0  # incremented on every environment change
+        self._spareQueue = None  # executables to start spares for
 
     def error(self, msg, level=0):
         """Write an error message if Verbose is set"""
@@ -120,10 +227,14 @@ class _ProcessCache:
         executable = _getExecutable(task)
         if executable in self._data:
             # use existing process
-            rank, proxy = self._data[executable]
+            proxy = self._data[executable]
             process = proxy.getProcess(envdict)
             if not process.running:
                 if process.isAlive():
+                    self._data.move_to_end(executable)
+                    self._hits = self._hits + 1
+                    self._getStats(executable).reuses += 1
+                    self._recordMiss(False)
                     return process
                 # Hmm, looks like there is something wrong with this process
                 # Kill it and start a new one
@@ -137,69 +248,287 @@ class _ProcessCache:
             # execute another task in the same executable.  Don't know
             # if IRAF allows this, but we can handle it by just creating
             # a new process running the same executable.
-        # create and initialize a new process
+        # create and initialize a new process (or use a spare one)
         # this will be added to cache after successful task completion
+        process = self._getSpare(executable)
+        if process is not None:
+            self._spareHits = self._spareHits + 1
+            self._recordMiss(False)
+            return process
+        self._misses = self._misses + 1
+        self._recordMiss(executable in self._evicted)
+        return self._launch(executable, envdict)
+
+    def _launch(self, executable, envdict):
+        """Start and initialize a new process, recording the time taken"""
+        t0 = time.perf_counter()
         process = IrafProcess(executable)
         process.initialize(envdict)
+        dt = time.perf_counter() - t0
+        with self._spareLock:
+            stats = self._getStats(executable)
+            stats.launches += 1
+            stats.connectTime += dt
         return process
 
+    def _getStats(self, executable):
+        stats = self._stats.get(executable)
+        if stats is None:
+            stats = self._stats.setdefault(executable, _ExecutableStats())
+        return stats
+
+    def _account(self, process):
+        """Add the bytes transferred by process to the statistics"""
+        if process.nbytes:
+            self._getStats(process.executable).nbytes += process.nbytes
+            process.nbytes = 0
+
+    def _recordMiss(self, miss):
+        """Record whether a task had to restart an evicted process
+
+        In adaptive mode the size limit is raised if this happens often.
+        """
+        if not self._adaptive:
+            return
+        self._recent.append(miss)
+        if (len(self._recent) == self._recent.maxlen and
+                sum(self._recent) > self.ADAPT_MISSRATE * len(self._recent)
+                and self._plimit < self.ADAPT_MAXLIMIT):
+            self._plimit = self._plimit + 1
+            self._recent.clear()
+            self.error(f"Process cache size increased to {self._plimit}\n")
+
+    def _checkMemory(self):
+        """Lower the size limit if the system is short of memory"""
+        available = _memoryAvailable()
+        if (available is not None and available < self.ADAPT_MINMEMORY and
+                self._plimit > max(1, len(self._locked))):
+            self._plimit = self._plimit - 1
+            self._recent.clear()
+            self.error(f"Process cache size decreased to {self._plimit}\n")
+
     def add(self, process):
-        """Add process to cache or update its rank if already there"""
+        """Add process to cache or mark it as most recently used"""
         self._pcount = self._pcount + 1
         executable = process.executable
+        self._account(process)
         if executable in self._data:
             # don't replace current cached process
-            rank, proxy = self._data[executable]
+            proxy = self._data[executable]
             oldprocess = proxy.process
             if oldprocess != process:
                 # argument is a duplicate process, terminate this copy
                 process.terminate()
-        elif self._plimit <= len(self._locked):
+            self._data.move_to_end(executable)
+            return
+        if self._adaptive:
+            self._checkMemory()
+        if self._plimit <= len(self._locked):
             # cache is null or all processes are locked
             process.terminate()
             return
-        else:
-            # new process -- make a proxy
-            proxy = _ProcessProxy(process)
-            if len(self._data) >= self._plimit:
-                # delete the oldest entry to make room
-                self._deleteOldest()
-        self._data[executable] = (self._pcount, proxy)
+        # new process -- make a proxy
+        proxy = _ProcessProxy(process, self._launch)
+        while len(self._data) >= self._plimit:
+            # delete the least recently used entry to make room
+            self._deleteOldest()
+        self._data[executable] = proxy
+        self._evicted.discard(executable)
 
     def _deleteOldest(self):
-        """Delete oldest unlocked process from the cache
+        """Delete least recently used unlocked process from the cache
 
         If all processes are locked, delete oldest locked process.
         """
-        # each entry contains rank (to sort and find oldest) and process
-        values = sorted(self._data.values())
         if len(self._locked) < len(self._data):
             # find and delete oldest unlocked process
-            for rank, proxy in values:
-                process = proxy.process
-                executable = process.executable
-                if not (executable in self._locked or process.running):
-                    # terminate it
-                    self.terminate(executable)
-                    return
-        # no unlocked processes or all unlocked are running
-        # delete oldest locked process
-        rank, proxy = values[0]
-        executable = proxy.process.executable
+            for executable, proxy in self._data.items():
+                if not (executable in self._locked or proxy.process.running):
+                    break
+            else:
+                executable = next(iter(self._data))
+        else:
+            # no unlocked processes or all unlocked are running
+            # delete oldest locked process
+            executable = next(iter(self._data))
+        self._evicted.add(executable)
         self.terminate(executable)
 
     def setenv(self, msg):
         """Update process value of environment variable by sending msg"""
-        for rank, proxy in self._data.values():
+        for proxy in self._data.values():
             # just save messages in a list, they all get sent at
             # once when a task is run
             proxy.process.appendEnv(msg)
+        with self._spareLock:
+            self._envSerial = self._envSerial + 1
+            for spares in self._spares.values():
+                for process, mtime in spares:
+                    process.appendEnv(msg)
+
+    def warm(self, *args, nspares=DFT_SPARES):
+        """Keep spare processes ready for the specified executables
+
+        Takes task names, executable paths or IRAF executable names (e.g.
+        `x_images.e') as arguments.  nspares initialized processes are
+        kept for each of them; nspares=0 turns this off again.
+        """
+        if self._plimit <= 0:
+            return
+        for arg in args:
+            try:
+                executable = _expandExecutable(arg)
+            except IrafProcessError as e:
+                self.error(f"{str(e)}\n")
+                continue
+            with self._spareLock:
+                if nspares > 0:
+                    self._warm[executable] = nspares
+                else:
+                    self._warm.pop(executable, None)
+                spares = self._spares.get(executable, [])
+                extra = spares[max(nspares, 0):]
+                del spares[max(nspares, 0):]
+            for process, mtime in extra:
+                process.terminate()
+            self._replenish(executable)
+
+    def _getSpare(self, executable):
+        """Return a spare process for executable or None"""
+        with self._spareLock:
+            spares = self._spares.get(executable)
+            if not spares:
+                return None
+            process, mtime = spares.pop(0)
+        self._replenish(executable)
+        try:
+            current = os.path.getmtime(executable)
+        except OSError:
+            current = None
+        if current != mtime or not process.isAlive():
+            # executable has changed since the spare was started
+            process.terminate()
+            return None
+        return process
+
+    def _replenish(self, executable):
+        """Start spare processes in the background as needed"""
+        with self._spareLock:
+            nstart = (self._warm.get(executable, 0) -
+                      len(self._spares.get(executable, [])) -
+                      self._pending.get(executable, 0))
+            if nstart <= 0:
+                return
+            self._pending[executable] = \
+                self._pending.get(executable, 0) + nstart
+            if self._spareQueue is None:
+                self._spareQueue = queue.Queue()
+                threading.Thread(target=self._spareStarter,
+                                 args=(self._spareQueue,),
+                                 name='pyraf-prcache-warm',
+                                 daemon=True).start()
+            for i in range(nstart):
+                self._spareQueue.put(executable)
+
+    def _spareStarter(self, spareQueue):
+        """Background thread starting the spare processes"""
+        while True:
+            executable = spareQueue.get()
+            if executable is None:
+                return
+            try:
+                added = self._startSpare(executable)
+            finally:
+                with self._spareLock:
+                    self._pending[executable] = \
+                        self._pending.get(executable, 1) - 1
+            if not added:
+                self._replenish(executable)
+
+    def _startSpare(self, executable):
+        """Start and initialize a spare process
+
+        Returns false if the process had to be discarded because the
+        environment changed while it was started.
+        """
+        with self._spareLock:
+            if executable not in self._warm:
+                return True
+            serial = self._envSerial
+            envdict = dict(iraf.getVarDict())
+        try:
+            mtime = os.path.getmtime(executable)
+            process = self._launch(executable, envdict)
+        except (OSError, IrafProcessError, subproc.SubprocessError) as e:
+            self.error(f"Cannot start spare process {executable}: "
+                       f"{str(e)}\n")
+            return True
+        with self._spareLock:
+            if serial == self._envSerial and executable in self._warm:
+                self._spares.setdefault(executable, []).append(
+                    (process, mtime))
+                return True
+        process.terminate()
+        return serial == self._envSerial
+
+    def _flushSpares(self, warm=None):
+        """Terminate the spare processes and stop the background thread
+
+        If warm is given, it replaces the set of executables for which
+        spares are kept.
+        """
+        with self._spareLock:
+            spares = self._spares
+            self._spares = {}
+            if warm is not None:
+                self._warm = warm
+            if self._spareQueue is not None and not self._warm:
+                self._spareQueue.put(None)
+                self._spareQueue = None
+        for plist in spares.values():
+            for process, mtime in plist:
+                process.terminate()
+        for executable in list(self._warm):
+            self._replenish(executable)
+
+    def stats(self):
+        """Return dictionary with process cache statistics
+
+        The 'executables' entry has the launches, reuses, connect_time
+        (seconds spent starting processes) and bytes (transferred through
+        the pipes) for every executable used in this session.
+        """
+        with self._spareLock:
+            nspares = sum(len(s) for s in self._spares.values())
+            executables = {executable: stats.asDict()
+                           for executable, stats in self._stats.items()}
+        for executable, proxy in self._data.items():
+            estats = executables.setdefault(executable,
+                                            _ExecutableStats().asDict())
+            estats['bytes'] += proxy.process.nbytes
+        return {
+            'hits': self._hits,
+            'spare_hits': self._spareHits,
+            'misses': self._misses,
+            'processes': len(self._data),
+            'spares': nspares,
+            'limit': self._plimit,
+            'adaptive': self._adaptive,
+            'executables': executables,
+        }
+
+    def setAdaptive(self, flag=True):
+        """Turn adaptive sizing of the cache on or off"""
+        self._adaptive = bool(flag) and self._plimit > 0
+        self._recent.clear()
 
     def setSize(self, limit):
         """Set number of processes allowed in cache"""
         self._plimit = limit
         if self._plimit <= 0:
+            self._adaptive = False
             self._locked = {}
+            self._flushSpares(warm={})
             self.flush()
         else:
             while len(self._data) > self._plimit:
@@ -239,7 +568,7 @@ class _ProcessCache:
         """
         executable = _getExecutable(process)
         if executable in self._data:
-            rank, proxy = self._data[executable]
+            proxy = self._data[executable]
             if not isinstance(process, IrafProcess):
                 process = proxy.process
             # don't delete from cache if this is a duplicate process
@@ -258,6 +587,7 @@ class _ProcessCache:
         """
         process = self.delget(process)
         if isinstance(process, IrafProcess):
+            self._account(process)
             process.kill(verbose)
 
     def terminate(self, process):
@@ -266,6 +596,7 @@ class _ProcessCache:
         # when there are process errors.
         process = self.delget(process)
         if isinstance(process, IrafProcess):
+            self._account(process)
             process.terminate()
 
     def flush(self, *args):
@@ -279,26 +610,50 @@ class _ProcessCache:
                 if task is not None:
                     self.terminate(task)
         else:
-            for rank, proxy in list(self._data.values()):
-                executable = proxy.process.executable
+            for executable in list(self._data):
                 if executable not in self._locked:
                     self.terminate(executable)
+            # restart spares too (in case the executables have changed)
+            self._flushSpares()
 
     def list(self):
-        """List processes sorted from newest to oldest with locked flag"""
-        values = sorted(self._data.values())
-        values.reverse()
+        """List processes sorted from newest to oldest with locked flag
+
+        The list is followed by the usage statistics of the executables.
+        """
         n = 0
-        for rank, proxy in values:
+        for executable in reversed(self._data):
             n = n + 1
-            executable = proxy.process.executable
             if executable in self._locked:
                 print(f"{n:2d}: L {executable}")
             else:
                 print(f"{n:2d}:   {executable}")
+        with self._spareLock:
+            warm = sorted(self._warm.items())
+            nspares = {k: len(v) for k, v in self._spares.items()}
+        for executable, nwanted in warm:
+            print(f"    S {executable} "
+                  f"({nspares.get(executable, 0)}/{nwanted} spares ready)")
+        stats = self.stats()
+        if stats['executables']:
+            print(f"{'launches':>8s} {'reuses':>7s} {'connect':>8s} "
+                  f"{'kbytes':>9s}  executable")
+            for executable, estats in sorted(stats['executables'].items()):
+                print(f"{estats['launches']:8d} {estats['reuses']:7d} "
+                      f"{estats['connect_time']:7.2f}s "
+                      f"{estats['bytes'] / 1024:9.1f}  {executable}")
+        ntotal = stats['hits'] + stats['spare_hits'] + stats['misses']
+        if ntotal:
+            rate = 100.0 * (ntotal - stats['misses']) / ntotal
+            print(f"{stats['hits']} cache hits, {stats['spare_hits']} "
+                  f"spare hits, {stats['misses']} misses "
+                  f"({rate:.0f}% hit rate)")
+        if stats['adaptive']:
+            print(f"Adaptive cache size, currently {stats['limit']}")
 
     def __del__(self):
         self._locked = {}
+        self._flushSpares(warm={})
         self.flush()
 
 
@@ -315,6 +670,9 @@ def IrafExecute(task,
     using the provided envionmental variables."""
 
     global processCache
+    # the effects of the task are not kept in the startup snapshot
+    from .iraffunctions import _startupFile
+    _startupFile(None)
     try:
         # Start 'er up
         irafprocess = processCache.get(task, envdict)
@@ -391,7 +749,8 @@ class IrafProcess:
         """Start IRAF task executable."""
 
         self.executable = executable
-        self.process = subproc.Subprocess(executable + ' -c')
+        self.process = subproc.Subprocess(executable + ' -c',
+                                          maxChunkSize=IPC_READSIZE)
         self.running = 0  # flag indicating whether process is active
         self.task = None
         self.stdin = None
@@ -404,14 +763,21 @@ class IrafProcess:
         self.stdoutIsatty = 0
         self.envVarList = []
         self.par_set_msg_buf = ''
+        self.nbytes = 0  # bytes transferred (for cache statistics)
+
+    def initialize(self, envdict, cwd=None):
+        """Initialization: Copy environment variables to process
 
-    def initialize(self, envdict):
-        """Initialization: Copy environment variables to process"""
+        cwd is the working directory for the process (default: the
+        current directory).
+        """
 
         outenvstr = []
         for key, value in envdict.items():
             outenvstr.append(f"set {key}={str(value)}\n")
-        outenvstr.append(f"chdir {os.getcwd()}\n")
+        if cwd is None:
+            cwd = os.getcwd()
+        outenvstr.append(f"chdir {cwd}\n")
         if outenvstr:
             self.writeString("".join(outenvstr))
         self.envVarList = []
@@ -555,7 +921,7 @@ class IrafProcess:
         """Convert string or bytes to IRAF form and write to IRAF process"""
         if isinstance(s, str):
             s = s.encode()
-        self.write(Bytes2Iraf(s))
+        self._writeFramed(frameString(s))
 
     def readString(self):
         """Read IRAF string from process and convert to ascii string"""
@@ -563,22 +929,20 @@ class IrafProcess:
         return Iraf2Bytes(self.read()).decode()
 
     def write(self, data):
-        """write binary data to IRAF process in blocks of <= 4096 bytes"""
+        """write binary data to IRAF process in blocks of <= 4096 bytes
 
-        i = 0
-        block = 4096
+        All the records are framed into a single buffer, which is sent to
+        the process with one write.
+        """
+        self._writeFramed(frameRecords(data))
+
+    def _writeFramed(self, buf):
+        """write buffer of framed IRAF records to process"""
+        if not buf:
+            return
+        self.nbytes = self.nbytes + len(buf)
         try:
-            while i < len(data):
-                # Write:
-                #  IRAF magic number
-                #  number of following bytes
-                #  data
-                dsection = data[i:i + block]
-                # the arg parts to the following are all type bytes in PY3K
-                self.process.write(IPC_PREFIX +
-                                   struct.pack('=h', len(dsection)) +
-                                   dsection)
-                i = i + block
+            self.process.write(buf)
         except subproc.SubprocessError as e:
             raise IrafProcessError(f"Error in write: {str(e)}")
 
@@ -586,15 +950,17 @@ class IrafProcess:
         """Read binary data from IRAF pipe"""
         try:
             # read pipe header first (self.process is subproc.Subprocess)
-            header = self.process.read(4)  # read returns bytes
-            if header[0:2] != IPC_PREFIX:
+            header = self.process.read(IPC_HEADERSIZE)  # read returns bytes
+            if len(header) < IPC_HEADERSIZE:
+                raise IrafProcessError("Unexpected EOF reading IRAF pipe "
+                                       "record header")
+            prefix, nbytes = _ipc_header.unpack_from(header)
+            if prefix != IPC_PREFIX:
                 raise IrafProcessError("Not a legal IRAF pipe record: " +
-                                       str(header[0:2]))
-            ntemp = struct.unpack('=h', header[2:])
-            nbytes = ntemp[0]
+                                       str(prefix))
             # read the rest
-            data = self.process.read(nbytes)  # read returns bytes
-            return data
+            self.nbytes = self.nbytes + IPC_HEADERSIZE + nbytes
+            return self.process.read(nbytes)  # read returns bytes
         except subproc.SubprocessError as e:
             raise IrafProcessError(f"Error in read: {str(e)}")
 
@@ -1019,23 +1385,602 @@ class IrafProcess:
                                f"`{self.msg}'")
 
 
-# IRAF string conversions using numpy module
+# -----------------------------------------------------
+# concurrent execution of IRAF tasks
+# -----------------------------------------------------
+
+
+class TaskResult:
+    """Result of a task run by TaskExecutor
+
+    Attributes are the task name, the captured stdout and stderr text and
+    the parameter list (an irafpar.IrafParList) as it was at the end of
+    the run, including any output parameters set by the task.
+    """
+
+    def __init__(self, taskname, stdout, stderr, parList):
+        self.taskname = taskname
+        self.stdout = stdout
+        self.stderr = stderr
+        self.parList = parList
+
+    def __repr__(self):
+        return (f"<TaskResult {self.taskname}: {len(self.stdout)} chars "
+                f"stdout, {len(self.stderr)} chars stderr>")
+
+
+class StreamPipe:
+    """Pipe carrying the text output of a task running in a worker thread
+
+    The producing task writes to the pipe as to a file; the next stage of
+    the pipeline reads it as a file.  The pipe holds at most maxchunks
+    pieces of output (as sent by the task), so a fast producer waits for
+    the consumer.  Once the consumer closes the pipe, any further output
+    is discarded, but the producer still runs to completion.
+
+    close waits for the producer to finish, raises its exception if it
+    failed and copies its parameter changes back to the task (as a normal
+    run would do).
+    """
+
+    DFT_MAXCHUNKS = 256
+
+    def __init__(self, maxchunks=DFT_MAXCHUNKS):
+        self._queue = queue.Queue(maxchunks)
+        # data read from the queue but not returned yet: the chunks, the
+        # position in the first one and the number of characters left
+        self._chunks = collections.deque()
+        self._pos = 0
+        self._size = 0
+        self._eof = False  # end of data seen by reader
+        self._closed = False  # reader is finished
+        self._future = None  # result: list of parameter updates
+
+    def __repr__(self):
+        return f"<StreamPipe at {id(self):#x}>"
+
+    # writer side
+
+    def _put(self, chunk):
+        while True:
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                if self._closed:
+                    return
+
+    def write(self, s):
+        if s and not self._closed:
+            self._put(s)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def _finish(self):
+        """Signal end of data to the reader"""
+        if not self._closed:
+            self._put(None)
+
+    # reader side
+
+    def _fill(self):
+        """Get next chunk of data into the buffer; return false at EOF"""
+        if self._eof:
+            return False
+        chunk = self._queue.get()
+        if chunk is None:
+            self._eof = True
+            return False
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        return True
+
+    def _take(self, size):
+        """Remove and return the first size characters of the buffer"""
+        size = min(size, self._size)
+        self._size -= size
+        parts = []
+        while size > 0:
+            chunk = self._chunks[0]
+            end = self._pos + size
+            if end < len(chunk):
+                parts.append(chunk[self._pos:end])
+                self._pos = end
+                break
+            parts.append(chunk[self._pos:])
+            size -= len(chunk) - self._pos
+            self._chunks.popleft()
+            self._pos = 0
+        return ''.join(parts)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while self._fill():
+                pass
+            size = self._size
+        else:
+            while self._size < size and self._fill():
+                pass
+        return self._take(size)
+
+    def readline(self, size=-1):
+        # find the end of the line, chunk by chunk
+        length = 0
+        pos = self._pos
+        i = 0
+        while i < len(self._chunks) or self._fill():
+            chunk = self._chunks[i]
+            end = chunk.find('\n', pos)
+            if end >= 0:
+                length += end + 1 - pos
+                break
+            length += len(chunk) - pos
+            pos = 0
+            i += 1
+        if size is not None and 0 <= size < length:
+            length = size
+        return self._take(length)
+
+    def readlines(self):
+        return list(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def _detach(self):
+        """Stop reading and wait for the producer
+
+        Returns the list of (task, parList, save) parameter updates of
+        this and the preceding stages.
+        """
+        if not self._closed:
+            self._closed = True
+            self._chunks.clear()
+            self._pos = self._size = 0
+            # let a blocked writer finish
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+        if self._future is None:
+            return []
+        return self._future.result()
+
+    def close(self):
+        updates = self._detach()
+        self._future = None
+        for task, parList, save in updates:
+            task._updateParList(save, parList)
+
+
+class _TaskRun:
+    """Stand-in for an IrafTask during a run submitted to TaskExecutor
+
+    Parameter requests from the IRAF process are served from a private
+    copy of the task parameters, so that concurrent runs of the same task
+    do not interfere.  Submitted tasks never prompt for parameters.
+    Parameters that are not in the task's own list (package and cl
+    parameters) are taken from the real task.
+    """
+
+    def __init__(self, task, parList):
+        self.task = task
+        self.parList = parList
+
+    def getName(self):
+        return self.task.getName()
+
+    def getTbflag(self):
+        return self.task.getTbflag()
+
+    def _getPar(self, qualifiedName):
+        """Return (IrafPar, index, field) or None if not in private list"""
+        from .iraftask import _splitName
+        package, task, paramname, pindex, field = _splitName(qualifiedName)
+        if package or (task and task != self.task.getName()):
+            return None
+        paramdict = self.parList.getParDict()
+        if paramdict._has(paramname):
+            return paramdict[paramname], pindex, field
+        return None
+
+    def getParObject(self, paramname):
+        found = self._getPar(paramname)
+        if found is None:
+            return self.task.getParObject(paramname, alldict=1)
+        return found[0]
+
+    def getParam(self, qualifiedName, native=1, mode=None, exact=0, prompt=0):
+        found = self._getPar(qualifiedName)
+        if found is None:
+            return self.task.getParam(qualifiedName, native=native, prompt=0)
+        par, pindex, field = found
+        v = par.get(index=pindex, field=field, native=native, prompt=0)
+        if isinstance(v, str) and v[:1] == ")":
+            # parameter indirection
+            return self.getParam(v[1:], native=native)
+        return v
+
+    def setParam(self, qualifiedName, newvalue, check=1):
+        found = self._getPar(qualifiedName)
+        if found is None:
+            self.task.setParam(qualifiedName, newvalue, check=check)
+        else:
+            par, pindex, field = found
+            par.set(newvalue, index=pindex, field=field, check=check)
+
+
+class _WorkerProcess(IrafProcess):
+    """IRAF process used by the TaskExecutor worker threads
+
+    The global sys streams are left alone while answering parameter
+    requests (there is no prompting).  Graphics output and CL commands
+    (other than the current package and terminal size requests) are
+    refused, since they would use the graphics kernel and CL state
+    shared by all threads.
+    """
+
+    def par_get(self, mcmd):
+        try:
+            pmsg = self.task.getParam(mcmd.group('gname'), native=0)
+            if not isinstance(pmsg, str):
+                # pset parameter
+                pmsg = self.task.getParObject(mcmd.group('gname')).get(lpar=1)
+            else:
+                pmsg = pmsg.replace('\n', '\\n')
+            pmsg = pmsg + '\n'
+        except EOFError:
+            pmsg = 'EOF\n'
+        self.writeString(pmsg)
+        self.msg = self.msg[mcmd.end():]
+
+    def xmit(self):
+        chan = self.msg[5:self.msg.find(",", 5)]
+        if chan in ('6', '7', '9'):
+            raise IrafProcessError("Graphics output is not supported for "
+                                   "submitted tasks")
+        IrafProcess.xmit(self)
+
+    def executeClCommand(self):
+        # general CL commands and OS escapes run in the PyRAF session
+        # (package state, redirection of the sys streams), which must not
+        # be changed from a worker thread
+        mcmd = _re_clcmd.match(self.msg)
+        if mcmd is None or mcmd.group('sysescape'):
+            cmd = self.msg.split("\n", 1)[0]
+            raise IrafProcessError(f"CL command `{cmd}' is not supported "
+                                   "for submitted tasks")
+        IrafProcess.executeClCommand(self)
+
+    def setStdio(self):
+        pass
+
+
+class TaskExecutor:
+    """Run IRAF executable tasks concurrently
+
+    Each executable gets its own pool of worker threads (DFT_WORKERS by
+    default, see setWorkers), and each worker drives a connected IRAF
+    process of its own.  Idle processes are kept for reuse by later runs
+    of tasks in the same executable and are independent of the
+    processCache used for normal task execution.
+
+    Every submitted run gets a snapshot of the task parameters with the
+    arguments applied and captures its stdout and stderr; the parameter
+    changes made by the task are returned in the TaskResult and are not
+    copied back to the task.
+    """
+
+    DFT_WORKERS = 4
+
+    def __init__(self, workers=DFT_WORKERS):
+        self._dftWorkers = workers
+        self._workers = {}  # worker counts for specific executables
+        self._pools = {}  # thread pools indexed by executable
+        self._idle = {}  # lists of (process, envdict, cwd) by executable
+        self._lock = threading.Lock()
+
+    def setWorkers(self, n, *args):
+        """Set the number of workers for the given tasks
+
+        Takes task names (strings) as arguments; with no tasks given,
+        the default number of workers is set.  The change applies to
+        executables that have not been used yet.
+        """
+        if n < 1:
+            raise ValueError("Number of workers must be at least 1")
+        if not args:
+            self._dftWorkers = n
+        for taskname in args:
+            self._workers[_getExecutable(taskname)] = n
+
+    def submit(self, task, *args, **kw):
+        """Submit an IRAF executable task for execution
+
+        task can be an IrafTask or a task name; the other arguments are
+        the task parameters, as for a normal task call.  Returns a
+        concurrent.futures.Future with a TaskResult as result.
+        """
+        if isinstance(task, str):
+            taskname = task
+            task = iraf.getTask(taskname, found=1)
+            if task is None:
+                raise IrafError(f"No such task `{taskname}'")
+        if task.__class__.__name__ != "IrafTask":
+            raise IrafError(f"Task `{task.getName()}' is not an IRAF "
+                            "executable task and cannot be submitted")
+        for key in kw:
+            if key in ('Stdin', 'Stdout', 'StdoutAppend', 'Stderr',
+                       'StderrAppend', 'StdoutG', 'StdoutAppendG'):
+                raise IrafError(f"I/O redirection (`{key}') is not "
+                                "supported for submitted tasks")
+        executable, run, envdict, cwd = self._snapshot(task, args, kw)
+        with self._lock:
+            pool = self._pools.get(executable)
+            if pool is None:
+                nworkers = self._workers.get(executable, self._dftWorkers)
+                pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=nworkers)
+                self._pools[executable] = pool
+        return pool.submit(self._run, executable, run, envdict, cwd)
+
+    def _snapshot(self, task, args, kw):
+        """Snapshot parameters and environment in the calling thread
+
+        Returns executable, _TaskRun, environment and working directory.
+        """
+        from . import irafpar
+        task.initTask(force=1)
+        parList = irafpar.IrafParList(task.getName(),
+                                      parlist=task.getParList(docopy=1))
+        parList.setParList(*args, **kw)
+        mode = task.getMode(parList)
+        for p in parList.getParList():
+            p.mode = p.mode.replace("a", mode)
+        return (task.getFullpath(), _TaskRun(task, parList),
+                dict(iraf.getVarDict()), os.getcwd())
+
+    def stream(self, task, *args, Stdin=None, Stdout=None, _save=0, **kw):
+        """Start an IRAF executable task as a stage of a streaming pipe
+
+        The task runs in a thread of its own (so that a pipeline never
+        waits for a free worker) and reads Stdin, which may be None (no
+        input), a list of lines or the StreamPipe of the previous stage.
+        Returns the StreamPipe carrying its output.  The task's stderr
+        goes to the sys.stderr of the caller.
+        """
+        try:
+            executable, run, envdict, cwd = self._snapshot(task, args, kw)
+        except BaseException:
+            if isinstance(Stdin, StreamPipe):
+                # raises the error of the previous stage, if any
+                Stdin.close()
+            raise
+        if Stdin is None:
+            pstdin = io.StringIO()
+        elif isinstance(Stdin, StreamPipe):
+            pstdin = Stdin
+        else:
+            redirKW, closeFHList = iraf.redirProcess({'Stdin': Stdin})
+            pstdin = redirKW.get('stdin', io.StringIO())
+        pipe = StreamPipe()
+        pipe._future = concurrent.futures.Future()
+        threading.Thread(target=self._runStream,
+                         args=(executable, run, envdict, cwd, pstdin, pipe,
+                               sys.stderr, _save),
+                         name=f'pyraf-pipe-{run.getName()}',
+                         daemon=True).start()
+        return pipe
+
+    def _runStream(self, executable, run, envdict, cwd, pstdin, pipe,
+                   pstderr, save):
+        """Run a streaming pipe stage in its own thread"""
+        future = pipe._future
+        future.set_running_or_notify_cancel()
+        try:
+            try:
+                process = self._getProcess(executable, envdict, cwd)
+                try:
+                    process.run(run,
+                                pstdin=pstdin,
+                                pstdout=pipe,
+                                pstderr=pstderr)
+                except (IrafError, IrafProcessError,
+                        subproc.SubprocessError) as e:
+                    process.kill(verbose=0)
+                    raise IrafError(f"Error running IRAF task "
+                                    f"{run.getName()}\n{str(e)}")
+                except BaseException:
+                    process.kill(verbose=0)
+                    raise
+                with self._lock:
+                    self._idle.setdefault(executable, []).append(
+                        (process, envdict, cwd))
+            finally:
+                pipe._finish()
+                # wait for the previous stage, which may have failed
+                updates = []
+                if isinstance(pstdin, StreamPipe):
+                    updates = pstdin._detach()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(updates + [(run.task, run.parList, save)])
+
+    def _getProcess(self, executable, envdict, cwd):
+        """Get an idle process for executable or start a new one"""
+        with self._lock:
+            idle = self._idle.get(executable)
+            entry = idle.pop() if idle else None
+        if entry is None:
+            process = _WorkerProcess(executable)
+            process.initialize(envdict, cwd)
+            return process
+        process, penvdict, pcwd = entry
+        # send environment changes since the process was last used
+        for key, value in envdict.items():
+            if penvdict.get(key) != value:
+                process.appendEnv(f"set {key}={str(value)}\n")
+        # the IRAF process has no unset; an empty value comes closest
+        for key in penvdict:
+            if key not in envdict:
+                process.appendEnv(f"set {key}=\n")
+        if cwd != pcwd:
+            process.appendEnv(f"chdir {cwd}\n")
+        return process
+
+    def _run(self, executable, run, envdict, cwd):
+        """Run the task in a worker thread"""
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        process = self._getProcess(executable, envdict, cwd)
+        try:
+            process.run(run,
+                        pstdin=io.StringIO(),
+                        pstdout=stdout,
+                        pstderr=stderr)
+        except (IrafError, IrafProcessError, subproc.SubprocessError) as e:
+            process.kill(verbose=0)
+            raise IrafError(f"Error running IRAF task {run.getName()}\n"
+                            f"{str(e)}")
+        except BaseException:
+            process.kill(verbose=0)
+            raise
+        with self._lock:
+            self._idle.setdefault(executable, []).append(
+                (process, envdict, cwd))
+        return TaskResult(run.getName(), stdout.getvalue(),
+                          stderr.getvalue(), run.parList)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Wait for submitted tasks and terminate all worker processes
+
+        With cancel_futures, submitted tasks that have not started yet
+        are cancelled (Python 3.9 and later).
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            if cancel_futures and sys.version_info >= (3, 9):
+                pool.shutdown(wait=wait, cancel_futures=True)
+            else:
+                pool.shutdown(wait=wait)
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+        for entries in idle.values():
+            for process, envdict, cwd in entries:
+                process.terminate()
+
+
+taskExecutor = TaskExecutor()
+
+
+def frameRecords(data):
+    """Split binary data into IRAF pipe records in a single buffer
+
+    Each record consists of the IRAF magic number, the number of
+    following bytes and at most IPC_BLOCKSIZE data bytes.  The data are
+    copied directly from a memoryview into a preallocated bytearray, so
+    no intermediate bytes objects are created for the blocks.
+    """
+    data = memoryview(data).cast('B')
+    ndata = len(data)
+    if 0 < ndata <= IPC_BLOCKSIZE:
+        # single record
+        return _ipc_header.pack(IPC_PREFIX, ndata) + data
+    nblocks = (ndata + IPC_BLOCKSIZE - 1) // IPC_BLOCKSIZE
+    buf = bytearray(ndata + nblocks * IPC_HEADERSIZE)
+    pack_into = _ipc_header.pack_into
+    pos = 0
+    for i in range(0, ndata, IPC_BLOCKSIZE):
+        dsection = data[i:i + IPC_BLOCKSIZE]
+        n = len(dsection)
+        pack_into(buf, pos, IPC_PREFIX, n)
+        pos = pos + IPC_HEADERSIZE
+        buf[pos:pos + n] = dsection
+        pos = pos + n
+    return buf
+
+
+def frameString(b):
+    """Translate bytes to IRAF format and split into IRAF pipe records
+
+    This is equivalent to frameRecords(Bytes2Iraf(b)), but the characters
+    are translated directly into the record buffer.
+    """
+    nchars = IPC_BLOCKSIZE // 2
+    if 0 < len(b) <= nchars:
+        # single record
+        return _ipc_header.pack(IPC_PREFIX, 2 * len(b)) + Bytes2Iraf(b)
+    nblocks = (len(b) + nchars - 1) // nchars
+    buf = bytearray(2 * len(b) + nblocks * IPC_HEADERSIZE)
+    pack_into = _ipc_header.pack_into
+    pos = 0
+    for i in range(0, len(b), nchars):
+        section = b[i:i + nchars]
+        n = 2 * len(section)
+        pack_into(buf, pos, IPC_PREFIX, n)
+        pos = pos + IPC_HEADERSIZE
+        Bytes2IrafInto(section, buf, pos)
+        pos = pos + n
+    return buf
+
+
+# IRAF string conversions
+
+# An IRAF character is a 16-bit integer holding a sign-extended byte.
+# The conversions use bytes slicing and translation (which run in C)
+# rather than numpy, so short messages carry no array creation overhead.
+
+# offsets of the low and high byte of an IRAF character in memory
+_loByte, _hiByte = (1, 0) if isBigEndian else (0, 1)
+
+# codec for pure ASCII strings (the common case), where the high bytes
+# are all zero
+_asciiCodec = 'utf-16-be' if isBigEndian else 'utf-16-le'
+
+# high byte of the IRAF character for each byte value
+_signExtension = bytes(0xff if i >= 0x80 else 0 for i in range(256))
 
 
 def Bytes2Iraf(b):
     """translate bytes to IRAF 16-bit string format"""
-    inarr = numpy.frombuffer(b, numpy.int8)
-    retval = inarr.astype(numpy.int16).tobytes()
-    #   log_task_comm('Asc2IrafString (write to task)', retval, False)
-    return retval
+    try:
+        return b.decode('ascii').encode(_asciiCodec)
+    except UnicodeDecodeError:
+        return bytes(Bytes2IrafInto(b, bytearray(2 * len(b))))
+
+
+def Bytes2IrafInto(b, out, offset=0):
+    """translate bytes to IRAF 16-bit string format into a writable buffer
+
+    The 2*len(b) bytes starting at offset in out are overwritten.  Returns
+    out.
+    """
+    b = bytes(b)
+    end = offset + 2 * len(b)
+    out[offset + _loByte:end:2] = b
+    out[offset + _hiByte:end:2] = b.translate(_signExtension)
+    return out
 
 
 def Iraf2Bytes(iraf_string):
     """translate 16-bit IRAF characters to ascii"""
-    inarr = numpy.frombuffer(iraf_string, numpy.int16)
-    retval = inarr.astype(numpy.int8).tobytes()
-    #   log_task_comm('Iraf2AscString', retval, True)
-    return retval
+    # the 8-bit character is the low byte of each 16-bit character
+    return bytes(iraf_string[_loByte::2])
 
 
 def log_task_comm(pfx, strbuf, expectAsStr, shorten=True):
@@ -82,6 +82,7 @@ from . import irafpar as _irafpar
 from . import iraftask as _iraftask
 from . import irafexecute as _irafexecute
 from . import cl2py as _cl2py
+from . import clcache as _clcache
 from . import gki
 from . import irafecl
 from . import scanf as sscanf
@@ -125,6 +126,25 @@ loadedPath = []
 
 cl = None
 
+# OS environment variables looked up during startup (see Init)
+_startupEnv = None
+
+# files read or probed during startup (see Init), with the key None for
+# a dependency that cannot be checked
+_startupFiles = None
+
+
+def _startupFile(filename):
+    """Remember a file the startup snapshot depends on
+
+    filename None stands for a dependency that cannot be checked or an
+    effect that the snapshot does not keep (an output file, an OS
+    command, an executable task, process cache settings, the terminal
+    size); no snapshot is saved then.
+    """
+    if _startupFiles is not None:
+        _startupFiles[filename] = 1
+
 # -----------------------------------------------------
 # help: implemented in irafhelp.py
 # -----------------------------------------------------
@@ -142,7 +162,7 @@ from .irafhelp import help
 
 def Init(doprint=1, hush=0, savefile=None):
     """Basic initialization of IRAF environment"""
-    global _pkgs, cl
+    global _pkgs, _startupEnv, _startupFiles
     if savefile is not None:
         restoreFromFile(savefile, doprint=doprint)
         return
@@ -183,62 +203,94 @@ def Init(doprint=1, hush=0, savefile=None):
         global userIrafHome
         set(home=userIrafHome)
 
-        # define initial symbols
-        if _irafinst.EXISTS:
-            clProcedure(Stdin='hlib$zzsetenv.def')
+        loginfile = _findLoginFile()
+        snapshot = _snapshotFile() if hush else None
+        if snapshot:
+            key = _snapshotKey(loginfile)
+        if not (snapshot and _loadSnapshot(snapshot, key)):
+            _startupEnv = {}
+            _startupFiles = {}
+            cwd = _os.getcwd()
+            try:
+                _initClpackage(loginfile, hush)
+            finally:
+                env, _startupEnv = _startupEnv, None
+                files, _startupFiles = _startupFiles, None
+            # make clpackage the current package
+            loadedPath.append(clpkg)
+            # a login.cl that changes the directory or depends on
+            # something else than files cannot be skipped
+            if snapshot and _os.getcwd() == cwd and None not in files:
+                # uparm files written later would invalidate the snapshot
+                _irafpar.parWriter.flush()
+                _saveSnapshot(snapshot, key, env, files)
+        if doprint:
+            listTasks('clpackage')
 
-        # define clpackage
-        if _irafinst.EXISTS:
-            fname = 'hlib$clpackage.cl'
-        else:
-            fname = f'{_irafinst.NO_IRAF_PFX}/clpackage.cl'
-
-        global clpkg
-        clpkg = IrafTaskFactory('', 'clpackage', '.pkg', fname,
-                                'clpackage', 'bin$')
-
-        # add the cl as a task, because its parameters are sometimes needed,
-        # but make it a hidden task
-        # cl is implemented as a Python task
-        cl = IrafTaskFactory('',
-                             'cl',
-                             '',
-                             'cl$cl.par',
-                             'clpackage',
-                             'bin$',
-                             function=_clProcedure)
-        cl.setHidden()
-
-        # load clpackage
-        clpkg.run(_doprint=0, _hush=hush, _save=1)
-
-        if not _irafinst.EXISTS:
-            fname = f'{_irafinst.NO_IRAF_PFX}/login.cl'
-        elif access('login.cl'):
-            fname = _os.path.abspath('login.cl')
-        elif access('home$login.cl'):
-            fname = 'home$login.cl'
-        elif access(_os.path.expanduser('~/.iraf/login.cl')):
-            fname = _os.path.expanduser('~/.iraf/login.cl')
-        elif access('/etc/iraf/login.cl'):
-            fname = '/etc/iraf/login.cl'
-        elif access('hlib$login.cl'):
-            fname = 'hlib$login.cl'
-        else:
-            fname = None
+        # start spare processes for executables listed in PYRAF_PRCACHE_WARM
+        warm = _os.environ.get('PYRAF_PRCACHE_WARM')
+        if warm:
+            prcacheWarm(*[x for x in warm.split(':') if x])
 
-        if fname:
-            # define and load user package
-            userpkg = IrafTaskFactory('', 'user', '.pkg', fname, 'clpackage',
-                                      'bin$')
-            userpkg.run(_doprint=0, _hush=hush, _save=1)
-        else:
-            _writeError("Warning: no login.cl found")
 
-        # make clpackage the current package
-        loadedPath.append(clpkg)
-        if doprint:
-            listTasks('clpackage')
+def _findLoginFile():
+    """Return the name of the login.cl file to use (None if not found)"""
+    if not _irafinst.EXISTS:
+        return f'{_irafinst.NO_IRAF_PFX}/login.cl'
+    elif access('login.cl'):
+        return _os.path.abspath('login.cl')
+    elif access('home$login.cl'):
+        return 'home$login.cl'
+    elif access(_os.path.expanduser('~/.iraf/login.cl')):
+        return _os.path.expanduser('~/.iraf/login.cl')
+    elif access('/etc/iraf/login.cl'):
+        return '/etc/iraf/login.cl'
+    elif access('hlib$login.cl'):
+        return 'hlib$login.cl'
+    return None
+
+
+def _initClpackage(loginfile, hush):
+    """Define and load clpackage and the user package from loginfile"""
+    global cl, clpkg
+
+    # define initial symbols
+    if _irafinst.EXISTS:
+        clProcedure(Stdin='hlib$zzsetenv.def')
+
+    # define clpackage
+    clpkg = IrafTaskFactory('', 'clpackage', '.pkg', _clpackageFile(),
+                            'clpackage', 'bin$')
+
+    # add the cl as a task, because its parameters are sometimes needed,
+    # but make it a hidden task
+    # cl is implemented as a Python task
+    cl = IrafTaskFactory('',
+                         'cl',
+                         '',
+                         'cl$cl.par',
+                         'clpackage',
+                         'bin$',
+                         function=_clProcedure)
+    cl.setHidden()
+
+    # load clpackage
+    clpkg.run(_doprint=0, _hush=hush, _save=1)
+
+    if loginfile:
+        # define and load user package
+        userpkg = IrafTaskFactory('', 'user', '.pkg', loginfile, 'clpackage',
+                                  'bin$')
+        userpkg.run(_doprint=0, _hush=hush, _save=1)
+    else:
+        _writeError("Warning: no login.cl found")
+
+
+def _clpackageFile():
+    """Return the name of the clpackage.cl file"""
+    if _irafinst.EXISTS:
+        return 'hlib$clpackage.cl'
+    return f'{_irafinst.NO_IRAF_PFX}/clpackage.cl'
 
 
 def _getIrafEnv():
@@ -348,12 +400,18 @@ unsavedVars = [
     '_radixDigits',
     '_re_taskname',
     '_reFormat',
+    '_scanConverters',
+    '_structPatterns',
     '_sttyArgs',
     '_tmpfileCounter',
     '_clExecuteCount',
+    '_startupEnv',
+    '_startupFiles',
     '_unsavedVarsDict',
     'IrafTask',
     'IrafPkg',
+    'PIPE',
+    '_pipeMode',
     'cl',
     'division',
     'epsilon',
@@ -405,22 +463,8 @@ def saveToFile(savefile, **kw):
         # open binary pickle file
         fh = open(savefile, 'wb')
         doclose = 1
-    # make a shallow copy of the dictionary and edit out
-    # functions, modules, and objects named in _unsavedVarsDict
-    gdict = globals().copy()
-    for key in list(gdict.keys()):
-        item = gdict[key]
-        if isinstance(item, (_types.FunctionType, _types.ModuleType)) or \
-                key in _unsavedVarsDict:
-            del gdict[key]
-
-
-#   print('\n\n\n',gdict.keys()) # DBG: debug line
-# save just the value of Verbose, not the object
-    global Verbose
-    gdict['Verbose'] = Verbose.get()
-    p = _pickle.Pickler(fh, 1)
-    p.dump(gdict)
+    p = _pickle.Pickler(fh, _pickle.HIGHEST_PROTOCOL)
+    p.dump(_saveState())
     if doclose:
         fh.close()
 
@@ -440,15 +484,33 @@ def restoreFromFile(savefile, doprint=1, **kw):
     udict = u.load()
     if doclose:
         fh.close()
+    _restoreState(udict)
+    if doprint:
+        listCurrent()
 
-    # restore the value of Verbose
 
-    global Verbose
+def _saveState():
+    """Return a dictionary with the picklable state of the IRAF environment"""
+    # make a shallow copy of the dictionary and edit out
+    # functions, modules, and objects named in _unsavedVarsDict
+    gdict = globals().copy()
+    for key in list(gdict.keys()):
+        item = gdict[key]
+        if isinstance(item, (_types.FunctionType, _types.ModuleType)) or \
+                key in _unsavedVarsDict:
+            del gdict[key]
+    # save just the value of Verbose, not the object
+    gdict['Verbose'] = Verbose.get()
+    return gdict
+
+
+def _restoreState(udict):
+    """Restore the IRAF environment from a _saveState dictionary"""
+    # restore the value of Verbose
     Verbose.set(udict['Verbose'])
     del udict['Verbose']
 
     # replace the contents of loadedPath
-    global loadedPath
     loadedPath[:] = udict['loadedPath']
     del udict['loadedPath']
 
@@ -467,12 +529,126 @@ def restoreFromFile(savefile, doprint=1, **kw):
         if hasattr(module, 'INDEF'):
             module.INDEF = INDEF
 
-    # replace cl in the iraf module (and possibly other locations)
+    # put the tasks back in the global namespaces (cl is not saved
+    # by name, it is found in the task list)
     global cl
-    _addTask(cl)
+    cl = _tasks.get('clpackage.cl')
+    for task in _tasks.values():
+        if isinstance(task, IrafPkg):
+            _irafnames.strategy.addPkg(task)
+        _irafnames.strategy.addTask(task)
+    known = {id(task) for task in _iraftask.all_task_definitions}
+    _iraftask.all_task_definitions.extend(
+        task for task in _tasks.values() if id(task) not in known)
 
-    if doprint:
-        listCurrent()
+
+# -----------------------------------------------------
+# startup snapshot: the state after loading clpackage and
+# login.cl, used by Init (with hush set) instead of running them
+# -----------------------------------------------------
+
+_SNAPSHOT_VERSION = 1
+
+
+def _snapshotFile():
+    """Return the name of the startup snapshot file (None if disabled)
+
+    The PYRAF_STARTUP_SNAPSHOT environment variable overrides the
+    default file in the cache directory; 'disable' turns it off.
+    """
+    snapshot = _os.environ.get('PYRAF_STARTUP_SNAPSHOT')
+    if snapshot == 'disable':
+        return None
+    elif snapshot:
+        return snapshot
+    elif _clcache.clcache_path:
+        return _os.path.join(_clcache.clcache_path[0], 'startup.pickle')
+    return None
+
+
+def _snapshotKey(loginfile):
+    """Return the snapshot key for the state before loading clpackage"""
+    from . import __version__
+    return {
+        'version': _SNAPSHOT_VERSION,
+        'pyraf': __version__,
+        'python': _sys.version,
+        'clcache': _clcache._currentVersion(),
+        'irafinst': _irafinst.EXISTS,
+        'vars': dict(_varDict),
+        'loginfile': loginfile,
+    }
+
+
+def _fileStamp(filename):
+    """Return (mtime, size) of a file, None if it does not exist"""
+    try:
+        st = _os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _saveSnapshot(snapshot, key, env, files=()):
+    """Save the IRAF environment to the startup snapshot file
+
+    key is the _snapshotKey from before the startup, env is a dictionary
+    with the OS environment variables that were looked up during startup
+    and files are the other files read or probed during startup
+    (including the ones that did not exist).  Errors are ignored: without
+    a snapshot the next startup is just slower.
+    """
+    files = [_clpackageFile(), *files]
+    if _irafinst.EXISTS:
+        files.append('hlib$zzsetenv.def')
+    if key['loginfile']:
+        files.append(key['loginfile'])
+    for task in _tasks.values():
+        files.extend(task.getSourceFiles())
+    key = dict(key, env=env)
+    tmpfile = f'{snapshot}.{_os.getpid()}.tmp'
+    try:
+        key['files'] = {
+            fname: _fileStamp(fname)
+            for fname in {Expand(fname, noerror=1) for fname in files}
+        }
+        with open(tmpfile, 'wb') as fh:
+            _pickle.dump(key, fh, _pickle.HIGHEST_PROTOCOL)
+            _pickle.dump(_saveState(), fh, _pickle.HIGHEST_PROTOCOL)
+        _os.replace(tmpfile, snapshot)
+    except Exception:
+        try:
+            _os.remove(tmpfile)
+        except OSError:
+            pass
+
+
+def _loadSnapshot(snapshot, key):
+    """Restore the IRAF environment from the startup snapshot file
+
+    Returns true if the snapshot was valid and was loaded.  A snapshot
+    is valid if it was written by the same versions of PyRAF and Python
+    with the same variables defined so far, and none of the OS environment
+    variables and files used during its startup have changed.
+    """
+    try:
+        with open(snapshot, 'rb') as fh:
+            skey = _pickle.load(fh)
+            env = skey.pop('env')
+            files = skey.pop('files')
+            if skey != key:
+                return False
+            for var, value in env.items():
+                if _os.environ.get(var) != value:
+                    return False
+            for fname, stamp in files.items():
+                if _fileStamp(fname) != stamp:
+                    return False
+            udict = _pickle.load(fh)
+    except Exception:
+        return False
+    _restoreState(udict)
+    return True
 
 
 # -----------------------------------------------------
@@ -1064,6 +1240,9 @@ def envget(var, default=None):
     try:
         return _varDict[var]
     except KeyError:
+        if _startupEnv is not None:
+            # remember OS variables the startup snapshot depends on
+            _startupEnv[var] = _os.environ.get(var)
         try:
             return _os.environ[var]
         except KeyError:
@@ -1632,7 +1811,11 @@ def access(filename):
     filename = _denode(filename)
     # Magic values that trigger special behavior
     magicValues = {"STDIN": 1, "STDOUT": 1, "STDERR": 1}
-    return filename in magicValues or _os.path.exists(Expand(filename))
+    if filename in magicValues:
+        return True
+    filename = Expand(filename)
+    _startupFile(filename)
+    return _os.path.exists(filename)
 
 
 def fp_equal(x, y):
@@ -1765,6 +1948,9 @@ def imaccess(filename):
     # Edge case not handled below:
     if filename.find('[]') != -1:
         return 0
+    # the image files are not known, so the startup snapshot cannot
+    # check them
+    _startupFile(None)
     # If we get this far, use imheader to test existence.
     # Any error output is taken to mean failure.
     sout = _io.StringIO()
@@ -2065,6 +2251,143 @@ def _isStruct(theLocals, name, checklegal=0):
         return 0
 
 
+# patterns matching the fields before a struct and one following whitespace
+_structPatterns = {}
+
+
+def _scanString(value):
+    # strings without quotes or escapes are not changed by the coercion
+    if '"' in value or "'" in value or '\\' in value:
+        raise ValueError(value)
+    return value
+
+
+_scanConverters = {
+    'i': int,
+    'r': lambda value: clFloat(float(value)),
+    'd': lambda value: clFloat(float(value)),
+    's': _scanString,
+    'f': _scanString,
+    'struct': _scanString,
+}
+
+
+def _scanConverter(pars):
+    """Return a fast conversion function for scanned fields, or None
+
+    The conversion is used for unconstrained parameters of the basic
+    types; it gives the same values as the parameter coercion, or
+    raises ValueError for values that need the full parameter set.
+    """
+    if len(pars) != 1:
+        return None
+    par = pars[0]
+    if type(par).set is not _irafpar.IrafPar.set or par.min is not None or \
+            par.max is not None or par.choice is not None:
+        return None
+    return _scanConverters.get(par.type)
+
+
+class ScanTargets:
+    """Parameters set by a scan or fscan call translated by cl2py
+
+    cl2py creates one instance for every scan/fscan call in a procedure
+    that sets only parameters of the procedure parameter list (Vars).
+    The fields of a line are converted by functions chosen on first use
+    (see _scanConverter) and assigned directly to the parameter objects,
+    instead of building and executing assignments by name as the fscan
+    function does for other variables.
+    """
+
+    def __init__(self, parList, names):
+        self.parList = parList
+        self.names = names
+        self.pars = None
+
+    def _resolve(self):
+        # all matching parameter objects are set, like setParam does
+        self.pars = [tuple(self.parList.getParObjects(name).values())
+                     for name in self.names]
+        self.converters = [_scanConverter(pars) for pars in self.pars]
+
+    def _structError(self, i):
+        return TypeError(f"Struct type param `{self.names[i]}' "
+                         "must be the final argument to scan")
+
+    def set(self, line):
+        """Set the parameters from line and return the number set"""
+        if self.pars is None:
+            self._resolve()
+        f = line.split()
+        n = min(len(f), len(self.pars))
+        # null input is OK if the first variable is a struct
+        if n == 0 and self.pars and self.pars[0][0].type == 'struct':
+            f = ['']
+            n = 1
+        for i in range(n):
+            pars = self.pars[i]
+            if pars[0].type == 'struct':
+                if i < len(self.pars) - 1:
+                    raise self._structError(i)
+                # struct gets the rest of the line with embedded whitespace
+                if i == 0:
+                    iend = 0
+                else:
+                    pattern = _structPatterns.get(i)
+                    if pattern is None:
+                        pattern = _re.compile(r'(?:\s*\S+){%d}\s' % i)
+                        _structPatterns[i] = pattern
+                    iend = pattern.match(line).end()
+                if line[-1:] == '\n':
+                    value = line[iend:-1]
+                else:
+                    value = line[iend:]
+            else:
+                value = f[i]
+            convert = self.converters[i]
+            if convert is not None:
+                try:
+                    pars[0].value = convert(value)
+                    pars[0].setChanged()
+                    continue
+                except ValueError:
+                    pass
+            try:
+                for par in pars:
+                    par.set(value)
+            except ValueError:
+                return i
+        return n
+
+    def setEOF(self):
+        """Set an undefined struct to the null string at EOF (see _weirdEOF)"""
+        if self.pars is None:
+            self._resolve()
+        if self.pars and self.pars[0][0].type == 'struct' and \
+                not self.pars[0][0].isLegal():
+            if len(self.pars) > 1:
+                raise self._structError(0)
+            for par in self.pars[0]:
+                par.set("")
+
+
+def fscanPars(targets, line):
+    """fscan function for calls translated by cl2py (see ScanTargets)
+
+    line is a function returning the line to scan, so that EOF on list
+    parameters can be caught here.
+    """
+    global _nscan
+    try:
+        line = line()
+    except EOFError:
+        targets.setEOF()
+        _nscan = 0
+        return EOF
+    _nscan = targets.set(line)
+    return _nscan
+
+
 def scan(theLocals, *namelist, **kw):
     """Scan function sets parameters from line read from stdin
 
@@ -2097,6 +2420,31 @@ def scan(theLocals, *namelist, **kw):
         redirReset(resetList, closeFHList)
 
 
+def scanPars(targets, **kw):
+    """scan function for calls translated by cl2py (see ScanTargets)"""
+    global _nscan
+    redirKW, closeFHList = redirProcess(kw)
+    if '_save' in kw:
+        del kw['_save']
+    resetList = redirApply(redirKW)
+    try:
+        if len(kw):
+            raise TypeError('unexpected keyword argument: ' +
+                            repr(list(kw.keys())))
+        line = _irafutils.tkreadline()
+        # null line means EOF
+        if line == "":
+            targets.setEOF()
+            _nscan = 0
+            return EOF
+        _nscan = targets.set(line)
+        return _nscan
+    except Exception as ex:
+        print('iraf.scan exception: ' + str(ex))
+    finally:
+        redirReset(resetList, closeFHList)
+
+
 def scanf(theLocals, format, *namelist, **kw):
     """Formatted scan function sets parameters from line read from stdin
 
@@ -2240,6 +2588,7 @@ def beep(**kw):
 def clOscmd(s, **kw):
     """Execute a system-dependent command in the shell, returning status"""
 
+    _startupFile(None)
     # handle redirection and save keywords
     redirKW, closeFHList = redirProcess(kw)
     if '_save' in kw:
@@ -2321,6 +2670,7 @@ def stty(terminal=None, **kw):
     elif expkw['resize'] or expkw['terminal'] == "resize":
         # resize: sets CL env parameters giving screen size; show errors
         if _sys.stdout.isatty():
+            _startupFile(None)
             nlines, ncols = _wutil.getTermWindowSize()
             set(ttyncols=str(ncols), ttynlines=str(nlines))
     elif expkw['terminal']:
@@ -2329,6 +2679,7 @@ def stty(terminal=None, **kw):
         # get the dimensions if not given. This is more than the CL does.
         if ('nlines' not in kw) and ('ncols' not in kw) and \
            _sys.stdout.isatty():
+            _startupFile(None)
             try:
                 nlines, ncols = _wutil.getTermWindowSize()
                 set(ttyncols=str(ncols), ttynlines=str(nlines))
@@ -2508,6 +2859,7 @@ def clear(*args):
 @handleRedirAndSaveKwds
 def flprcache(*args):
     """Flush process cache.  Takes optional list of tasknames."""
+    _startupFile(None)
     _irafexecute.processCache.flush(*args)
     if Verbose > 0:
         print("Flushed process cache")
@@ -2517,6 +2869,7 @@ def flprcache(*args):
 def prcacheOff():
     """Disable process cache.  No process cache will be employed
        for the rest of this session."""
+    _startupFile(None)
     _irafexecute.processCache.setSize(0)
     if Verbose > 0:
         print("Disabled process cache")
@@ -2526,20 +2879,116 @@ def prcacheOff():
 def prcacheOn():
     """Re-enable process cache.  A process cache will again be employed
        for the rest of this session.  This may be useful after prcacheOff()."""
+    _startupFile(None)
     _irafexecute.processCache.resetSize()
     if Verbose > 0:
         print("Enabled process cache")
 
 
+@handleRedirAndSaveKwds
+def prcacheAdaptive(flag=1):
+    """Turn adaptive process cache sizing on (default) or off.  The cache
+       size then grows when tasks often restart processes that were pushed
+       out of the cache, and shrinks when memory is getting short."""
+    _startupFile(None)
+    _irafexecute.processCache.setAdaptive(flag)
+    if Verbose > 0:
+        print(f"{'Enabled' if flag else 'Disabled'} adaptive process cache")
+
+
 @handleRedirAndSaveKwds
 def prcache(*args):
     """Print process cache.  If args are given, locks tasks into cache."""
     if args:
+        _startupFile(None)
         _irafexecute.processCache.lock(*args)
     else:
         _irafexecute.processCache.list()
 
 
+@handleRedirAndSaveKwds
+def prcacheWarm(*args):
+    """Keep spare processes ready for the tasks or executables given.
+
+    The processes are started and initialized in the background, so that
+    the first run of a task does not wait for its executable to start.
+    Takes task names or executable names (e.g. x_images.e), optionally
+    preceded by the number of spare processes for each; 0 turns this
+    off for the given executables.
+    """
+    _startupFile(None)
+    spares = _irafexecute.processCache.DFT_SPARES
+    if args and str(args[0]).isdigit():
+        spares = int(args[0])
+        args = args[1:]
+    _irafexecute.processCache.warm(*args, nspares=spares)
+    if Verbose > 0:
+        print(f"Keeping {spares} spare process(es) for {len(args)} "
+              "executable(s)")
+
+
+def submit(taskname, *args, **kw):
+    """Run an IRAF executable task concurrently with other submitted tasks.
+
+    Takes the task (name or object) followed by its parameters, as in a
+    normal task call.  Returns a concurrent.futures.Future; its result is
+    an irafexecute.TaskResult with the captured stdout and stderr and the
+    parameter list at the end of the run.  The task runs with a private
+    copy of its parameters, does not prompt, and cannot produce graphics
+    or use I/O redirection keywords.
+    """
+    return _irafexecute.taskExecutor.submit(taskname, *args, **kw)
+
+
+def setSubmitWorkers(n, *args):
+    """Set the number of concurrent workers for submit().
+
+    Takes the number of workers and optional task names; without task
+    names the default for all executables is set.
+    """
+    _irafexecute.taskExecutor.setWorkers(n, *args)
+
+
+class _PipeRequest(int):
+    """Stdout value used by cl2py for the output of a CL pipe
+
+    It is equal to 1, so every task treats Stdout=PIPE like Stdout=1 and
+    returns its output as a list of lines.  In streaming pipe mode (see
+    setPipeMode) IRAF executable tasks instead start in the background
+    and return a StreamPipe, which the next stage reads as its Stdin.
+    """
+
+    def __repr__(self):
+        return 'PIPE'
+
+
+PIPE = _PipeRequest(1)
+
+_pipeMode = 'stream' if _os.environ.get('PYRAF_PIPE_MODE') == 'stream' \
+    else 'buffer'
+
+
+def setPipeMode(mode='stream'):
+    """Set the mode of CL pipes (task1 | task2) to 'stream' or 'buffer'.
+
+    In the default 'buffer' mode each stage runs to completion and its
+    output is kept in memory for the next stage.  In 'stream' mode IRAF
+    executable tasks feeding a pipe run concurrently with the following
+    stages, connected through bounded pipes.  Streamed stages do not
+    prompt for parameters, cannot produce graphics and get no terminal
+    input.  PYRAF_PIPE_MODE=stream sets the mode at startup.
+    """
+    global _pipeMode
+    if mode not in ('stream', 'buffer'):
+        raise ValueError(f"Pipe mode `{mode}' must be `stream' or `buffer'")
+    _pipeMode = mode
+
+
+def getPipeMode():
+    """Return the mode of CL pipes ('stream' or 'buffer')"""
+    return _pipeMode
+
+
 @handleRedirAndSaveKwds
 def gflush():
     """Flush any buffered graphics output."""
@@ -3734,6 +4183,10 @@ def redirProcess(kw):
                 else:
                     # expand IRAF variables
                     value = Expand(value)
+                    if not outputFlag:
+                        _startupFile(value)
+                    elif not isNullFile(value):
+                        _startupFile(None)
                     if outputFlag:
                         # output file
                         # check to see if it is dev$null
@@ -3797,6 +4250,9 @@ def redirProcess(kw):
                 elif not hasattr(value, 'read'):
                     raise IrafError(f"{key} redirection must be from a file "
                                     f"handle or string\nValue is `{value}'")
+                elif isinstance(value, _irafexecute.StreamPipe):
+                    # the pipe is finished when this task is done
+                    closeFHList.append(value)
                 fh = value
             if fh is not None:
                 redirKW[standardName] = fh
@@ -3836,9 +4292,12 @@ def redirReset(resetList, closeFHList):
     Returns an array of lines (without newlines.)
     """
     PipeOut = None
+    streamPipes = []
     for fh in closeFHList:
         if isinstance(fh, tuple):
             PipeOut = fh[0]
+        elif isinstance(fh, _irafexecute.StreamPipe):
+            streamPipes.append(fh)
         else:
             fh.close()
     for key, value in resetList:
@@ -3846,6 +4305,9 @@ def redirReset(resetList, closeFHList):
             gki.kernel = value
         else:
             setattr(_sys, key, value)
+    # this waits for the earlier pipe stages and raises their errors
+    for fh in streamPipes:
+        fh.close()
     if PipeOut is not None:
         # unfortunately io.StringIO has no readlines method:
         # PipeOut.seek(0)
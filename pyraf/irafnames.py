@@ -9,7 +9,7 @@ R. White, 1999 March 26
 import __main__
 
 from .tools import irafglobals
-from . import iraf
+from . import irafimport
 
 
 def _addName(task, module):
@@ -19,12 +19,10 @@ def _addName(task, module):
     unless it is an IrafTask
     """
     name = task.getName()
-    if hasattr(module, name):
-        p = getattr(module, name)
-    else:
-        p = None
+    namespace = vars(module)
+    p = namespace.get(name)
     if (p is None) or isinstance(p, irafglobals.IrafTask):
-        setattr(module, name, task)
+        namespace[name] = task
     else:
         if irafglobals.Verbose > 0:
             print("Warning: " + module.__name__ + "." + name +
@@ -45,12 +43,14 @@ class IrafNameStrategy:
 
 # NameClean implementation puts tasks and packages in iraf module name space
 # Note that since packages are also tasks, we only need to do this for tasks
+# The module itself is used, not the iraf module proxy: the proxy looks up
+# unknown names in the task lists, where every new task is found already
 
 
 class IrafNameClean(IrafNameStrategy):
 
     def addTask(self, task):
-        _addName(task, iraf)
+        _addName(task, irafimport.the_iraf_module)
 
 
 # IrafNamePkg also adds packages to __main__ name space
@@ -68,7 +68,7 @@ class IrafNamePkg(IrafNameClean):
 class IrafNameTask(IrafNameClean):
 
     def addTask(self, task):
-        _addName(task, iraf)
+        _addName(task, irafimport.the_iraf_module)
         _addName(task, __main__)
 
 
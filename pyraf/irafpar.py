@@ -5,9 +5,11 @@ R. White, 2000 January 7
 
 
 import copy
-import glob
 import os
 import re
+import stat
+import threading
+import time
 import types
 from .tools import minmatch, irafutils, taskpars, basicpar
 from .tools.irafglobals import INDEF, Verbose, yes, no
@@ -16,7 +18,7 @@ from .tools.basicpar import (warning, _StringMixin, IrafPar, IrafParS,
 # also import basicpar.IrafPar* class names for cached scripts
 from .tools.basicpar import (IrafParB, IrafParI, IrafParR, IrafParAB,
                                   IrafParAI, IrafParAR, IrafParAS)
-from . import iraf
+from . import clcache, iraf
 
 # -----------------------------------------------------
 # IRAF parameter factory
@@ -167,6 +169,25 @@ def makeIrafPar(init_value,
         raise ValueError(errmsg)
 
 
+# parameter objects used for type conversion by coerceLocal
+
+_localPars = {}
+
+
+def coerceLocal(value, datatype):
+    """Convert value like assigning it to a local variable of datatype
+
+    Used for local CL variables translated to Python variables by cl2py,
+    which get the same values as the unconstrained parameter objects
+    they replace.
+    """
+    par = _localPars.get(datatype)
+    if par is None:
+        par = makeIrafPar(None, datatype=datatype, name="local", mode="u")
+        _localPars[datatype] = par
+    return par.checkValue(value)
+
+
 # -----------------------------------------------------
 # IRAF pset parameter class
 # -----------------------------------------------------
@@ -232,14 +253,19 @@ class IrafParPset(IrafParS):
 
 
 class IrafParL(_StringMixin, IrafPar):
-    """IRAF list parameter base class"""
+    """IRAF list parameter base class
+
+    The list file is read one line at a time as values are requested,
+    so only the read buffer (READAHEAD bytes) is kept in memory.  The
+    file name may be given as "@file" too.
+    """
+
+    READAHEAD = 65536
 
     def __init__(self, fields, strict=0):
         IrafPar.__init__(self, fields, strict)
         # filehandle for input file
         self.__dict__['fh'] = None
-        # lines used to store input when not reading from a tty
-        self.__dict__['lines'] = None
         # flag inidicating error message has been printed if file does not exist
         # message only gets printed once for each file
         self.__dict__['errMsg'] = 0
@@ -276,7 +302,6 @@ class IrafParL(_StringMixin, IrafPar):
                 except OSError:
                     pass
                 self.fh = None
-                self.lines = None
             self.errMsg = 0
 
     def get(self,
@@ -306,20 +331,16 @@ class IrafParL(_StringMixin, IrafPar):
             # non-null value means we're reading from a file
             try:
                 if not self.fh:
-                    self.fh = open(iraf.Expand(self.value), errors="ignore")
-                    if self.fh.isatty():
-                        self.lines = None
-                    else:
-                        # read lines in a block
-                        # reverse to make pop more convenient & faster
-                        self.lines = self.fh.readlines()
-                        self.lines.reverse()
-                if self.lines is None:
-                    value = self.fh.readline()
-                elif self.lines:
-                    value = self.lines.pop()
-                else:
-                    value = ''
+                    filename = self.value
+                    if filename[:1] == "@":
+                        filename = filename[1:]
+                    filename = iraf.Expand(filename)
+                    from .iraffunctions import _startupFile
+                    _startupFile(filename)
+                    self.fh = open(filename,
+                                   buffering=self.READAHEAD,
+                                   errors="ignore")
+                value = self.fh.readline()
                 if not value:
                     # EOF -- raise exception
                     raise EOFError(f"EOF from list parameter `{self.name}'")
@@ -346,6 +367,20 @@ class IrafParL(_StringMixin, IrafPar):
         else:
             return value
 
+    def iterValues(self):
+        """Generator returning the remaining values of the list
+
+        Values are read as they are consumed and have the native type
+        of the parameter.  Reading continues where the last get() or
+        scan of the parameter stopped.
+        """
+        while True:
+            try:
+                value = self.get(native=1)
+            except EOFError:
+                return
+            yield value
+
     # --------------------------------------------
     # private methods
     # --------------------------------------------
@@ -531,6 +566,120 @@ class ParCache(filecache.FileCache):
         self.psetlist = psetlist
 
 
+class _ParDictOverlay(minmatch.MinMatchDict):
+    """Min-match parameter dictionary sharing its entries with another one
+
+    Used by IrafParList.overlay().  An entry is copied from the base
+    dictionary the first time it is retrieved, and replaced by the copy
+    in the parameter list pars too; the copies are kept in the copied
+    dictionary.  Changes made to all parameters of the list (flags,
+    autoMode) are applied to the list parameters when they are copied.
+    The base dictionary is never modified.
+    """
+
+    def __init__(self, base, pars):
+        minmatch.MinMatchDict.__init__(self, minkeylength=base.minkeylength)
+        self.data = base.data.copy()
+        self.base = base
+        self.pars = pars
+        self.index = {p.name: i for i, p in enumerate(pars)}
+        self.copied = {}
+        self.flags = None
+        self.autoMode = None
+
+    def __deepcopy__(self, memo=None):
+        """Deep copy is a plain MinMatchDict"""
+        return minmatch.MinMatchDict(copy.deepcopy(dict(self.items()), memo),
+                                     self.minkeylength)
+
+    def copy(self):
+        """Shallow copy is a plain MinMatchDict of the copied entries"""
+        return minmatch.MinMatchDict(dict(self.items()), self.minkeylength)
+
+    def copyPar(self, key, memo=None):
+        """Copy the entry for (full) key and return the copy"""
+        p = copy.deepcopy(self.data[key], memo)
+        i = self.index.get(key)
+        if i is not None:
+            if self.flags is not None:
+                p.setFlags(self.flags)
+            if self.autoMode and "a" in p.mode:
+                p.mode = p.mode.replace("a", self.autoMode)
+            self.pars[i] = p
+        self.data[key] = p
+        self.copied[key] = p
+        return p
+
+    def copyAll(self):
+        """Copy all entries that are still shared"""
+        memo = {}
+        for key in list(self.data.keys()):
+            if key not in self.copied:
+                self.copyPar(key, memo)
+        # positions in the list may change from now on
+        self.index = {}
+
+    def _mmInit(self):
+        # share the min-match keys with the base as long as the keys agree
+        if self.base is None:
+            minmatch.MinMatchDict._mmInit(self)
+        else:
+            if self.base.mmkeys is None:
+                self.base._mmInit()
+            self.mmkeys = self.base.mmkeys
+
+    def _detach(self):
+        """Stop sharing the min-match keys with the base (keys change)"""
+        if self.base is not None:
+            self.base = None
+            self.mmkeys = None
+
+    def add(self, key, item):
+        self._detach()
+        self.copied[key] = item
+        minmatch.MinMatchDict.add(self, key, item)
+
+    def __delitem__(self, key):
+        key = self.getfullkey(key)
+        self._detach()
+        minmatch.MinMatchDict.__delitem__(self, key)
+        self.copied.pop(key, None)
+
+    def clear(self):
+        self._detach()
+        minmatch.MinMatchDict.clear(self)
+        self.copied.clear()
+
+    def __setitem__(self, key, item):
+        minmatch.MinMatchDict.__setitem__(self, key, item)
+        self.copied[self.getfullkey(key)] = item
+
+    def __getitem__(self, key):
+        if key not in self.data:
+            key = self.getfullkey(key)
+        if key in self.copied:
+            return self.data[key]
+        return self.copyPar(key)
+
+    def get(self, key, failobj=None, exact=0):
+        if not exact:
+            key = self.getfullkey(key, new=1)
+        if key in self.data:
+            return self[key]
+        return failobj
+
+    def get_exact_key(self, key, failobj=None):
+        return self.get(key, failobj, exact=1)
+
+    def getall(self, key, failobj=None):
+        if self.mmkeys is None:
+            self._mmInit()
+        k = self.mmkeys.match(key)
+        if not k:
+            return failobj
+        return [self[name] for name in k]
+
+
 # -----------------------------------------------------
 # IRAF parameter list class
 # -----------------------------------------------------
@@ -542,6 +691,9 @@ class ParCache(filecache.FileCache):
 class IrafParList(taskpars.TaskPars):
     """List of Iraf parameters"""
 
+    # parameters copied into an overlay (None if this is not an overlay)
+    __copies = None
+
     def __init__(self, taskname, filename="", parlist=None):
         """Create a parameter list for task taskname
 
@@ -566,6 +718,58 @@ class IrafParList(taskpars.TaskPars):
         if self.__psets2merge:
             self.__addPsetParams()
 
+    def overlay(self):
+        """Return a copy-on-write copy of this list (e.g. for a task run)
+
+        The overlay shares the parameter objects with this list, which is
+        never modified through it.  A parameter is copied into the overlay
+        the first time it is retrieved (e.g. with getParObject or from the
+        getParDict dictionary); getParList copies all of them.  The
+        parameters that may have been changed are returned by
+        getCopiedPars.
+        """
+        if self.__psets2merge:
+            self.__addPsetParams()
+        new = object.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.__pars = list(self.__pars)
+        new.__pardict = _ParDictOverlay(self.__pardict, new.__pars)
+        new.__copies = new.__pardict.copied
+        return new
+
+    def __materialize(self):
+        """Copy all the parameters of an overlay that are still shared"""
+        if self.__copies is not None:
+            self.__pardict.copyAll()
+
+    def getCopiedPars(self):
+        """Return list of the parameters that may differ from the base list
+
+        For an overlay these are the parameters that were copied, for
+        any other list all parameters.
+        """
+        if self.__copies is None:
+            return self.__pars
+        return [p for p in self.__pars if p.name in self.__copies]
+
+    def getPsets(self):
+        """Return list of the pset parameters (copied into an overlay)"""
+        psets = [p for p in self.__pars if isinstance(p, IrafParPset)]
+        if self.__copies is not None:
+            psets = [self.__pardict[p.name] for p in psets]
+        return psets
+
+    def setAutoMode(self, mode):
+        """Replace automatic mode "a" of all parameters by mode"""
+        if self.__copies is None:
+            pars = self.__pars
+        else:
+            if self.__pardict.autoMode is None:
+                self.__pardict.autoMode = mode
+            pars = self.getCopiedPars()
+        for p in pars:
+            p.mode = p.mode.replace("a", mode)
+
     def setFilename(self, filename):
         """Change filename and create ParCache object
 
@@ -640,6 +844,7 @@ class IrafParList(taskpars.TaskPars):
         elif self.__pardict.has_exact_key(p.name):
             if p.name in ["$nargs", "mode"]:
                 # allow substitution of these default parameters
+                self.__materialize()
                 self.__pardict[p.name] = p
                 for i in range(len(self.__pars)):
                     j = -i - 1
@@ -651,6 +856,8 @@ class IrafParList(taskpars.TaskPars):
                                        "dictionary __pardict but not in "
                                        "list __pars??")
             raise ValueError(f"Parameter named `{p.name}' is already defined")
+        # positions in the list change, so copy everything now
+        self.__materialize()
         # add it just before the mode and $nargs parameters (if present)
         j = -1
         for i in range(len(self.__pars)):
@@ -700,6 +907,7 @@ class IrafParList(taskpars.TaskPars):
         Dictionary is keyed by param name, with value of type and
         (for non-hidden parameters) sequence number.
         """
+        self.__materialize()
         dpar = {}
         j = 0
         hflag = -1
@@ -717,11 +925,14 @@ class IrafParList(taskpars.TaskPars):
 
     def clearFlags(self):
         """Clear all status flags for all parameters"""
-        for p in self.__pars:
+        if self.__copies is not None:
+            self.__pardict.flags = 0
+        for p in self.getCopiedPars():
             p.setFlags(0)
 
     def setAllFlags(self):
         """Set all status flags to indicate parameters were set on cmdline"""
+        self.__materialize()
         for p in self.__pars:
             p.setCmdline()
 
@@ -761,6 +972,7 @@ class IrafParList(taskpars.TaskPars):
         return self.__filename
 
     def getParList(self, docopy=0):
+        self.__materialize()
         if docopy:
             # return copy of the list if docopy flag set
             pars = copy.deepcopy(self.__pars)
@@ -844,8 +1056,7 @@ class IrafParList(taskpars.TaskPars):
             return retval
 
         # There is a PSET in here somewhere...
-        allpsets = [p for p in self.__pars if isinstance(p, IrafParPset)]
-        for pset in allpsets:
+        for pset in self.getPsets():
             # Search the pset's pars.  We definitely do NOT want a copy,
             # we need the originals to edit.
             its_task = pset.get()
@@ -987,6 +1198,11 @@ class IrafParList(taskpars.TaskPars):
 
         # Now add positional parameters to the keyword list, checking
         # for duplicates
+        if args and self.__copies is not None and self.__pardict.autoMode:
+            # modes of the parameters not copied yet are out of date
+            self.__materialize()
+        # (only names and modes of the parameters are read here, so those
+        # of an overlay need not be copied)
         ipar = 0
         for value in args:
             while ipar < len(self.__pars):
@@ -1072,6 +1288,7 @@ class IrafParList(taskpars.TaskPars):
 
     def lParamStr(self, verbose=0):
         """List the task parameters"""
+        self.__materialize()
         retval = []
         # Do the non-hidden parameters first
         for i in range(len(self.__pars)):
@@ -1095,6 +1312,7 @@ class IrafParList(taskpars.TaskPars):
         """
         if taskname and taskname[-1:] != ".":
             taskname = taskname + "."
+        self.__materialize()
         for i in range(len(self.__pars)):
             p = self.__pars[i]
             if p.name != '$nargs':
@@ -1114,15 +1332,54 @@ class IrafParList(taskpars.TaskPars):
             msg = "No parameters written to disk."
             print(msg)
             return msg
-        # ok, go ahead and write 'em - set up file
+        # ok, go ahead and write 'em
         if hasattr(filename, 'write'):
-            fh = filename
-        else:
-            absFileName = iraf.Expand(filename)
-            absDir = os.path.dirname(absFileName)
-            if len(absDir) and not os.path.isdir(absDir):
-                os.makedirs(absDir)
-            fh = open(absFileName, 'w')
+            nsave = self.__writePars(filename, comment)
+            if hasattr(filename, 'name'):
+                return f"{nsave:d} parameters written to {filename.name}"
+            return f"{nsave:d} parameters written"
+        absFileName = iraf.Expand(filename)
+        # a pending write-behind copy must not overwrite this one
+        with parWriter.fileLock(absFileName):
+            parWriter.discard(absFileName)
+            nsave = self.__writeFile(absFileName, comment)
+        filecache.statCache.invalidate(absFileName)
+        return f"{nsave:d} parameters written to {filename}"
+
+    def __writeFile(self, absFileName, comment):
+        """Replace file absFileName (the target of a link) by the list
+
+        The list is written to a temporary file that is renamed, so that
+        the file is never seen half-written.  The permissions of an
+        existing file are kept.
+        """
+        absFileName = os.path.realpath(absFileName)
+        absDir = os.path.dirname(absFileName)
+        if not os.path.isdir(absDir):
+            os.makedirs(absDir)
+        try:
+            mode = stat.S_IMODE(os.stat(absFileName).st_mode)
+        except OSError:
+            mode = None
+        tmpFileName = f"{absFileName}.{os.getpid()}.tmp"
+        fd = os.open(tmpFileName, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                     0o666)
+        try:
+            with open(fd, 'w') as fh:
+                if mode is not None:
+                    os.fchmod(fd, mode)
+                nsave = self.__writePars(fh, comment)
+                fh.flush()
+                os.fsync(fd)
+            os.replace(tmpFileName, absFileName)
+        except BaseException:
+            os.remove(tmpFileName)
+            raise
+        return nsave
+
+    def __writePars(self, fh, comment):
+        """Write the .par file lines to fh; return number of parameters"""
+        self.__materialize()
         nsave = len(self.__pars)
         if comment:
             fh.write('# ' + comment + '\n')
@@ -1131,16 +1388,11 @@ class IrafParList(taskpars.TaskPars):
                 nsave = nsave - 1
             else:
                 fh.write(par.save() + '\n')
-        if fh != filename:
-            fh.close()
-            return f"{nsave:d} parameters written to {filename}"
-        elif hasattr(fh, 'name'):
-            return f"{nsave:d} parameters written to {fh.name}"
-        else:
-            return f"{nsave:d} parameters written"
+        return nsave
 
     def __getinitargs__(self):
         """Return parameters for __init__ call in pickle"""
+        self.__materialize()
         return (self.__name, self.__filename, self.__pars)
 
 
@@ -1158,6 +1410,16 @@ class IrafParList(taskpars.TaskPars):
 #        """Restore additional state from pickle"""
 #        pass
 
+    def __deepcopy__(self, memo):
+        """Deep copy of the list (an overlay becomes a plain list)"""
+        self.__materialize()
+        new = object.__new__(self.__class__)
+        memo[id(self)] = new
+        new.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        if self.__copies is not None:
+            new.__copies = None
+        return new
+
     def __str__(self):
         s = '<IrafParList ' + self.__name + ' (' + self.__filename + ') ' + \
             str(len(self.__pars)) + ' parameters>'
@@ -1179,6 +1441,92 @@ class IrafParList(taskpars.TaskPars):
         pass
 
 
+# -----------------------------------------------------
+# Write-behind store for uparm files
+# -----------------------------------------------------
+
+
+class _ParWriter:
+    """Write-behind store for the uparm files saved after task runs
+
+    With interval <= 0 (the default) save() writes the file at once.
+    Otherwise a task run that changes parameters schedules a copy of its
+    parameter list with save(), which keeps only the latest list for
+    each file.  The pending files are written by a timer interval
+    seconds after the first of them was scheduled, and at exit; a write
+    still pending when the process is killed is lost.  Saving a file
+    directly with saveParList (e.g., by update or epar) replaces its
+    pending write, or waits until a write in progress is done.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.pending = {}
+        self.timer = None
+        # tasks run by iraf.submit save from worker threads
+        self.lock = threading.Lock()
+        # held while a file is written, also by saveParList
+        self.fileLocks = {}
+
+    def fileLock(self, filename):
+        """Return the lock for writing filename (an absolute path)"""
+        with self.lock:
+            lock = self.fileLocks.get(filename)
+            if lock is None:
+                lock = self.fileLocks[filename] = threading.RLock()
+            return lock
+
+    def save(self, parList, filename):
+        """Write or schedule writing parList to filename; return status"""
+        if self.interval <= 0:
+            return parList.saveParList(filename)
+        absFileName = iraf.Expand(filename)
+        # copy: later changes of the list must not go into this write
+        parList = copy.deepcopy(parList)
+        with self.lock:
+            self.pending[absFileName] = parList
+            if self.timer is None:
+                self.timer = threading.Timer(self.interval, self._timeout)
+                self.timer.daemon = True
+                self.timer.start()
+        return f"Parameters to be written to {filename}"
+
+    def discard(self, filename):
+        """Drop the pending write of filename (an absolute path)"""
+        with self.lock:
+            self.pending.pop(filename, None)
+
+    def _timeout(self):
+        with self.lock:
+            self.timer = None
+        self.flush()
+
+    def flush(self, filename=None):
+        """Write the pending files (only filename, if given)"""
+        if filename is not None:
+            filenames = [filename]
+        else:
+            with self.lock:
+                filenames = list(self.pending)
+        for absFileName in filenames:
+            # the file lock is held from taking the list until it is
+            # written, so that a newer direct save is not overwritten
+            with self.fileLock(absFileName):
+                with self.lock:
+                    parList = self.pending.pop(absFileName, None)
+                if parList is None:
+                    continue
+                try:
+                    parList.saveParList(absFileName)
+                except OSError as e:
+                    if filename is not None:
+                        raise
+                    warning(f"Unable to write {absFileName}: {e}", level=-1)
+
+
+parWriter = _ParWriter(float(os.environ.get("PYRAF_UPARM_INTERVAL", 0)))
+
+
 def _printVerboseDiff(list1, list2):
     """Print description of differences between parameter lists"""
     pd1, hd1 = _extractDiffInfo(list1)
@@ -1276,6 +1624,12 @@ def _printDiff(pd1, pd2, label):
 # Each value is a list of path names.
 _specialUseParFileDict = None
 
+# The index of the .par files in each directory checked for special-use
+# par files (see _indexSpecialParFiles), and the time of the last check,
+# by directory name.
+_specialParIndex = {}
+_specialParChecked = {}
+
 # For TASKMETA lines in par files, e.g.: '# TASKMETA: task=display package=tv'
 _re_taskmeta = \
     re.compile(r'^# *TASKMETA *: *task *= *([^ ]*) *package *= *([^ \n]*)')
@@ -1307,42 +1661,18 @@ def _updateSpecialParFileDict(dirToCheck=None, strict=False):
             # be taking too long, we could easily add a global flag here like
             # _alreadyCheckedUparmAux = True
 
-        # Also check the current directory
+        # Also check the current directory (only new or modified files are
+        # read again, see _indexSpecialParFiles)
         _updateSpecialParFileDict(dirToCheck=os.getcwd())
-        # For performance, note that there is nothing yet in place to stop us
-        # from rereading a large dir of par files every time this is called
 
         return  # we've done enough
 
-    # Do a glob in the given dir
-    flist = glob.glob(dirToCheck + "/*.par")
-    if len(flist) <= 0:
-        return
-
-    # At this point, we have files.  Foreach, figure out the task and
-    # package it is for, and add it's pathname to the dict.
-    for supfname in flist:
-        buf = []
-        try:
-            with open(supfname, errors="ignore") as supfile:
-                buf = supfile.readlines()
-        except OSError:
-            pass
-        if len(buf) < 1:
-            warning("Unable to read special use parameter file: " + supfname,
-                    level=-1)
-            continue
-
-        # get task and pkg names, and verify this is a correct file
-        tupKey = None
-        for line in buf:
-            mo = _re_taskmeta.match(line)
-            if mo:
-                # the syntax is right,  get the task and pkg names
-                tupKey = (mo.group(1), mo.group(2))
-                break  # only one TASKMETA line per file
-
+    # Get the task and package of the .par files in the given dir, and
+    # add their pathnames to the dict.
+    files = _indexSpecialParFiles(dirToCheck)[1]
+    for name, (mtime, tupKey) in files.items():
         if tupKey:
+            supfname = dirToCheck + "/" + name
             if tupKey in _specialUseParFileDict:
                 supflist = _specialUseParFileDict[tupKey]
                 if supfname not in supflist:
@@ -1357,6 +1687,82 @@ def _updateSpecialParFileDict(dirToCheck=None, strict=False):
         # very annoying, so be quiet about it.
 
 
+def _indexSpecialParFiles(dirToCheck):
+    """ Return the index of the .par files in the given dir, a tuple
+    (dir mtime, {file name: (file mtime, (taskName, pkgName) or None)}).
+    The index is kept in _specialParIndex and in the CL code cache, so only
+    files that are new or were modified since the last check are read.  The
+    directory is listed again only if its mtime changed, and the files are
+    not checked again for filecache.statCache.interval seconds. """
+
+    try:
+        dirMtime = os.stat(dirToCheck).st_mtime_ns
+    except OSError:
+        return None, {}
+    now = time.monotonic()
+    index = _specialParIndex.get(dirToCheck)
+    if index is not None and index[0] == dirMtime and \
+            now - _specialParChecked[dirToCheck] < \
+            filecache.statCache.interval:
+        return index
+    if index is None:
+        index = clcache.codeCache.getParDir(dirToCheck) or (None, {})
+    oldMtime, oldFiles = index
+    if dirMtime == oldMtime:
+        names = list(oldFiles)
+    else:
+        try:
+            names = [name for name in os.listdir(dirToCheck)
+                     if name.endswith(".par") and name[:1] != "."]
+        except OSError:
+            names = []
+    changed = dirMtime != oldMtime
+    files = {}
+    for name in names:
+        supfname = dirToCheck + "/" + name
+        try:
+            mtime = os.stat(supfname).st_mtime_ns
+        except OSError:
+            changed = changed or name in oldFiles
+            continue
+        entry = oldFiles.get(name)
+        if entry is None or entry[0] != mtime:
+            try:
+                entry = (mtime, _readTaskMeta(supfname))
+            except OSError:
+                warning("Unable to read special use parameter file: " +
+                        supfname, level=-1)
+                continue
+            changed = True
+        files[name] = entry
+    index = (dirMtime, files)
+    _specialParIndex[dirToCheck] = index
+    _specialParChecked[dirToCheck] = now
+    if changed:
+        clcache.codeCache.addParDir(dirToCheck, index)
+    return index
+
+
+def _readTaskMeta(supfname):
+    """ Return the (taskName, pkgName) tuple from the TASKMETA line of a .par
+    file, or None if it has none.  Only the comment lines at the top of the
+    file are read.  Raises OSError if the file is empty or unreadable. """
+
+    nlines = 0
+    with open(supfname, errors="ignore") as supfile:
+        for line in supfile:
+            nlines += 1
+            mo = _re_taskmeta.match(line)
+            if mo:
+                # the syntax is right,  get the task and pkg names
+                return mo.group(1), mo.group(2)
+            if line.strip() and line[:1] != "#":
+                return None
+    if nlines == 0:
+        raise OSError("empty file")
+    return None
+
+
 def newSpecialParFile(taskName, pkgName, pathName):
     """ Someone has just created a new one and we are being notified of that
     fact so that we can update the dict. """
@@ -1470,7 +1876,70 @@ del whitespace, field, comma, optcomma, noncommajunk, double, single
 
 
 def _readpar(filename, strict=0):
-    """Read IRAF .par file and return list of parameters"""
+    """Read IRAF .par file and return list of parameters
+
+    The parameter lists are kept in the CL code cache, so a file that
+    has not changed since it was last read is not parsed again (except
+    in strict mode, which always parses the file).
+    """
+    if strict:
+        return _parsepar(filename, strict)
+    codeCache = clcache.codeCache
+    try:
+        index, stamp = codeCache.getParIndex(os.path.expanduser(filename))
+    except OSError:
+        # nothing to cache, _parsepar reports the error
+        return _parsepar(filename, strict)
+    cached = codeCache.getPars(index)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    param_list = _parsepar(filename, strict)
+    codeCache.addPars(index, (stamp, param_list))
+    return param_list
+
+
+def _splitFields(line):
+    """Split a .par file line into fields without regular expressions
+
+    Handles lines without backslashes and single quotes in which every
+    double quote opens or closes a complete field.  Returns None for
+    other lines, which are split with _re_field.
+    """
+    if "\\" in line or "'" in line:
+        return None
+    parts = line.split('"')
+    if len(parts) % 2 == 0:
+        # unmatched quote
+        return None
+    flist = []
+    last = len(parts) - 1
+    for i in range(0, len(parts), 2):
+        pieces = parts[i].split(',')
+        if i > 0:
+            # only blanks may follow the closing quote
+            if pieces[0].strip(' \t'):
+                return None
+            del pieces[0]
+            if not pieces:
+                if i < last:
+                    return None
+                break
+        if i < last:
+            # only blanks may precede the opening quote
+            if pieces.pop().strip(' \t'):
+                return None
+        elif pieces[-1] == '':
+            # trailing comma does not start another field
+            pieces.pop()
+        for piece in pieces:
+            flist.append(piece.lstrip(' \t') or None)
+        if i < last:
+            flist.append(parts[i + 1])
+    return flist
+
+
+def _parsepar(filename, strict=0):
+    """Parse IRAF .par file and return list of parameters"""
 
     global _re_field, _re_bstrail
 
@@ -1498,55 +1967,60 @@ def _readpar(filename, strict=0):
                                           line)
                 else:
                     break
-            flist = []
-            i1 = 0
-            while len(line) > i1:
-                mm = _re_field.match(line, i1)
-                if mm is None:
-                    # Failure occurs only for unmatched leading quote.
-                    # Append more lines to get quotes to match.  (Probably
-                    # want to restrict this behavior to only the prompt
-                    # field.)
-                    while mm is None:
-                        try:
-                            nline = lines.pop()
-                        except IndexError:
-                            # serious error, run-on quote consumed entire file
-                            sline = line.split('\n')
-                            raise SyntaxError(filename +
-                                              ": Unmatched quote\n" + sline[0])
-                        line = line + '\n' + nline.rstrip()
-                        mm = _re_field.match(line, i1)
-                if mm.group('comma') is not None:
-                    g = mm.group('comma')
-                    # completely omitted field (,,)
-                    if g == "":
-                        g = None
-                    # check for trailing quote in unquoted string
-                    elif g[-1:] == '"' or g[-1:] == "'":
-                        warning(
-                            filename + "\n" + line + "\n" +
-                            "Unquoted string has trailing quote", strict)
-                elif mm.group('double') is not None:
-                    if mm.group('djunk'):
-                        warning(
-                            filename + "\n" + line + "\n" +
-                            "Non-blank follows quoted string", strict)
-                    g = mm.group('double')
-                elif mm.group('single') is not None:
-                    if mm.group('sjunk'):
-                        warning(
+            # most lines need no regular expression matching
+            flist = _splitFields(line)
+            if flist is None:
+                flist = []
+                i1 = 0
+                while len(line) > i1:
+                    mm = _re_field.match(line, i1)
+                    if mm is None:
+                        # Failure occurs only for unmatched leading quote.
+                        # Append more lines to get quotes to match.  (Probably
+                        # want to restrict this behavior to only the prompt
+                        # field.)
+                        while mm is None:
+                            try:
+                                nline = lines.pop()
+                            except IndexError:
+                                # serious error, run-on quote consumed
+                                # entire file
+                                sline = line.split('\n')
+                                raise SyntaxError(filename +
+                                                  ": Unmatched quote\n" +
+                                                  sline[0])
+                            line = line + '\n' + nline.rstrip()
+                            mm = _re_field.match(line, i1)
+                    if mm.group('comma') is not None:
+                        g = mm.group('comma')
+                        # completely omitted field (,,)
+                        if g == "":
+                            g = None
+                        # check for trailing quote in unquoted string
+                        elif g[-1:] == '"' or g[-1:] == "'":
+                            warning(
+                                filename + "\n" + line + "\n" +
+                                "Unquoted string has trailing quote", strict)
+                    elif mm.group('double') is not None:
+                        if mm.group('djunk'):
+                            warning(
+                                filename + "\n" + line + "\n" +
+                                "Non-blank follows quoted string", strict)
+                        g = mm.group('double')
+                    elif mm.group('single') is not None:
+                        if mm.group('sjunk'):
+                            warning(
+                                filename + "\n" + line + "\n" +
+                                "Non-blank follows quoted string", strict)
+                        g = mm.group('single')
+                    else:
+                        raise SyntaxError(
                             filename + "\n" + line + "\n" +
-                            "Non-blank follows quoted string", strict)
-                    g = mm.group('single')
-                else:
-                    raise SyntaxError(
-                        filename + "\n" + line + "\n" + "Huh? mm.groups()=" +
-                        repr(mm.groups()) + "\n" +
-                        "Bug: doesn't match single, double or comma??")
-                flist.append(g)
-                # move match pointer
-                i1 = mm.end()
+                            "Huh? mm.groups()=" + repr(mm.groups()) + "\n" +
+                            "Bug: doesn't match single, double or comma??")
+                    flist.append(g)
+                    # move match pointer
+                    i1 = mm.end()
             try:
                 par = IrafParFactory(flist, strict=strict)
             except KeyboardInterrupt:
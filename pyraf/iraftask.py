@@ -223,6 +223,21 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
         self.initTask()
         return self._currentParpath
 
+    def getSourceFiles(self):
+        """Return list of files read so far to define this task
+
+        Does not initialize the task; an uninitialized task has read
+        nothing.
+        """
+        files = []
+        if self._fullpath:
+            files.append(self._fullpath)
+        if self._currentParList is not None:
+            for parpath in (self._defaultParpath, self._scrunchParpath):
+                if parpath:
+                    files.append(parpath)
+        return files
+
     def getParList(self, docopy=0):
         """Return list of all parameter objects"""
         self.initTask(force=1)
@@ -332,6 +347,10 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
 
         self.initTask(force=1)
 
+        # output feeding a CL pipe may be streamed to the next stage
+        if kw.get('Stdout') is iraf.PIPE and self._canStream(kw):
+            return irafexecute.taskExecutor.stream(self, *args, **kw)
+
         # Special _save keyword turns on parameter-saving.
         # Default is *not* to save parameters (so it is necessary
         # to use _save=1 to get parameter changes to be persistent.)
@@ -353,7 +372,13 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
         # _currentParList version lives longer - it represents the on-disk
         # copy of the par list, during the life of this PyRAF session.
         kw['_setMode'] = 1
-        self.setParList(*args, **kw)
+        try:
+            self.setParList(*args, **kw)
+        except BaseException:
+            # close the files; this raises the error of an earlier stage
+            # of a streaming pipe, which may be the cause
+            iraf.redirReset([], closeFHList)
+            raise
 
         if Verbose > 1:
             print(f"run {self._name} ({self.__class__.__name__}: "
@@ -457,10 +482,11 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
             newParList = self._runningParList
             parList = None
         else:
+            # parameters are copied from the list only when they are used
             if parList:
-                newParList = copy.deepcopy(parList)
+                newParList = parList.overlay()
             else:
-                newParList = copy.deepcopy(self._currentParList)
+                newParList = self._currentParList.overlay()
 
         if '_setMode' in kw:
             _setMode = kw['_setMode']
@@ -469,17 +495,14 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
             _setMode = 0
 
         # create parlist copies for pset tasks too
-        for p in newParList.getParList():
-            if isinstance(p, irafpar.IrafParPset):
-                p.get().setParList()
+        for p in newParList.getPsets():
+            p.get().setParList()
 
         # now, finally, set the passed-in parameters
         newParList.setParList(*args, **kw)
         if _setMode:
             # set mode of automatic parameters
-            mode = self.getMode(newParList)
-            for p in newParList.getParList():
-                p.mode = p.mode.replace("a", mode)
+            newParList.setAutoMode(self.getMode(newParList))
         if parList:
             # XXX Set all command-line flags for parameters when a
             # XXX parlist is supplied so that it does not prompt for
@@ -771,6 +794,9 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
         if self._defaultParList is not None:
             # update defaultParList from file if necessary
             self._defaultParList.Update()
+            if self._scrunchParpath:
+                irafpar.parWriter.discard(
+                    iraf.Expand(self._scrunchParpath, noerror=1))
             if self._scrunchParpath and \
                     (self._scrunchParpath == self._currentParpath):
                 try:
@@ -880,20 +906,26 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
             raise IrafError("Error running IRAF task " + self._name + "\n" +
                             str(value))
 
-    def _updateParList(self, save=0):
+    def _updateParList(self, save=0, newParList=None):
         """Update parameter list after successful task completion
 
         Updates parameter save file if any parameters change.  If save
         flag is set, all changes are saved; if save flag is false, only
         explicit parameter changes requested by the task are saved.
+        The changes are taken from newParList if given (for a task run
+        in the background), otherwise from the running parameter list.
         """
-        if not (self._currentParList and self._runningParList):
+        if newParList is None:
+            if not (self._currentParList and self._runningParList):
+                return
+            newParList = self._runningParList
+            self._runningParList = None
+        elif not self._currentParList:
             return
-        newParList = self._runningParList
-        self._runningParList = None
         mode = self.getMode(newParList)
         changed = 0
-        for par in newParList.getParList():
+        # parameters not copied into the running list are unchanged
+        for par in newParList.getCopiedPars():
             if par.name != "$nargs" and (par.isChanged() or
                                          (save and par.isCmdline() and
                                           par.isLearned(mode))):
@@ -911,22 +943,47 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
                 tpar.choice = par.choice
                 tpar.prompt = par.prompt
                 tpar.setChanged()
-            if isinstance(par, irafpar.IrafParPset):
-                par.get()._updateParList(save)
-        # save to disk if there were changes
+        for par in newParList.getPsets():
+            par.get()._updateParList(save)
+        # save to disk if there were changes (written behind, so that
+        # repeated runs of the task write the file only once)
         if changed:
-            rv = self.saveParList()
+            if self._scrunchParpath:
+                rv = irafpar.parWriter.save(self._currentParList,
+                                            self._scrunchParpath)
+            else:
+                rv = self.saveParList()
             if Verbose > 1:
                 print(rv, file=sys.stderr)
 
+    def _canStream(self, kw):
+        """Check whether this run can be a stage of a streaming pipe
+
+        Only IRAF executable tasks producing text are streamed, and only
+        when their input is another pipe (or nothing).  Tasks with psets
+        are not streamed, since the run gets a copy of the task's own
+        parameters only.
+        """
+        if iraf.getPipeMode() != 'stream' or \
+                self.__class__.__name__ != "IrafTask" or self.getTbflag():
+            return False
+        if self._currentParList and self._currentParList.getPsets():
+            return False
+        for key in kw:
+            if key in ('StdoutAppend', 'Stderr', 'StderrAppend', 'StdoutG',
+                       'StdoutAppendG', 'ParList'):
+                return False
+        stdin = kw.get('Stdin')
+        return stdin is None or isinstance(
+            stdin, (list, tuple, irafexecute.StreamPipe))
+
     def _deleteRunningParList(self):
         """Delete the _runningParList parameter list for this and psets"""
         if self._currentParList and self._runningParList:
             newParList = self._runningParList
             self._runningParList = None
-            for par in newParList.getParList():
-                if isinstance(par, irafpar.IrafParPset):
-                    par.get()._deleteRunningParList()
+            for par in newParList.getPsets():
+                par.get()._deleteRunningParList()
 
     def _setParDictList(self):
         """Set the list of (up to 3) parameter dictionaries for task execution.
@@ -1104,6 +1161,10 @@ class IrafTask(irafglobals.IrafTask, taskpars.TaskPars):
             self._name, iraf.Expand(self._defaultParpath, noerror=1))
 
         codePath = 'a'
+        if self._scrunchParpath:
+            # write parameters of an earlier run before reading them
+            irafpar.parWriter.flush(iraf.Expand(self._scrunchParpath,
+                                                noerror=1))
         if self._scrunchParpath and os.path.exists(
                 iraf.Expand(self._scrunchParpath, noerror=1)):
             self._currentParpath = self._scrunchParpath
@@ -1457,9 +1518,7 @@ class IrafCLTask(IrafTask):
             else:
                 # null pkgname -- just use task in name
                 scriptname = f'<CL script {self._name}>'
-            # force compile to inherit future div. so we don't rely on 2.x div.
-            self._codeObject = compile(self._pycode.code, scriptname, 'exec',
-                                       0, 0)
+            self._codeObject = cl2py.getCodeObject(self._pycode, scriptname)
 
         if self._clFunction is None:
             # Execute the code to define the Python function in clDict
@@ -1498,14 +1557,16 @@ class IrafCLTask(IrafTask):
 
     def __getstate__(self):
         """Return state for pickling"""
-        # Dictionary is OK except for function pointer
+        # Dictionary is OK except for function pointer and code object
+        # (both are recreated from _pycode when needed)
         # Note that __setstate__ is not needed because
         # returned state is a dictionary
-        if self._clFunction is None:
+        if self._clFunction is None and self._codeObject is None:
             return self.__dict__
-        # replace _clFunction in shallow copy of dictionary
+        # replace _clFunction and _codeObject in shallow copy of dictionary
         sdict = self.__dict__.copy()
         sdict['_clFunction'] = None
+        sdict['_codeObject'] = None
         return sdict
 
     # =========================================================
@@ -2,6 +2,8 @@
 
 pyrafDir        Directory with these Pyraf programs
 _use_ecl        Flag to turn on ECL mode in PyRAF
+_native_locals  Flag to translate CL local variables to Python variables
+                (off by default, set PYRAF_NATIVE_LOCALS to turn it on)
 
 This is defined so it is safe to say 'from pyrafglobals import *'
 
@@ -13,6 +15,7 @@ import os as _os
 import sys as _sys
 
 _use_ecl = _os.environ.get("PYRAF_USE_ECL", False)
+_native_locals = _os.environ.get("PYRAF_NATIVE_LOCALS", False)
 
 # -----------------------------------------------------
 # pyrafDir is directory containing this script
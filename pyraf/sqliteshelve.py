@@ -22,27 +22,54 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import collections
+import contextlib
 import pickle
 import sqlite3
 import os
+import time
 
 
 pickle_protocol = 4
 """Protocol version to use for pickling objects"""
 
+cache_size = 256
+"""Default number of unpickled values kept in memory by each shelf"""
+
+# maximum number of keys in a single "in (...)" query
+_MAX_QUERY_KEYS = 500
+
+_SQL_GET = "select value_str from shelf where key_str = ?"
+_SQL_CONTAINS = "select 1 from shelf where key_str = ?"
+_SQL_PUT = ("insert or replace into shelf (key_str, value_str, size, atime)"
+            " values (?, ?, ?, ?)")
+_SQL_TOUCH = "update shelf set atime = ? where key_str = ?"
+_SQL_DELETE = "delete from shelf where key_str = ?"
+
 
 class Shelf:
     """An SQLite implementation of the Python Shelf interface
 
+    Writable shelves use WAL journaling, so that many processes can read
+    the database while one of them writes.  WAL needs shared memory and
+    does not work on network filesystems; with wal=False the rollback
+    journal is used instead.  Every write is a transaction of its own
+    unless it is done within a batch() block or with update().
+
+    The most recently used unpickled values are kept in memory (up to
+    cache_size of them); note that repeated gets of the same key then
+    return the same object.
+
+    Writable shelves also record the size and the last access time of
+    every entry (see entries), and named counters (see addCounters).
     """
-    def __init__(self, fname, mode):
+    def __init__(self, fname, mode, cache_size=cache_size, wal=True):
         """Open or create an existing sqlite3_shelf
 
         """
         if mode == 'r':
             if not os.access(fname, os.R_OK):
                 raise OSError(f'Cannot read {fname}')
-            fname += '?mode=ro'
             self.readonly = True
         elif mode in 'cw':
             if not os.access(fname, os.F_OK):
@@ -54,24 +81,110 @@ class Shelf:
         else:
             raise ValueError(f'Illegal mode {mode}')
 
-        self.db = sqlite3.connect('file:' + fname, uri=True,
-                                  isolation_level=None)
-        # create shelf table if it doesn't already exist
-        cursor = self.db.cursor()
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._batch = 0  # nesting level of batch()
+        self._touched = set()  # keys read since the last access update
+        if self.readonly:
+            self.db = self._connect(fname + '?mode=ro')
+            try:
+                self._hasShelfTable()
+            except sqlite3.OperationalError as e:
+                # a WAL database in a read-only directory can only be
+                # opened as immutable, which is safe only if nobody can
+                # have written to it
+                self.db.close()
+                if os.path.exists(fname + '-wal') or \
+                        os.access(os.path.dirname(fname) or '.', os.W_OK):
+                    raise OSError(f'Cannot read {fname}: {e}')
+                self.db = self._connect(fname + '?mode=ro&immutable=1')
+            if not self._hasShelfTable():
+                self.db.close()
+                raise OSError(f'No table "shelf" in {fname}')
+        else:
+            self.db = self._connect(fname)
+            if wal:
+                self.db.execute("pragma journal_mode=wal")
+                # with WAL, syncing at checkpoints is enough to keep the
+                # database consistent
+                self.db.execute("pragma synchronous=normal")
+            else:
+                # the WAL mode is stored in the database file
+                self.db.execute("pragma journal_mode=delete")
+            # create shelf table if it doesn't already exist
+            if not self._hasShelfTable():
+                self.db.execute("create table shelf"
+                                " (id integer primary key autoincrement,"
+                                " key_str text,"
+                                " value_str text,"
+                                " size integer,"
+                                " atime real,"
+                                " unique(key_str))")
+            else:
+                self._addAccessColumns()
+            self.db.execute("create table if not exists shelf_counters"
+                            " (name text primary key, value integer)")
+
+    @staticmethod
+    def _connect(fname):
+        db = sqlite3.connect('file:' + fname, uri=True,
+                             isolation_level=None)
+        # wait for a writer in another process instead of failing
+        db.execute("pragma busy_timeout=10000")
+        return db
+
+    def _addAccessColumns(self):
+        """Add size and access time columns to a table from older versions"""
+        columns = [row[1] for row in
+                   self.db.execute("pragma table_info(shelf)")]
+        if 'atime' in columns:
+            return
+        with self.batch():
+            self.db.execute("alter table shelf add column size integer")
+            self.db.execute("alter table shelf add column atime real")
+            self.db.execute("update shelf set size = length(value_str),"
+                            " atime = ?", (time.time(),))
+
+    def _hasShelfTable(self):
+        rows = self.db.execute(
+            "select * from sqlite_master"
+            " where type = 'table' and tbl_name = 'shelf'").fetchall()
+        return len(rows) > 0
+
+    def _remember(self, key, value):
+        """Keep an unpickled value in the memory cache"""
+        if self._cache_size <= 0:
+            return
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager doing all writes in a single transaction
+
+        The transaction is rolled back if the block raises an exception.
+        Batches can be nested; the outermost one commits.
+        """
+        if self.readonly:
+            raise OSError("Readonly database")
+        if self._batch == 0:
+            self.db.execute("begin immediate")
+        self._batch += 1
         try:
-            cursor.execute("select * from sqlite_master"
-                           " where type = 'table' and tbl_name = 'shelf'")
-            rows = cursor.fetchall()
-            if len(rows) == 0:
-                if self.readonly:
-                    raise OSError(f'No table "shelf" in {fname}')
-                cursor.execute("create table shelf"
-                               " (id integer primary key autoincrement,"
-                               " key_str text,"
-                               " value_str text,"
-                               " unique(key_str))")
-        finally:
-            cursor.close()
+            yield self
+        except BaseException:
+            self._batch -= 1
+            if self._batch == 0:
+                self.db.execute("rollback")
+                # the memory cache may have uncommitted values
+                self._cache.clear()
+            raise
+        else:
+            self._batch -= 1
+            if self._batch == 0:
+                self.db.execute("commit")
 
     def __setitem__(self, key, value):
         """Set an entry for key to value using pickling
@@ -80,14 +193,28 @@ class Shelf:
         if self.readonly:
             raise OSError("Readonly database")
         pdata = pickle.dumps(value, protocol=pickle_protocol)
-        cursor = self.db.cursor()
-        try:
-            cursor.execute("insert or replace into shelf (key_str, value_str)"
-                           " values (:key,:value)",
-                           {'key': key, 'value': sqlite3.Binary(pdata)})
-            self.db.commit()
-        finally:
-            cursor.close()
+        self.db.execute(_SQL_PUT,
+                        (key, sqlite3.Binary(pdata), len(pdata), time.time()))
+        self._remember(key, value)
+
+    def update(self, items):
+        """Set entries for all keys in a dictionary in one transaction
+
+        """
+        if self.readonly:
+            raise OSError("Readonly database")
+        if hasattr(items, 'items'):
+            items = items.items()
+        items = list(items)
+        now = time.time()
+        rows = []
+        for key, value in items:
+            pdata = pickle.dumps(value, protocol=pickle_protocol)
+            rows.append((key, sqlite3.Binary(pdata), len(pdata), now))
+        with self.batch():
+            self.db.executemany(_SQL_PUT, rows)
+            for key, value in items:
+                self._remember(key, value)
 
     def get(self, key, default_value=None):
         """Return an entry for key
@@ -98,22 +225,50 @@ class Shelf:
         except KeyError:
             return default_value
 
+    def get_many(self, keys):
+        """Return dictionary with the entries for all keys found
+
+        """
+        result = {}
+        missing = []
+        for key in keys:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                result[key] = self._cache[key]
+            else:
+                missing.append(key)
+        if not self.readonly:
+            self._touched.update(result)
+        for i in range(0, len(missing), _MAX_QUERY_KEYS):
+            chunk = missing[i:i + _MAX_QUERY_KEYS]
+            rows = self.db.execute(
+                "select key_str, value_str from shelf where key_str in"
+                f" ({', '.join('?' * len(chunk))})", chunk)
+            for key, pdata in rows:
+                value = pickle.loads(pdata)
+                self._remember(key, value)
+                result[key] = value
+                if not self.readonly:
+                    self._touched.add(key)
+        return result
+
     def __getitem__(self, key):
         """Returns an entry for key
 
         """
-        cursor = self.db.cursor()
         try:
-            cursor.execute("select value_str from shelf"
-                           " where key_str = :key",
-                           {'key': key})
-            result = cursor.fetchone()
-            if result:
-                return pickle.loads(result[0])
-            else:
+            value = self._cache[key]
+        except KeyError:
+            result = self.db.execute(_SQL_GET, (key,)).fetchone()
+            if not result:
                 raise KeyError(key)
-        finally:
-            cursor.close()
+            value = pickle.loads(result[0])
+            self._remember(key, value)
+        else:
+            self._cache.move_to_end(key)
+        if not self.readonly:
+            self._touched.add(key)
+        return value
 
     def keys(self):
         """Return list of keys
@@ -155,20 +310,16 @@ class Shelf:
         """implements in operator if <key> in db
 
         """
-        return key in self.keys()
+        if key in self._cache:
+            return True
+        return self.db.execute(_SQL_CONTAINS, (key,)).fetchone() is not None
 
     def __iter__(self):
         return iter(self.keys())
 
     def __len__(self):
         """ Returns number of entries in shelf """
-        cursor = self.db.cursor()
-        try:
-            cursor.execute('select count(*) from shelf')
-            row = cursor.fetchone()
-            return row[0]
-        finally:
-            cursor.close()
+        return self.db.execute('select count(*) from shelf').fetchone()[0]
 
     def __delitem__(self, key):
         """Delete an existing item.
@@ -176,26 +327,97 @@ class Shelf:
         """
         if self.readonly:
             raise OSError("Readonly database")
-        cursor = self.db.cursor()
-        try:
-            cursor.execute("delete from shelf where key_str = :key",
-                           {'key': key})
-        finally:
-            cursor.close()
+        self._cache.pop(key, None)
+        self._touched.discard(key)
+        self.db.execute(_SQL_DELETE, (key,))
+
+    def entries(self):
+        """Return list of (key, size, last access time) for all entries
+
+        Access times are updated by flush and close.
+        """
+        if self.readonly:
+            raise OSError("Readonly database")
+        self.flush()
+        return self.db.execute(
+            "select key_str, size, atime from shelf").fetchall()
+
+    def evict(self, keys):
+        """Delete all the given keys in a single transaction
+
+        """
+        if self.readonly:
+            raise OSError("Readonly database")
+        keys = list(keys)
+        with self.batch():
+            self.db.executemany(_SQL_DELETE, [(key,) for key in keys])
+        for key in keys:
+            self._cache.pop(key, None)
+            self._touched.discard(key)
+
+    def vacuum(self):
+        """Rebuild the database file to give free space back
+
+        """
+        if self.readonly:
+            raise OSError("Readonly database")
+        self.flush()
+        self.db.execute("vacuum")
+
+    def addCounters(self, counts):
+        """Add dictionary of counts to the counters stored in the shelf
+
+        """
+        if self.readonly:
+            raise OSError("Readonly database")
+        with self.batch():
+            # (no upsert: that needs SQLite 3.24)
+            self.db.executemany(
+                "insert or ignore into shelf_counters (name, value)"
+                " values (?, 0)", [(name,) for name in counts])
+            self.db.executemany(
+                "update shelf_counters set value = value + ? where name = ?",
+                [(n, name) for name, n in counts.items()])
+
+    def counters(self):
+        """Return dictionary with the counters stored in the shelf
+
+        """
+        if self.readonly:
+            return {}
+        return dict(self.db.execute("select name, value from shelf_counters"))
+
+    def flush(self):
+        """Write the access times of the entries read so far
+
+        """
+        if self._touched and not self.readonly:
+            now = time.time()
+            touched = self._touched
+            self._touched = set()
+            with self.batch():
+                self.db.executemany(_SQL_TOUCH,
+                                    [(now, key) for key in touched])
 
     def close(self):
         """Close database and commits changes
 
         """
+        try:
+            self.flush()
+        except sqlite3.Error:
+            # access times are not worth failing for
+            pass
+        self._cache.clear()
         self.db.commit()
         self.db.close()
 
 
-def open(dbpath, mode):
+def open(dbpath, mode, wal=True):
     """Create and return a Shelf object
 
     """
-    return Shelf(dbpath + '.sqlite3', mode)
+    return Shelf(dbpath + '.sqlite3', mode, wal=wal)
 
 
 def close(db):
@@ -1,6 +1,6 @@
 """Run a subprocess and communicate with it via stdin, stdout, and stderr.
 
-Requires that platform supports, eg, posix-style os.pipe and os.fork.
+Requires that platform supports, eg, posix-style os.pipe and os.waitpid.
 
 Subprocess class features:
 
@@ -48,11 +48,28 @@ import errno
 import os
 import select
 import signal
+import subprocess
 import sys
 import time
 
 OS_HAS_FORK = hasattr(os, 'fork')
 
+# default size of the chunks read from subprocess pipes
+DEFAULT_CHUNKSIZE = 65536
+
+if hasattr(os, 'readv'):
+
+    def _readinto(fd, view):
+        """Read from file descriptor directly into a writable buffer"""
+        return os.readv(fd, [view])
+else:
+
+    def _readinto(fd, view):
+        """Read from file descriptor into a writable buffer"""
+        got = os.read(fd, len(view))
+        view[:len(got)] = got
+        return len(got)
+
 
 class SubprocessError(Exception):
     pass
@@ -82,7 +99,7 @@ class Subprocess:
                  in_fd=0,
                  out_fd=1,
                  err_fd=2,
-                 maxChunkSize=1024):
+                 maxChunkSize=DEFAULT_CHUNKSIZE):
         """Launch a subprocess, given command string COMMAND."""
         self.cmd = cmd
         self.pid = None  # pid of child, as known by parent only
@@ -91,6 +108,9 @@ class Subprocess:
         self.control_stdout = control_stdout
         self.control_stdin = control_stdin
         self.maxChunkSize = maxChunkSize
+        if (in_fd, out_fd, err_fd) != (0, 1, 2):
+            raise ValueError("Only the standard streams of the subprocess "
+                             "can be captured")
         self.in_fd, self.out_fd, self.err_fd = in_fd, out_fd, err_fd
         self.fork()
 
@@ -119,104 +139,82 @@ class Subprocess:
             self.parentPipes.append(pRe)
             childPipes.append(cWe)
 
-        self.pid = os.fork()
-
-        if self.pid == 0:  # CHILD ####
-            parentErr = os.dup(
-                self.err_fd)  # Preserve handle on *parent* stderr
-            # Reopen stdin, out, err, on pipe ends:
-            if self.control_stdin:
-                os.dup2(cRp, self.in_fd)  # cRp = sys.stdin
-            if self.control_stdout:
-                os.dup2(cWp, self.out_fd)  # cWp = sys.stdout
-            if self.control_stderr:
-                os.dup2(cWe, self.err_fd)  # cWe = sys.stderr
-            # close parent ends of pipes
-            for i in self.parentPipes:
-                os.close(i)
-            # Ensure (within reason) stray file descriptors are closed
-            fdmax = max(256, parentErr)
-            if self.parentPipes:
-                fdmax = max(fdmax, max(self.parentPipes))
-            rclose = list(range(fdmax + 1))
-            excludes = [self.in_fd, self.out_fd, self.err_fd, parentErr]
-            for i in excludes + self.parentPipes:
-                rclose.remove(i)
-            os_close = os.close
-            os_error = os.error
-            for i in rclose:
-                try:
-                    os_close(i)
-                except os_error:
-                    pass
-            try:
-                os.execvp(cmd[0], cmd)
-                os._exit(1)  # Shouldn't get here
-
-            except os.error as e:
-                if self.control_stderr:
-                    os.dup2(parentErr, 2)  # Reconnect to parent's stderr
-                sys.stderr.write(f"**execvp failed, '{str(e)}'**\n")
-                os._exit(1)
-
-        else:  # PARENT ###
-            # Connect to the child's file descriptors and close child ends of pipes
-            self.toChild = self.readbuf = self.errbuf = None
-            self.toChild_fdlist = []
-            self.fromChild_fdlist = []
-            if self.control_stdin:
-                self.toChild_fdlist.append(pWc)
-                self.toChild = pWc
-            if self.control_stderr:
-                self.errbuf = ReadBuf(pRe, self.maxChunkSize)
-                self.fromChild_fdlist.append(pRe)
-            if self.control_stdout:
-                self.readbuf = ReadBuf(pRc, self.maxChunkSize)
-                self.fromChild_fdlist.append(pRc)
-            # close child ends of pipes
-            for i in childPipes:
+        # Fork and exec in one step in C, so that no Python code runs in
+        # the child; this is safe when called from a thread (e.g., when
+        # spare IRAF processes are started in the background).  The
+        # child inherits the signal dispositions, as with os.fork.
+        try:
+            self._popen = subprocess.Popen(
+                cmd,
+                stdin=cRp if self.control_stdin else None,
+                stdout=cWp if self.control_stdout else None,
+                stderr=cWe if self.control_stderr else None,
+                close_fds=True,
+                restore_signals=False)
+        except OSError as e:
+            for i in self.parentPipes + childPipes:
                 os.close(i)
-            try:
-                # this is useless since the child may not have erred yet
-                pid, err = os.waitpid(self.pid, os.WNOHANG)
-            except os.error as xxx_todo_changeme1:
-                (errnum, msg) = xxx_todo_changeme1.args
-                if errnum == 10:
-                    raise SubprocessError(f"Subprocess '{self.cmd}' failed.")
-                else:
-                    raise SubprocessError(f"Subprocess '{self.cmd}' failed "
-                                          f"[{errnum:d}]: {msg}")
-            if pid != self.pid:
-                # flag indicating process is still running
-                self.return_code = None
-            elif err == 0:
-                # Child has exited already but not in error, so we won't
-                # shut down the pipes or say anything more at this point.
-                # Set return_code so we don't call waitpid again.
-                self.return_code = 0
+            self.parentPipes = []
+            raise SubprocessError(f"Subprocess '{self.cmd}' failed: {str(e)}")
+        self.pid = self._popen.pid
+
+        # Connect to the child's file descriptors and close child ends of pipes
+        self.toChild = self.readbuf = self.errbuf = None
+        self.toChild_fdlist = []
+        self.fromChild_fdlist = []
+        if self.control_stdin:
+            self.toChild_fdlist.append(pWc)
+            self.toChild = pWc
+        if self.control_stderr:
+            self.errbuf = ReadBuf(pRe, self.maxChunkSize)
+            self.fromChild_fdlist.append(pRe)
+        if self.control_stdout:
+            self.readbuf = ReadBuf(pRc, self.maxChunkSize)
+            self.fromChild_fdlist.append(pRc)
+        # close child ends of pipes
+        for i in childPipes:
+            os.close(i)
+        try:
+            # this is useless since the child may not have erred yet
+            pid, err = os.waitpid(self.pid, os.WNOHANG)
+        except os.error as xxx_todo_changeme1:
+            (errnum, msg) = xxx_todo_changeme1.args
+            if errnum == 10:
+                raise SubprocessError(f"Subprocess '{self.cmd}' failed.")
             else:
-                # Process exited with an error.  Clean up immediately and
-                # raise an exception.
-                self._cleanUp(err)
-                sig = err & 0xff
-                rc = (err & 0xff00) >> 8
-                self.return_code = rc
-                if sig:
-                    raise SubprocessError(
-                        f"Child process '{self.cmd}' killed by signal {sig:d} "
-                        f"with return code {rc:d}")
-                else:
-                    raise SubprocessError(
-                        f"Child process '{self.cmd}' exited "
-                        f"with return code {rc:d}")
+                raise SubprocessError(f"Subprocess '{self.cmd}' failed "
+                                      f"[{errnum:d}]: {msg}")
+        if pid != self.pid:
+            # flag indicating process is still running
+            self.return_code = None
+        elif err == 0:
+            # Child has exited already but not in error, so we won't
+            # shut down the pipes or say anything more at this point.
+            # Set return_code so we don't call waitpid again.
+            self.return_code = 0
+        else:
+            # Process exited with an error.  Clean up immediately and
+            # raise an exception.
+            self._cleanUp(err)
+            sig = err & 0xff
+            rc = (err & 0xff00) >> 8
+            self.return_code = rc
+            if sig:
+                raise SubprocessError(
+                    f"Child process '{self.cmd}' killed by signal {sig:d} "
+                    f"with return code {rc:d}")
+            else:
+                raise SubprocessError(
+                    f"Child process '{self.cmd}' exited "
+                    f"with return code {rc:d}")
 
     ### Write input to subprocess ###
 
     def write(self, strval, timeout=10, printtime=2):
-        """Write a bytes or string to the subprocess.  Times out (and raises
-        an exception) if the process is not ready in timeout seconds.
-        Prints a message indicating that it is waiting every printtime
-        seconds.
+        """Write a bytes-like object or string to the subprocess.  Times out
+        (and raises an exception) if the process is not ready in timeout
+        seconds.  Prints a message indicating that it is waiting every
+        printtime seconds.
 
         """
 
@@ -242,10 +240,15 @@ class Subprocess:
                 ## if totalwait: print "waiting for subprocess..."
                 totalwait = totalwait + printtime
                 if select.select([], self.toChild_fdlist, [], printtime)[1]:
-                    if not isinstance(strval, bytes):
+                    if isinstance(strval, str):
                         strval = strval.encode()
-                    if os.write(self.toChild, strval) != len(strval):
-                        raise SubprocessError(f"Write error to {self}")
+                    # large buffers may be written in several pieces
+                    data = memoryview(strval)
+                    while data:
+                        nwritten = os.write(self.toChild, data)
+                        if nwritten <= 0:
+                            raise SubprocessError(f"Write error to {self}")
+                        data = data[nwritten:]
                     return  # ===>
             raise SubprocessError(f"Write to {self} blocked")
         except OSError as e:
@@ -403,6 +406,8 @@ class Subprocess:
         self._closePipes()
         self.pid = None
         self.return_code = (err & 0xff00) >> 8
+        # the process was reaped here, not by the Popen object
+        self._popen.returncode = self.return_code
 
     def _closePipes(self):
         """Close all pipes from parent to child"""
@@ -511,38 +516,66 @@ class Subprocess:
 
 class ReadBuf:
     """Output buffer for non-blocking reads on selectable files like pipes and
-    sockets.  Init with a file descriptor for the file."""
+    sockets.  Init with a file descriptor for the file.
+
+    Data are read directly into a preallocated bytearray that grows only
+    when a single request exceeds its size, and shrinks back once that
+    data are consumed.  The unconsumed data are buf[start:end], so
+    consuming data just advances the start offset; the buffer is
+    compacted only when more room is needed at the end.
+    """
 
-    def __init__(self, fd, maxChunkSize=1024):
+    def __init__(self, fd, maxChunkSize=DEFAULT_CHUNKSIZE):
         """Encapsulate file descriptor FD, with optional MAX_READ_CHUNK_SIZE
-        (default 1024)."""
+        (default 64 KiB)."""
 
         if fd < 0:
             raise ValueError("File descriptor fd is negative")
         self.fd = fd
         self.eof = 0  # May be set with stuff still in .buf
-        self.buf = ''
-        self.chunkSize = maxChunkSize  # Biggest read chunk, default 1024.
+        self.chunkSize = maxChunkSize  # Biggest read chunk, default 64 KiB.
+        self.buf = bytearray(2 * maxChunkSize)
+        self.start = 0  # offset of first unconsumed byte in buf
+        self.end = 0  # offset following last unconsumed byte in buf
 
     def fileno(self):
         return self.fd
 
-    def readPendingChars(self, max=None):
-        """Consume uncomsumed output from FILE, or empty string if nothing
-        pending.  Returns bytes."""
-
-        if (max is not None) and (max <= 0):
-            return b''  # ===>
-
-        if self.buf:
-            if max and (len(self.buf) > max):
-                got, self.buf = self.buf[0:max], self.buf[max:]
-            else:
-                got, self.buf = self.buf, b''
-            return got  # ===>
+    def __len__(self):
+        """Number of bytes read from the file but not yet consumed"""
+        return self.end - self.start
+
+    def _fill(self, nchars=0):
+        """Read one chunk (with room for at least nchars bytes) from the
+        file, blocking until data are available.  Returns the number of
+        bytes read, which is zero on EOF."""
+
+        buf = self.buf
+        room = max(self.chunkSize, nchars)
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(buf) - self.end < room and self.start > 0:
+            # move unconsumed data to the front of the buffer
+            n = self.end - self.start
+            buf[:n] = buf[self.start:self.end]
+            self.start, self.end = 0, n
+        if len(buf) - self.end < room:
+            buf.extend(bytes(self.end + room - len(buf)))
+        try:
+            with memoryview(buf) as view:
+                got = _readinto(self.fd, view[self.end:self.end + room])
+        except OSError:
+            # read error occurs if self.fd has been closed
+            # treat like EOF
+            got = 0
+        if got:
+            self.end = self.end + got
+        else:
+            self.eof = 1
+        return got
 
-        if self.eof:
-            return b''  # ===>
+    def _pending(self):
+        """True if data can be read from the file without blocking"""
 
         try:
             sel = select.select([self.fd], [], [self.fd], 0)
@@ -550,20 +583,34 @@ class ReadBuf:
             # select error occurs if self.fd been closed
             # treat like EOF
             self.eof = 1
+            return False
+        return bool(sel[0])
+
+    def _consume(self, nchars):
+        """Return the next nchars unconsumed bytes and mark them consumed"""
+
+        start = self.start
+        nchars = min(nchars, self.end - start)
+        with memoryview(self.buf) as view:
+            got = bytes(view[start:start + nchars])
+        self.start = start + nchars
+        if self.start == self.end and len(self.buf) > 2 * self.chunkSize:
+            # give back the memory used by a large read
+            self.buf = bytearray(2 * self.chunkSize)
+            self.start = self.end = 0
+        return got
+
+    def readPendingChars(self, max=None):
+        """Consume uncomsumed output from FILE, or empty string if nothing
+        pending.  Returns bytes."""
+
+        if (max is not None) and (max <= 0):
             return b''  # ===>
-        if sel[0]:
-            got = os.read(self.fd, self.chunkSize)
-            if got:
-                if max and (len(got) > max):
-                    self.buf = got[max:]
-                    return got[:max]  # ===>
-                else:
-                    return got  # ===>
-            else:
-                self.eof = 1
+
+        if self.start == self.end:
+            if self.eof or not self._pending() or not self._fill():
                 return b''  # ===>
-        else:
-            return b''  # ===>
+        return self._consume(max or (self.end - self.start))
 
     def readPendingLine(self, block=0):
         """Return pending output from FILE, up to first newline (inclusive).
@@ -571,51 +618,26 @@ class ReadBuf:
 
         Does not block unless optional arg BLOCK is true.  This may return
         a partial line if the input line is longer than chunkSize (default
-        1024) characters."""
+        64 KiB) characters."""
 
-        if self.buf:
-            to = self.buf.find(b'\n')
+        # number of unconsumed bytes already searched for a newline
+        # (relative to start, which changes if the buffer is compacted)
+        nsearched = 0
+        nread = 0
+        while True:
+            to = self.buf.find(b'\n', self.start + nsearched, self.end)
             if to != -1:
-                got, self.buf = self.buf[:to + 1], self.buf[to + 1:]
-                return got  # ===>
-            got, self.buf = self.buf, b''
-        elif self.eof:
-            return b''  # ===>
-        else:
-            got = b''
-
-        # 'got' contains the (former) contents of the buffer, but it
-        # doesn't include a newline.
-        fdlist = [self.fd]
-        if block:
-            # wait indefinitely for input
-            waittime = None
-        else:
-            # don't wait at all
-            waittime = 0
-        while True:  # (we'll only loop if block set)
-            try:
-                sel = select.select(fdlist, [], fdlist, waittime)
-            except OSError:
-                # select error occurs if self.fd has been closed
-                # treat like EOF
-                self.eof = 1
-                return got
-            if sel[0]:
-                newgot = os.read(self.fd, self.chunkSize)
-                if newgot:
-                    got = got + newgot
-                    to = got.find(b'\n')
-                    if to != -1:
-                        got, self.buf = got[:to + 1], got[to + 1:]
-                        return got  # ===>
-                else:
-                    # return partial line on EOF
-                    self.eof = 1
-                    return got  # ===>
-            if not block:
-                return got  # ===>
-            # otherwise - no newline, blocking requested, no eof - loop. # ==^
+                return self._consume(to + 1 - self.start)  # ===>
+            nsearched = self.end - self.start
+            # only one read is done if not blocking
+            if self.eof or not (block or (nread == 0 and self._pending())):
+                break
+            if not self._fill():
+                break
+            nread = nread + 1
+            # otherwise - no newline yet - loop. # ==^
+        # return partial line
+        return self._consume(self.end - self.start)  # ===>
 
     def readline(self):
         """Return next output line from file, blocking until it is received."""
@@ -628,37 +650,9 @@ class ReadBuf:
 
         if nchars <= 0:
             return b''
-        if self.buf:
-            if len(self.buf) >= nchars:
-                got, self.buf = self.buf[:nchars], self.buf[nchars:]
-                return got  # ===>
-            got, self.buf = self.buf, b''
-        elif self.eof:
-            return b''  # ===>
-        else:
-            got = b''
-
-        fdlist = [self.fd]
-        while True:
-            try:
-                sel = select.select(fdlist, [], fdlist)
-            except OSError:
-                # select error occurs if self.fd has been closed
-                # treat like EOF
-                self.eof = 1
-                return got
-            if sel[0]:
-                newgot = os.read(self.fd, self.chunkSize)
-                if newgot:
-                    got = got + newgot
-                    if len(got) >= nchars:
-                        got, self.buf = got[:nchars], got[nchars:]
-                        return got  # ===>
-                else:
-                    self.eof = 1
-                    return got
-            else:
-                print('Select returned without input?')
+        while self.end - self.start < nchars and not self.eof:
+            self._fill(nchars - (self.end - self.start))
+        return self._consume(nchars)
 
 
 #############################################################################
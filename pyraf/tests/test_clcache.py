@@ -42,3 +42,66 @@ def test_codecache(tmpdir):
     newidx, newpycode = codeCache.get(fpath)
     assert newidx == idx
     assert isinstance(newpycode, DummyCodeObj)
+
+
+def test_codecache_update(tmpdir):
+    codeCache = _CodeCache([os.path.join(tmpdir.strpath, 'clcache')])
+    items = {}
+    for i in range(3):
+        f = tmpdir.join(f'dummy{i}.cl')
+        f.write(f'print {i}\n')
+        pc = DummyCodeObj()
+        pc.code = f'print({i})'
+        items[codeCache.getIndex(str(f))] = pc
+    codeCache.update(items)
+    for index in items:
+        assert index in codeCache
+    assert 'nonexistent' not in codeCache
+    for i in range(3):
+        index, pycode = codeCache.get(str(tmpdir.join(f'dummy{i}.cl')))
+        assert pycode.code == f'print({i})'
+
+
+def test_pycode_marshal():
+    import pickle
+    import types
+    from pyraf import cl2py
+    pycode = cl2py.cl2py(string='procedure ttt(x)\nint x\nbegin\n'
+                         '    print(x)\nend\n', usecache=False)
+    pycode.compile()
+    pycode = pickle.loads(pickle.dumps(pycode))
+    code = pycode.getCodeObject('<CL script pkg.ttt>')
+    assert code.co_filename == '<CL script pkg.ttt>'
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            assert const.co_filename == '<CL script pkg.ttt>'
+    namespace = {}
+    exec(code, namespace)
+    assert pycode.vars.proc_name in namespace
+    del pycode.marshalled
+    assert pycode.getCodeObject('<CL script pkg.ttt>') is None
+
+
+def test_codecache_clean(tmpdir, capsys):
+    import time
+    from pyraf.clcache import _currentVersion
+    codeCache = _CodeCache([os.path.join(tmpdir.strpath, 'clcache')])
+    digest = 'x' * 32
+    items = {f'{i:032d}' + _currentVersion(): DummyCodeObj()
+             for i in range(4)}
+    items[digest + 'obsolete'] = DummyCodeObj()
+    codeCache.update(items)
+    shelf = codeCache.writeCache
+    # make the first entry old
+    shelf.db.execute('update shelf set atime = ? where key_str = ?',
+                     (time.time() - 100 * 86400,
+                      f'{0:032d}' + _currentVersion()))
+    n, nbytes = codeCache.clean(maxAge=30)
+    assert n == 2
+    assert len(shelf) == 3
+    size = sum(size for key, size, atime in shelf.entries())
+    n, nbytes = codeCache.clean(maxSize=size - 1)
+    assert n == 1
+    assert len(shelf) == 2
+    codeCache.report()
+    assert '2 entries' in capsys.readouterr().out
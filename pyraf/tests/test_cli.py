@@ -546,3 +546,144 @@ def test_real_parameter_str_precision():
     stdout = io.StringIO()
     iraf.print_real(1000000000000000.0, Stdout=stdout)
     assert stdout.getvalue() == "1e+15\n"
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_native_locals(monkeypatch, native):
+    # Local variables translated to Python variables must behave like
+    # the parameter objects (type conversion, scan, parameter fields)
+    monkeypatch.setattr(pyrafglobals, '_native_locals', native)
+    iraf.task(
+        native_loop='''procedure native_loop(n)
+                       int n
+                       begin
+                           int i, j, k = 0, m
+                           real x = 0.5
+                           bool flag = yes
+                           for (i=1; i<=n; i+=1) {
+                               k += i % 3
+                               x = x + i / 2.
+                               if (i > 3) flag = no
+                           }
+                           m = 7.9
+                           print(i, k, x, flag, m)
+                           x = 0.1 + 0.2
+                           print(x)
+                           print("4 5") | scan(j, i)
+                           print(j + i, k.p_type)
+                       end''',
+        IsCmdString=True
+    )
+    stdout = io.StringIO()
+    iraf.native_loop(10, Stdout=stdout)
+    assert stdout.getvalue() == "11 10 28.0 no 7\n0.3\n9 i\n"
+    code = iraf.getTask('native_loop').getCode()
+    assert ('Vars_x' in code) == native
+    # scanned variables and field references always use the parameters
+    assert 'Vars_j' not in code and 'Vars_k' not in code
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_native_locals_undefined(monkeypatch, native):
+    # Reading a local variable before it is set is the CL error
+    monkeypatch.setattr(pyrafglobals, '_native_locals', native)
+    iraf.task(
+        undefined_local='''procedure undefined_local()
+                           begin
+                               int i
+                               real x = 1.5
+                               print(x + i)
+                           end''',
+        IsCmdString=True
+    )
+    with pytest.raises(ValueError,
+                       match="Attempt to access undefined local variable `i'"):
+        iraf.undefined_local()
+    code = iraf.getTask('undefined_local').getCode()
+    assert 'Vars_i' not in code and ('Vars_x' in code) == native
+
+
+def test_scan_specialized(tmpdir):
+    # scan/fscan setting only procedure variables are translated to
+    # iraf.scanPars/fscanPars and behave like the generic functions
+    datafile = tmpdir / 'scandata.txt'
+    datafile.write_text('1 2.5 abc\n2 x y\n3\n', encoding='ascii')
+    iraf.task(
+        scan_loop='''procedure scan_loop(list)
+                     struct *list
+                     begin
+                         int i, n
+                         real x
+                         string s
+                         struct line
+                         while (fscan(list, i, x, s) != EOF)
+                             print(i, x, s, nscan())
+                         print("4 0.5 a b  c") | scan(i, x, line)
+                         print(i, x, line)
+                         n = fscan("7", i, x, s)
+                         print(n, i)
+                     end''',
+        IsCmdString=True
+    )
+    stdout = io.StringIO()
+    iraf.scan_loop(str(datafile), Stdout=stdout)
+    assert stdout.getvalue() == ("1 2.5 abc3\n2 2.5 abc1\n3 2.5 abc1\n"
+                                 "4 0.5 a b  c\n1 7\n")
+    code = iraf.getTask('scan_loop').getCode()
+    assert 'iraf.fscanPars(' in code and 'iraf.scanPars(' in code
+    assert 'locals()' not in code
+
+
+def _eof():
+    raise EOFError
+
+
+def _scan_outcome(func, *args):
+    # (the generic functions name the parameters Vars.name)
+    try:
+        return func(*args), None
+    except TypeError as e:
+        return None, str(e).replace('Vars.', '')
+
+
+@pytest.mark.parametrize('names,struct', [
+    (['line', 'i'], None),
+    (['line', 'i'], 'old'),
+    (['i', 'line'], None),
+    (['line'], None),
+])
+def test_scan_specialized_eof(monkeypatch, capsys, names, struct):
+    # at EOF, scanPars/fscanPars treat struct targets like scan/fscan
+    from .. import iraffunctions, irafpar
+    monkeypatch.setattr(iraffunctions._irafutils, 'tkreadline', lambda: '')
+    results = []
+    for specialized in (False, True):
+        for scan in (False, True):
+            pl = irafpar.IrafParList('scan_eof')
+            pl.addParam(irafpar.IrafParFactory(
+                ('line', 'struct', 'h', struct, '', None, '')))
+            pl.addParam(irafpar.IrafParFactory(
+                ('i', 'i', 'h', '', '', None, '')))
+            if specialized:
+                targets = iraffunctions.ScanTargets(pl, names)
+                if scan:
+                    outcome = _scan_outcome(iraffunctions.scanPars, targets)
+                else:
+                    outcome = _scan_outcome(iraffunctions.fscanPars, targets,
+                                            _eof)
+            else:
+                args = [{'Vars': pl, 'eof': _eof}] + \
+                    ['Vars.' + name for name in names]
+                if scan:
+                    outcome = _scan_outcome(iraffunctions.scan, *args)
+                else:
+                    args.insert(1, 'eof()')
+                    outcome = _scan_outcome(iraffunctions.fscan, *args)
+            results.append((outcome,
+                            capsys.readouterr().out.replace('Vars.', ''),
+                            pl.getParObject('line').value))
+    assert results[:2] == results[2:]
+    # (fscan raises, scan prints the error)
+    assert (results[0][0][1] is not None) == (names[0] == 'line' and
+                                              struct is None and
+                                              len(names) > 1)
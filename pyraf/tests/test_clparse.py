@@ -0,0 +1,114 @@
+import glob
+import os
+
+import pytest
+
+from .. import clparse, clscan
+from ..clast import AST
+from ..cltoken import Token
+
+CL_DIRS = [
+    os.path.join(os.path.dirname(clparse.__file__), 'noiraf'),
+    os.path.join(os.path.dirname(__file__), 'testpkg'),
+]
+
+CL_SOURCES = [
+    'print (a)\nx = 5 ; task a b c > file &\n',
+    'if (x) { y } else z\n',
+    'if (a) if (b) x else y\nif (a)\n  x\nelse if (b)\n  y\nelse\n  z\n',
+    'print (a, b) | sort | uniq (c) &\nprint ((a + b) * 2, c)\n',
+    'print (a) // "x"\nprint ()\nprint (dir=yes)\ntask(a, b, | task2 c, d)\n',
+    'imstat x fields="mean" lower=INDEF upper=10. format+ >> log\n',
+    'x =\n= x\ns1 = fscan (list, line) ; a[1, i] += b ** 2\n',
+    'for (i = 1; i <= n; i += 1) {\n  next\n}\nwhile (yes) break\n',
+    'switch (x) {\ncase 1, 2:\n  y\ncase "a":\n  z\ndefault:\n  w\n}\n',
+    'loop: goto loop\n!ls -l\n{ a ; b }\nprint (a)\nend\n',
+    'procedure t(a, b)\nstring a = "x" {prompt="p"}\n'
+    'int b = 1 {min=0, max=10}\nreal c[2, 3]\nstruct *list\n'
+    'begin\n  int i = -1, j\n  print (a)\n  b = a // "x"\n'
+    '  if (!access (a) && b > 0) {\n    error (1, "no " // a)\n  }\n'
+    'end\n',
+]
+
+
+def same_tree(a, b):
+    """Compare trees: node types and shapes and token identity"""
+    # statement lists are deep, so no recursion
+    pairs = [(a, b)]
+    while pairs:
+        a, b = pairs.pop()
+        if isinstance(a, Token) or isinstance(b, Token):
+            if a is not b:
+                return False
+        elif a.type != b.type or len(a) != len(b):
+            return False
+        else:
+            pairs.extend(zip(a, b))
+    return True
+
+
+def cl_files():
+    return sorted(
+        fname for d in CL_DIRS for fname in glob.glob(os.path.join(d, '*.cl')))
+
+
+def parse_both(tokens, fallback=clparse.CLParser):
+    """Return trees from the Earley parser and the descent parser"""
+    parser = clparse.CLDescentParser(fallback)
+    tree = parser.parse(list(tokens))
+    assert parser._earleyParser is None
+    return fallback(AST).parse(list(tokens)), tree
+
+
+@pytest.mark.parametrize('source', CL_SOURCES)
+def test_descent_parser_source(source):
+    tokens = clscan.CLScanner().tokenize(source)
+    earley, descent = parse_both(tokens)
+    assert same_tree(earley, descent)
+
+
+@pytest.mark.parametrize('fname', cl_files())
+def test_descent_parser_files(fname):
+    with open(fname) as fh:
+        tokens = clscan.CLScanner().tokenize(fh.read())
+    earley, descent = parse_both(tokens)
+    assert same_tree(earley, descent)
+
+
+def test_descent_parser_ecl():
+    types = ('IFERR { IDENT NEWLINE } NEWLINE THEN IF ( IDENT ) IDENT '
+             'ELSE IDENT NEWLINE IFNOERR { IDENT ; } NEWLINE IDENT NEWLINE')
+    tokens = [Token(atype, 'x', 1) for atype in types.split()]
+    earley, descent = parse_both(tokens, clparse.EclParser)
+    assert same_tree(earley, descent)
+
+
+def test_descent_parser_error():
+    tokens = clscan.CLScanner().tokenize('print (a\nif (x) }\n')
+    with pytest.raises(SyntaxError) as earley:
+        clparse.CLParser(AST).parse(list(tokens), fname='t.cl')
+    with pytest.raises(SyntaxError) as descent:
+        clparse.CLDescentParser().parse(list(tokens), fname='t.cl')
+    assert str(descent.value) == str(earley.value)
+
+
+def test_scanners_created_on_demand(monkeypatch):
+    monkeypatch.setattr(clscan, '_scannerDict', None)
+    tokens = clscan.CLScanner().tokenize('imstat x fields="mean"\n')
+    assert [t.type for t in tokens] == [
+        'IDENT', 'STRING', ',', 'IDENT', '=', 'QSTRING', 'NEWLINE']
+    scanners = clscan._getScannerDict()
+    assert 0 < len(scanners) < len(scanners.classes)
+
+
+def test_scanner_token_stream():
+    tokens = clscan.CLScanner().tokenize(
+        'imstat x lower=1 # comment\n{ t(a, | b) }\n')
+    assert [(t.type, t.attr, t.lineno) for t in tokens] == [
+        ('IDENT', 'imstat', 1), ('STRING', 'x', 1), (',', None, 1),
+        ('IDENT', 'lower', 1), ('=', None, 1), ('STRING', '1', 1),
+        ('NEWLINE', None, 1), ('{', None, 2), ('IDENT', 't', 2),
+        ('(', None, 2), ('IDENT', 'a', 2), ('PIPE', '|', 2),
+        ('IDENT', 'b', 2), (')', None, 2), ('NEWLINE', None, 2),
+        ('}', None, 2), ('NEWLINE', None, 2)]
+    assert not hasattr(tokens[0], '__dict__')
@@ -1,14 +1,20 @@
 """These were tests under core/irafparlist and core/subproc in pandokia."""
 
 
+import copy
+import os
+import threading
 import time
+import tracemalloc
 import uuid
 
 import pytest
 
 from .utils import HAS_IRAF
 
-from ..irafpar import IrafParList
+from .. import clcache, irafpar
+from ..filecache import StatCache
+from ..irafpar import IrafParList, makeIrafPar
 from ..subproc import Subprocess
 from ..tools import basicpar
 from ..tools.basicpar import parFactory
@@ -300,3 +306,365 @@ def test_irafparlist_boolean_convert_true(_ipl, _pars):
     for test_input in test_inputs:
         setattr(_ipl, par.name, test_input)
         assert getattr(_ipl, par.name) == 'yes'
+
+
+def test_irafparlist_overlay(_ipl, _pars):
+    for par in _pars:
+        _ipl.addParam(par)
+    base = _ipl.getParList()[:]
+    overlay = _ipl.overlay()
+    assert len(overlay) == len(_ipl)
+    overlay.clearFlags()
+    overlay.setParList('Bob', diameter=16)
+    overlay.setAutoMode('h')
+    # only the parameters that were used are copied
+    assert [p.name for p in overlay.getCopiedPars()] == \
+        ['caller', 'diameter', '$nargs']
+    assert overlay.getValue('diameter', native=1) == 16
+    assert overlay.getParObject('caller').isCmdline()
+    assert overlay.getParObject('pi').mode == 'h'
+    assert overlay.getParDict()['topping'].value == 'peps'
+    # the base list is unchanged
+    assert _ipl.getParList() == base
+    assert [p.value for p in _ipl.getParList()] == \
+        ['Ima Hungry', 12, 3.14159, 'yes', 'peps', 'al', 0]
+    assert _ipl.getParObject('pi').mode == 'a'
+    # the full list is copied when needed
+    pars = overlay.getParList()
+    assert not any(p is q for p, q in zip(pars, base))
+    assert [p.mode for p in pars[:5]] == 5 * ['h']
+    assert overlay.getParDict()['delivery'] is pars[3]
+    # a deep copy is a plain list
+    plain = copy.deepcopy(overlay)
+    assert plain.getCopiedPars() == plain.getParList()
+    assert plain.getValue('caller') == 'Bob'
+
+
+@pytest.mark.parametrize('accessor', [
+    lambda pl: pl.getParObject('diam'),
+    lambda pl: pl.getParObjects('diameter')[''],
+    lambda pl: pl.getParDict()['diameter'],
+    lambda pl: pl.getParDict().get('diam'),
+    lambda pl: pl.getParDict().getall('di')[0],
+    lambda pl: dict(pl.getParDict().items())['diameter'],
+    lambda pl: [p for p in pl.getParDict().values() if p.name[0] == 'd'][0],
+    lambda pl: pl.getParDict().copy()['diameter'],
+    lambda pl: pl.getParList()[1],
+    lambda pl: pl.getCopiedPars()[0],
+])
+def test_irafparlist_overlay_accessors(_ipl, _pars, accessor):
+    # changes through any accessor of an overlay leave the base alone
+    for par in _pars:
+        _ipl.addParam(par)
+    overlay = _ipl.overlay()
+    overlay.getParObject('diameter')
+    p = accessor(overlay)
+    assert p.name == 'diameter'
+    p.set(20)
+    p.setCmdline()
+    p.mode = 'h'
+    assert _ipl.getValue('diameter', native=1) == 12
+    assert not _ipl.getParObject('diameter').isCmdline()
+    assert _ipl.getParObject('diameter').mode == 'a'
+
+
+def test_irafparlist_overlay_psets(_ipl, monkeypatch):
+    # the pset "task" only needs a parameter dictionary here
+    monkeypatch.setattr(irafpar.IrafParPset, 'get',
+                        lambda self: IrafParList('pizza'))
+    _ipl.addParam(irafpar.IrafParFactory(('pizza', 'pset', 'h', 'pizza', '',
+                                          None, '')))
+    overlay = _ipl.overlay()
+    pset, = overlay.getPsets()
+    assert pset is not _ipl.getPsets()[0]
+    pset.set('pasta')
+    assert _ipl.getParObject('pizza').value == 'pizza'
+    assert overlay.getParObject('pizza') is pset
+
+
+def test_pardict_overlay_delete(_ipl, _pars):
+    # deleting from an overlay dictionary leaves the base keys alone
+    for par in _pars:
+        _ipl.addParam(par)
+    base = _ipl.getParDict()
+    nbase = len(base)
+    base.getallkeys('di')
+    overlay = _ipl.overlay().getParDict()
+    assert overlay.getallkeys('di') == ['diameter']
+    del overlay['diam']
+    assert 'diameter' not in overlay
+    assert base.getallkeys('di') == ['diameter']
+    assert base['diam'].name == 'diameter'
+    overlay = _ipl.overlay().getParDict()
+    overlay.getallkeys('di')
+    overlay.clear()
+    assert not overlay.getallkeys('di')
+    assert base.getallkeys('di') == ['diameter']
+    assert len(base) == nbase
+
+
+def test_parwriter(tmpdir, monkeypatch, _ipl, _pars):
+    for par in _pars:
+        _ipl.addParam(par)
+    fname = str(tmpdir / 'uparm.par')
+    writer = irafpar._ParWriter(3600)
+    monkeypatch.setattr(irafpar, 'parWriter', writer)
+    # writes are coalesced until the next flush
+    for diameter in (14, 16):
+        _ipl.setParam('diameter', diameter)
+        writer.save(_ipl, fname)
+    assert not os.path.exists(fname)
+    # the pending write is a copy of the list as it was saved
+    _ipl.setParam('diameter', 20)
+    writer.flush()
+    assert not writer.pending
+    saved = IrafParList('bobs_pizza', fname)
+    assert saved.getValue('diameter', native=1) == 16
+    writer.timer.cancel()
+    # a direct save replaces the pending write; no temporary files remain
+    writer.save(_ipl, fname)
+    _ipl.setParam('diameter', 18)
+    _ipl.saveParList(fname)
+    assert not writer.pending
+    assert tmpdir.listdir() == [tmpdir / 'uparm.par']
+
+
+def test_parwriter_direct_save(tmpdir, monkeypatch, _ipl, _pars):
+    # a direct save during a write-behind flush is not overwritten
+    for par in _pars:
+        _ipl.addParam(par)
+    fname = str(tmpdir / 'uparm.par')
+    writer = irafpar._ParWriter(3600)
+    monkeypatch.setattr(irafpar, 'parWriter', writer)
+    _ipl.setParam('diameter', 14)
+    writer.save(_ipl, fname)
+    writer.timer.cancel()
+    pending = writer.pending[fname]
+    started, proceed = threading.Event(), threading.Event()
+
+    def slowSave(filename):
+        started.set()
+        proceed.wait(5)
+        return IrafParList.saveParList(pending, filename)
+
+    object.__setattr__(pending, 'saveParList', slowSave)
+    flusher = threading.Thread(target=writer.flush)
+    flusher.start()
+    assert started.wait(5)
+    _ipl.setParam('diameter', 18)
+    direct = threading.Thread(target=_ipl.saveParList, args=(fname,))
+    direct.start()
+    direct.join(0.2)
+    assert direct.is_alive()
+    proceed.set()
+    flusher.join(5)
+    direct.join(5)
+    saved = IrafParList('bobs_pizza', fname)
+    assert saved.getValue('diameter', native=1) == 18
+
+
+def test_saveparlist_link(tmpdir, _ipl, _pars):
+    # the target of a link is replaced, keeping its permissions
+    for par in _pars:
+        _ipl.addParam(par)
+    target = tmpdir / 'real.par'
+    target.write('')
+    os.chmod(str(target), 0o600)
+    fname = str(tmpdir / 'uparm.par')
+    os.symlink(str(target), fname)
+    _ipl.setParam('diameter', 14)
+    _ipl.saveParList(fname)
+    assert os.path.islink(fname)
+    assert os.stat(str(target)).st_mode & 0o777 == 0o600
+    saved = IrafParList('bobs_pizza', fname)
+    assert saved.getValue('diameter', native=1) == 14
+    assert sorted(tmpdir.listdir()) == [target, tmpdir / 'uparm.par']
+
+
+def test_parwriter_default(tmpdir, monkeypatch, _ipl, _pars):
+    for par in _pars:
+        _ipl.addParam(par)
+    fname = str(tmpdir / 'uparm.par')
+    # by default the file is written at once
+    assert irafpar.parWriter.interval == 0
+    _ipl.setParam('diameter', 14)
+    irafpar.parWriter.save(_ipl, fname)
+    assert not irafpar.parWriter.pending
+    saved = IrafParList('bobs_pizza', fname)
+    assert saved.getValue('diameter', native=1) == 14
+    # with write-behind, a timer writes the pending files
+    writer = irafpar._ParWriter(0.01)
+    _ipl.setParam('diameter', 16)
+    writer.save(_ipl, fname)
+    writer.timer.join(5)
+    assert not writer.pending and writer.timer is None
+    saved = IrafParList('bobs_pizza', fname)
+    assert saved.getValue('diameter', native=1) == 16
+
+
+def test_special_par_index(tmpdir, monkeypatch):
+    monkeypatch.setattr(clcache, 'codeCache',
+                        clcache._CodeCache([str(tmpdir / 'clcache')]))
+    monkeypatch.setattr(irafpar, '_specialUseParFileDict', {})
+    monkeypatch.setattr(irafpar, '_specialParIndex', {})
+    monkeypatch.setattr(irafpar, '_specialParChecked', {})
+    pardir = tmpdir.mkdir('pars')
+    (pardir / 'mine.par').write('# TASKMETA: task=display package=tv\n'
+                                'frame,i,a,2,,,"Frame"\n')
+    (pardir / 'plain.par').write('frame,i,a,1,,,"Frame"\n'
+                                 '# TASKMETA: task=imstat package=images\n')
+    reads = []
+    readTaskMeta = irafpar._readTaskMeta
+    monkeypatch.setattr(irafpar, '_readTaskMeta',
+                        lambda fname: reads.append(fname) or
+                        readTaskMeta(fname))
+    irafpar._updateSpecialParFileDict(str(pardir))
+    assert irafpar._specialUseParFileDict == {
+        ('display', 'tv'): [str(pardir / 'mine.par')]}
+    assert len(reads) == 2
+    # unchanged files are not read again, also in a new session
+    irafpar._specialParIndex.clear()
+    irafpar._updateSpecialParFileDict(str(pardir))
+    assert len(reads) == 2
+    (pardir / 'other.par').write('# TASKMETA: task=imstat package=images\n')
+    irafpar._updateSpecialParFileDict(str(pardir))
+    assert reads[2:] == [str(pardir / 'other.par')]
+    assert irafpar._specialUseParFileDict[('imstat', 'images')] == \
+        [str(pardir / 'other.par')]
+    clcache.codeCache.close()
+
+
+def test_statcache(tmpdir):
+    fname = str(tmpdir / 'data.txt')
+    with open(fname, 'w') as fh:
+        fh.write('short')
+    cache = StatCache(interval=3600)
+    attributes = cache.getAttributes(fname)
+    assert attributes[0] == 5
+    with open(fname, 'w') as fh:
+        fh.write('a longer text')
+    # attributes are reused within the interval
+    assert cache.getAttributes(fname) == attributes
+    assert (cache.stats, cache.avoided) == (1, 1)
+    assert cache.getAttributes(fname, refresh=1)[0] == 13
+    cache.invalidate(fname)
+    assert cache.getAttributes(fname)[0] == 13
+    assert (cache.stats, cache.avoided) == (3, 1)
+    cache.interval = 0
+    assert cache.getAttributes(fname)[0] == 13
+    assert cache.stats == 4
+    assert not cache.data
+    os.remove(fname)
+    with pytest.raises(OSError):
+        cache.getAttributes(fname)
+
+
+def test_statcache_size(tmpdir):
+    # the cache does not grow beyond maxsize entries
+    cache = StatCache(interval=3600, maxsize=3)
+    fnames = [str(tmpdir / f'data{i}.txt') for i in range(10)]
+    for fname in fnames:
+        with open(fname, 'w') as fh:
+            fh.write('data')
+        cache.getAttributes(fname)
+        assert len(cache.data) <= 3
+    # expired entries are dropped first
+    cache.invalidate()
+    for fname in fnames[:3]:
+        cache.getAttributes(fname)
+    key = os.path.abspath(fnames[0])
+    cache.data[key] = (time.monotonic() - 7200, cache.data[key][1])
+    cache.getAttributes(fnames[3])
+    assert sorted(cache.data) == [os.path.abspath(f) for f in fnames[1:4]]
+
+
+@pytest.mark.parametrize('prefix', ['', '@'])
+def test_list_parameter_streaming(tmpdir, prefix):
+    # list files are read as values are consumed, not kept in memory
+    listfile = tmpdir / 'big.lis'
+    nlines = 50000
+    with listfile.open('w') as fh:
+        for i in range(nlines):
+            fh.write(f'image{i:08d}.fits[sci,1]  some more text\n')
+    par = makeIrafPar(prefix + str(listfile), datatype='struct',
+                      name='list', list_flag=1)
+    assert par.get() == 'image00000000.fits[sci,1]  some more text'
+    tracemalloc.start()
+    try:
+        count = 0
+        for value in par.iterValues():
+            count += 1
+        size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == nlines - 1
+    assert value == f'image{nlines - 1:08d}.fits[sci,1]  some more text'
+    assert peak < 1024 * 1024
+    with pytest.raises(EOFError):
+        par.get()
+    # setting the value starts from the beginning again
+    par.set(str(listfile))
+    assert next(par.iterValues()) == \
+        'image00000000.fits[sci,1]  some more text'
+
+
+def test_readpar_fields_and_cache(tmpdir, monkeypatch):
+    # the fast field splitter agrees with the regular expression
+    lines = ['input,s,a,,,,"Input images"', 'mode,s,h,"ql",,,',
+             ' a , b ,,', '"x",', '"",,""', 'a,\t"b"', 'a,b,']
+    for line in lines:
+        flist = []
+        i1 = 0
+        while len(line) > i1:
+            mm = irafpar._re_field.match(line, i1)
+            flist.append(mm.group('comma') or mm.group('double'))
+            i1 = mm.end()
+        assert irafpar._splitFields(line) == flist
+    for line in ['a,"b" c', 'a,"b', "a,'b'", 'a,"b\\"c"']:
+        assert irafpar._splitFields(line) is None
+    # parsed parameter lists are cached until the file changes
+    cache = clcache._CodeCache([str(tmpdir / 'clcache')])
+    monkeypatch.setattr(clcache, 'codeCache', cache)
+    parfile = tmpdir / 'test.par'
+    parfile.write('input,s,a,"x",,,"Input"\nmode,s,h,"ql"\n')
+    pars = irafpar._readpar(str(parfile))
+    index, stamp = cache.getParIndex(str(parfile))
+    assert index in cache
+    pars[0].set('y')
+    cached = irafpar._readpar(str(parfile))
+    assert [p.name for p in cached] == ['input', 'mode']
+    assert cached[0].value == 'x'
+    # a changed file replaces the cache entry
+    parfile.write('input,s,a,"z",,,"Input"\nmode,s,h,"ql"\n')
+    os.utime(parfile, ns=(0, 0))
+    assert irafpar._readpar(str(parfile))[0].value == 'z'
+    assert cache.getParIndex(str(parfile)) == (index, (stamp[0], 0))
+    assert cache.getPars(index)[0] == (stamp[0], 0)
+    # a missing file is not cached
+    add = []
+    monkeypatch.setattr(cache, 'add', lambda *args: add.append(args))
+    with pytest.raises(OSError):
+        irafpar._readpar(str(tmpdir / 'missing.par'))
+    assert not add
+    cache.close()
+
+
+def test_package_load_defers_tasks(tmpdir):
+    from pyraf import iraf
+    pkgdir = tmpdir.mkdir('lazypkg')
+    (pkgdir / 'lazypkg.cl').write('package lazypkg\n'
+                                  'task lazytask = "lazypkg$lazytask.par"\n'
+                                  'task envget = "lazypkg$lazytask.par"\n'
+                                  'clbye()\n')
+    (pkgdir / 'lazytask.par').write('frame,i,h,1,,,"Frame"\nmode,s,h,"h"\n')
+    iraf.set(lazypkg=str(pkgdir) + '/')
+    iraf.task(lazypkgDOTpkg='lazypkg$lazypkg.cl')
+    iraf.lazypkg(_doprint=0, _hush=1)
+    # loading defines the tasks without looking for their files
+    task = iraf.module.lazytask
+    assert task is iraf.getTask('lazypkg.lazytask')
+    assert task._fullpath is None and task._currentParList is None
+    # other names in the iraf module are not replaced by tasks
+    assert not isinstance(iraf.module.envget, iraf.IrafTask)
+    assert task.frame == 1
+    assert task._currentParList is not None
@@ -1,3 +1,6 @@
+import io
+import os
+import pickle
 import sys
 import subprocess
 
@@ -158,3 +161,79 @@ def test_invoke_nosilent(_with_pyraf, test_input):
         assert "Welcome to IRAF." in result.stdout
     assert "clpackage" in result.stdout
     assert f"PyRAF {pyraf.__version__}" in result.stdout
+
+
+def test_startup_snapshot(tmpdir):
+    """Import uses the startup snapshot written by the previous import
+    """
+    snapshot = str(tmpdir / 'startup.pickle')
+    env = dict(os.environ, PYRAF_STARTUP_SNAPSHOT=snapshot,
+               PYRAF_CLCACHE_PATH=str(tmpdir / 'clcache'))
+    # the code object of clpackage is not saved in the snapshot
+    code = ('from pyraf import iraf; '
+            'print(iraf.clpackage._codeObject is None, '
+            'iraf.cl.getName(), len(iraf.loadedPath))')
+
+    def run():
+        proc = subprocess.run([sys.executable, '-c', code], env=env,
+                              cwd=str(tmpdir), capture_output=True,
+                              text=True)
+        assert not proc.returncode, proc.stderr
+        return proc.stdout.splitlines()[-1].split()
+
+    first = run()
+    assert first[0] == 'False'
+    assert os.path.exists(snapshot)
+    assert run() == ['True'] + first[1:]
+    # an OS variable read during startup has changed
+    with open(snapshot, 'rb') as fh:
+        key = pickle.load(fh)
+    var = sorted(key['env'])[0]
+    env[var] = 'changed'
+    assert run()[0] == 'False'
+
+
+def test_startup_snapshot_files(tmpdir, monkeypatch):
+    """Files read or probed during startup are checked by the snapshot
+    """
+    from .. import iraf, iraffunctions
+    monkeypatch.setattr(iraffunctions, '_startupFiles', {})
+    loginuser = str(tmpdir / 'loginuser.cl')
+    missing = str(tmpdir / 'missing.cl')
+    with open(loginuser, 'w') as fh:
+        fh.write('set startup_test = "yes"\n')
+    # as in the stock login.cl
+    for fname in (loginuser, missing):
+        iraf.clExecute(f'if (access ("{fname}")) cl < "{fname}"')
+    assert iraf.envget('startup_test') == 'yes'
+    files = iraffunctions._startupFiles
+    assert sorted(files) == sorted([loginuser, missing])
+    monkeypatch.setattr(iraffunctions, '_startupFiles', None)
+
+    snapshot = str(tmpdir / 'startup.pickle')
+    key = iraffunctions._snapshotKey(None)
+    iraffunctions._saveSnapshot(snapshot, key, {}, files)
+    with open(snapshot, 'rb') as fh:
+        stamps = pickle.load(fh)['files']
+    assert stamps[loginuser] is not None and stamps[missing] is None
+    # a file that did not exist is created
+    with open(missing, 'w') as fh:
+        fh.write('set startup_test = "no"\n')
+    assert not iraffunctions._loadSnapshot(snapshot, key)
+
+
+@pytest.mark.parametrize('cmd,blocks', [
+    ('print ("x", > "{tmpdir}/out.txt")', True),
+    ('!true', True),
+    ('flprcache', True),
+    ('prcache', False),
+])
+def test_startup_snapshot_effects(tmpdir, monkeypatch, cmd, blocks):
+    """Startup commands with effects that are not kept prevent a snapshot
+    """
+    from .. import iraf, iraffunctions
+    monkeypatch.setattr(iraffunctions, '_startupFiles', {})
+    # dev$null is not defined without IRAF
+    monkeypatch.setattr(iraffunctions, 'isNullFile', lambda s: False)
+    iraf.clExecute(cmd.format(tmpdir=tmpdir), Stdout=io.StringIO())
+    assert (None in iraffunctions._startupFiles) == blocks
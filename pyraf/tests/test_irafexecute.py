@@ -0,0 +1,299 @@
+import concurrent.futures
+import io
+import time
+
+import numpy
+import pytest
+
+from pyraf import irafexecute
+
+
+def _bytes2iraf(b):
+    # reference implementation of the conversion
+    return numpy.frombuffer(b, numpy.int8).astype(numpy.int16).tobytes()
+
+
+@pytest.mark.parametrize('b', [
+    b'',
+    b'x',
+    b'set ttynlines=24\n',
+    bytes(range(256)),
+    'Dépôt'.encode(),
+])
+def test_string_conversion(b):
+    iraf_string = irafexecute.Bytes2Iraf(b)
+    assert iraf_string == _bytes2iraf(b)
+    assert irafexecute.Iraf2Bytes(iraf_string) == b
+
+
+def test_bytes2iraf_into():
+    out = bytearray(b'*' * 20)
+    irafexecute.Bytes2IrafInto(b'ab\xff', out, 4)
+    assert out[:4] == b'****'
+    assert out[4:10] == _bytes2iraf(b'ab\xff')
+    assert out[10:] == b'*' * 10
+
+
+@pytest.mark.parametrize('nbytes', [0, 1, 4096, 4097, 10000])
+def test_frame_records(nbytes):
+    data = bytes(i % 251 for i in range(nbytes))
+    buf = irafexecute.frameRecords(data)
+    hsize = irafexecute.IPC_HEADERSIZE
+    pos = 0
+    got = b''
+    while pos < len(buf):
+        prefix, n = irafexecute._ipc_header.unpack_from(buf, pos)
+        assert prefix == irafexecute.IPC_PREFIX
+        assert 0 < n <= irafexecute.IPC_BLOCKSIZE
+        got = got + bytes(buf[pos + hsize:pos + hsize + n])
+        pos = pos + hsize + n
+    assert got == data
+
+
+def test_frame_string():
+    b = b'0123456789\n' * 500
+    assert (irafexecute.frameString(b) ==
+            irafexecute.frameRecords(irafexecute.Bytes2Iraf(b)))
+
+
+def test_process_cache_warm_missing():
+    cache = irafexecute._ProcessCache()
+    cache.warm('/nonexistent/x_nothing.e')
+    stats = cache.stats()
+    assert stats['spares'] == 0
+    assert stats['hits'] == stats['spare_hits'] == stats['misses'] == 0
+
+
+def test_process_cache_spares(tmpdir):
+    # stand-in for an IRAF executable: reads its input until EOF
+    exe = tmpdir / 'x_fake.e'
+    exe.write('#!/bin/sh\ncat > /dev/null\n')
+    exe.chmod(0o755)
+    executable = str(exe)
+    cache = irafexecute._ProcessCache()
+
+    def wait_spare():
+        # spares are started by a background thread
+        for i in range(500):
+            if cache.stats()['spares']:
+                break
+            time.sleep(0.01)
+        return cache.stats()['spares']
+
+    processes = []
+    try:
+        cache.warm(executable)
+        assert wait_spare() == 1
+        processes.append(cache.get(executable, {}))
+        assert processes[0].isAlive()
+        # the spare is replaced after it is used
+        assert wait_spare() == 1
+        processes.append(cache.get(executable, {}))
+        assert processes[1] is not processes[0]
+        cache.warm(executable, nspares=0)
+        assert cache.stats()['spares'] == 0
+        processes.append(cache.get(executable, {}))
+        stats = cache.stats()
+        assert stats['spare_hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['hits'] == 0
+        assert stats['executables'][executable]['launches'] >= 3
+    finally:
+        for process in processes:
+            process.terminate()
+        cache._flushSpares(warm={})
+
+
+def test_prcache_warm(monkeypatch):
+    # the number of spares may precede the executables
+    from pyraf import iraf
+    calls = []
+    monkeypatch.setattr(irafexecute.processCache, 'warm',
+                        lambda *args, nspares: calls.append((args, nspares)))
+    iraf.prcacheWarm('x_images.e', 'x_lists.e')
+    iraf.prcacheWarm('2', 'x_images.e')
+    iraf.prcacheWarm(0, 'x_images.e')
+    dft = irafexecute.processCache.DFT_SPARES
+    assert calls == [(('x_images.e', 'x_lists.e'), dft),
+                     (('x_images.e',), 2), (('x_images.e',), 0)]
+    with pytest.raises(TypeError):
+        iraf.prcacheWarm('x_images.e', spares=2)
+
+
+def test_process_cache_adaptive():
+    cache = irafexecute._ProcessCache(2)
+    cache.setAdaptive()
+    window = cache.ADAPT_WINDOW
+    for i in range(window):
+        cache._recordMiss(i % 2 == 0)
+    assert cache.stats()['limit'] == 3
+    assert cache.stats()['adaptive']
+    cache.setSize(0)
+    assert not cache.stats()['adaptive']
+
+
+def test_memory_available():
+    available = irafexecute._memoryAvailable()
+    assert available is None or 0 <= available <= 1
+
+
+def test_stream_pipe():
+    import threading
+    pipe = irafexecute.StreamPipe(maxchunks=2)
+    lines = [f'line {i}\n' for i in range(1000)]
+
+    def produce():
+        for line in lines:
+            pipe.write(line)
+        pipe._finish()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    assert pipe.readline() == lines[0]
+    assert pipe.read(3) == 'lin'
+    assert pipe.readline() == lines[1][3:]
+    assert list(pipe) == lines[2:]
+    assert pipe.read() == ''
+    thread.join()
+
+
+def test_stream_pipe_chunks():
+    # lines and reads spanning chunks give the same data as a file
+    text = ''.join(f'line {i}\n' for i in range(300)) + 'tail'
+    pipe = irafexecute.StreamPipe(maxchunks=len(text))
+    for i in range(0, len(text), 7):
+        pipe.write(text[i:i + 7])
+    pipe._finish()
+    expected = io.StringIO(text)
+    for size in (1, 20, 0, 100, -1):
+        assert pipe.readline(size) == expected.readline(size)
+        assert pipe.read(size + 10) == expected.read(size + 10)
+    assert list(pipe) == expected.readlines()
+    assert pipe.read() == ''
+
+
+def test_stream_pipe_close():
+    import threading
+    pipe = irafexecute.StreamPipe(maxchunks=2)
+    done = threading.Event()
+
+    def produce():
+        # keeps writing after the reader is gone
+        for i in range(100):
+            pipe.write('x\n')
+        pipe._finish()
+        done.set()
+
+    threading.Thread(target=produce).start()
+    assert pipe.readline() == 'x\n'
+    pipe.close()
+    assert done.wait(5)
+
+
+def test_pipe_request():
+    from pyraf import iraf
+    assert iraf.PIPE == 1
+    assert isinstance(iraf.PIPE, int)
+    assert iraf.getPipeMode() in ('stream', 'buffer')
+    with pytest.raises(ValueError):
+        iraf.setPipeMode('bogus')
+
+
+def _pizza_task(tmpdir, pars=''):
+    """IRAF executable task (which cannot run) with a .par file"""
+    from pyraf import iraftask
+    (tmpdir / 'x_pizza.e').write('')
+    (tmpdir / 'pizza.par').write('diameter,i,a,12,,,"pizza size"\n'
+                                 'caller,s,h,"Ima Hungry",,,"caller"\n' +
+                                 pars + 'mode,s,h,"h",,,\n')
+    return iraftask.IrafTask('', 'pizza', '', str(tmpdir / 'x_pizza.e'),
+                             'clpackage', '')
+
+
+def test_submit_snapshot(tmpdir, monkeypatch):
+    # every submitted run gets a private copy of the parameters
+    from pyraf import iraf
+    monkeypatch.chdir(tmpdir)
+    task = _pizza_task(tmpdir)
+    executor = irafexecute.TaskExecutor()
+    executable, run1, envdict, cwd = executor._snapshot(task, (14,), {})
+    run2 = executor._snapshot(task, (), {'caller': 'Bob'})[1]
+    assert executable == str(tmpdir / 'x_pizza.e')
+    assert cwd == str(tmpdir)
+    assert envdict == iraf.getVarDict()
+    assert envdict is not iraf.getVarDict()
+    run2.setParam('diameter', 16)
+    assert run1.getParam('diameter') == 14
+    assert run1.getParam('caller') == 'Ima Hungry'
+    assert run2.getParam('diameter') == 16
+    assert run2.getParam('caller') == 'Bob'
+    assert task.getParam('diameter', prompt=0) == 12
+    assert task.getParam('caller', prompt=0) == 'Ima Hungry'
+
+
+def test_submit_reuse_env():
+    # a reused worker process gets the environment changes since its
+    # last run, including removed variables
+    class FakeProcess:
+        def __init__(self):
+            self.env = []
+
+        def appendEnv(self, msg):
+            self.env.append(msg)
+
+    process = FakeProcess()
+    executor = irafexecute.TaskExecutor()
+    executor._idle['x_pizza.e'] = [(process, {'a': '1', 'b': '2'}, '/old')]
+    assert executor._getProcess('x_pizza.e', {'a': '1', 'c': '3'},
+                                '/new') is process
+    assert process.env == ['set c=3\n', 'set b=\n', 'chdir /new\n']
+
+
+def test_stream_psets(tmpdir, monkeypatch):
+    # tasks with psets are not streamed
+    from pyraf import iraf
+    monkeypatch.setattr(iraf, 'getPipeMode', lambda: 'stream')
+    task = _pizza_task(tmpdir)
+    task.initTask()
+    assert task._canStream({})
+    (tmpdir / 'topping.par').write('cheese,b,h,yes,,,"cheese"\n'
+                                   'mode,s,h,"h",,,\n')
+    iraf.task(topping=str(tmpdir / 'topping.par'))
+    task = _pizza_task(tmpdir, 'topping,pset,h,"",,,"toppings"\n')
+    task.initTask()
+    assert not task._canStream({})
+
+
+def test_stream_producer_error(tmpdir):
+    # a stage that cannot start raises the error of the previous stage
+    pipe = irafexecute.StreamPipe()
+    pipe._future = concurrent.futures.Future()
+    pipe._future.set_exception(irafexecute.IrafError("producer failed"))
+    task = _pizza_task(tmpdir)
+    with pytest.raises(irafexecute.IrafError, match="producer failed"):
+        irafexecute.taskExecutor.stream(task, nosuchpar=1, Stdin=pipe)
+
+
+@pytest.mark.parametrize('msg', ['imdelete junk.fits\n', '!rm junk.fits\n'])
+def test_submit_cl_command(msg):
+    # worker processes refuse CL commands that change the session
+    process = object.__new__(irafexecute._WorkerProcess)
+    process.msg = msg
+    with pytest.raises(irafexecute.IrafProcessError,
+                       match="not supported for submitted tasks"):
+        process.executeClCommand()
+
+
+def test_submit_cl_request():
+    # current package and terminal size requests are answered
+    from pyraf import iraf
+    process = object.__new__(irafexecute._WorkerProcess)
+    sent = []
+    process.writeString = sent.append
+    process.stdoutIsatty = 0
+    for msg in ('_curpack\n', 'stty\n'):
+        process.msg = msg
+        process.executeClCommand()
+    assert sent == [iraf.curpack() + '\n',
+                    'set ttynlines=100000\nset ttyncols=80\n']
+    assert process.msg == ''
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from pyraf import sqliteshelve
+
+
+@pytest.fixture
+def shelf(tmpdir):
+    db = sqliteshelve.open(os.path.join(tmpdir.strpath, 'test'), 'w')
+    yield db
+    db.close()
+
+
+def test_journal_mode(shelf):
+    mode, = shelf.db.execute('pragma journal_mode').fetchone()
+    assert mode == 'wal'
+
+
+def test_journal_mode_rollback(tmpdir):
+    # the rollback journal, e.g. for a network filesystem
+    fname = os.path.join(tmpdir.strpath, 'test')
+    db = sqliteshelve.open(fname, 'w')
+    db['a'] = 1
+    db.close()
+    db = sqliteshelve.open(fname, 'w', wal=False)
+    try:
+        mode, = db.db.execute('pragma journal_mode').fetchone()
+        assert mode == 'delete'
+        assert db['a'] == 1
+        db['b'] = 2
+    finally:
+        db.close()
+    assert not os.path.exists(fname + '.sqlite3-wal')
+
+
+def test_batch(shelf, tmpdir):
+    with shelf.batch():
+        for i in range(10):
+            shelf[f'k{i}'] = [i]
+    reader = sqliteshelve.open(os.path.join(tmpdir.strpath, 'test'), 'r')
+    try:
+        assert len(reader) == 10
+        assert reader['k3'] == [3]
+    finally:
+        reader.close()
+
+
+def test_batch_rollback(shelf):
+    shelf['a'] = 1
+    with pytest.raises(RuntimeError):
+        with shelf.batch():
+            shelf['a'] = 2
+            shelf['b'] = 3
+            raise RuntimeError
+    assert shelf['a'] == 1
+    assert 'b' not in shelf
+
+
+def test_get_many(shelf):
+    shelf.update({f'k{i}': i for i in range(1200)})
+    keys = [f'k{i}' for i in range(0, 1200, 2)] + ['missing']
+    result = shelf.get_many(keys)
+    assert len(result) == 600
+    assert result['k600'] == 600
+    assert 'missing' not in result
+
+
+def test_memory_cache(shelf, tmpdir):
+    shelf['a'] = {'x': 1}
+    reader = sqliteshelve.open(os.path.join(tmpdir.strpath, 'test'), 'r')
+    try:
+        value = reader['a']
+        assert reader['a'] is value
+        assert reader.get_many(['a'])['a'] is value
+    finally:
+        reader.close()
+    del shelf['a']
+    assert 'a' not in shelf
+    with pytest.raises(KeyError):
+        shelf['a']
+
+
+def test_counters(shelf):
+    shelf.addCounters({'hits': 2, 'misses': 1})
+    shelf.addCounters({'hits': 3})
+    assert shelf.counters() == {'hits': 5, 'misses': 1}
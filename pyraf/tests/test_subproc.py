@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from pyraf import subproc
+
+
+@pytest.fixture
+def pipe():
+    rfd, wfd = os.pipe()
+    yield rfd, wfd
+    for fd in (rfd, wfd):
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def test_readbuf_read(pipe):
+    rfd, wfd = pipe
+    # small chunk size to exercise compaction and growth of the buffer
+    buf = subproc.ReadBuf(rfd, maxChunkSize=16)
+    data = bytes(range(256)) * 4
+    os.write(wfd, data)
+    os.close(wfd)
+    assert buf.read(10) == data[:10]
+    assert buf.read(500) == data[10:510]
+    assert buf.read(0) == b''
+    assert buf.read(1000) == data[510:]
+    assert buf.eof
+    assert buf.read(10) == b''
+    # the buffer grown for the large reads is given back
+    assert len(buf.buf) == 32
+
+
+def test_readbuf_readline(pipe):
+    rfd, wfd = pipe
+    buf = subproc.ReadBuf(rfd, maxChunkSize=8)
+    os.write(wfd, b'first line\nsecond\nthird line is long\npartial')
+    assert buf.readline() == b'first line\n'
+    assert buf.readPendingLine() == b'second\n'
+    assert buf.readline() == b'third line is long\n'
+    assert buf.readPendingLine() == b'partial'
+    assert buf.readPendingLine() == b''
+    os.write(wfd, b'rest\n')
+    os.close(wfd)
+    assert buf.readline() == b'rest\n'
+    assert buf.readline() == b''
+
+
+def test_readbuf_pending(pipe):
+    rfd, wfd = pipe
+    buf = subproc.ReadBuf(rfd)
+    assert buf.readPendingChars() == b''
+    os.write(wfd, b'abcdef')
+    assert buf.readPendingChars(4) == b'abcd'
+    assert len(buf) == 2
+    assert buf.readPendingChars() == b'ef'
+    os.close(wfd)
+    assert buf.readPendingChars() == b''
+    assert buf.eof
+
+
+def test_subprocess_roundtrip():
+    process = subproc.Subprocess('cat')
+    try:
+        data = b'0123456789' * 5000
+        process.write(data[:20000])
+        assert process.read(20000) == data[:20000]
+        process.write(data[20000:])
+        assert process.read(len(data) - 20000) == data[20000:]
+    finally:
+        process.die()
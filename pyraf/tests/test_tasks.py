@@ -1,7 +1,7 @@
 import pytest
 
 from .utils import HAS_IRAF
-from ..tools.irafglobals import INDEF
+from ..tools.irafglobals import INDEF, no
 
 if HAS_IRAF:
     from pyraf import iraf
@@ -49,3 +49,13 @@ def test_exec_pset(task, pars):
     pdict = t.getParDict()
     for name, value in pars.items():
         assert pdict[name].value == value
+
+
+def test_submit_concurrent():
+    futures = [iraf.submit('imheader', 'dev$pix', longheader=no)
+               for i in range(6)]
+    results = [f.result(timeout=60) for f in futures]
+    for r in results:
+        assert r.stdout.startswith('dev$pix[512,512][short]')
+        assert r.stderr == ''
+        assert r.parList.getValue('images') == 'dev$pix'
@@ -21,6 +21,9 @@
 
 
 class ComparableMixin:
+    # no instance dictionary, so that subclasses can use __slots__
+    __slots__ = ()
+
     def _compare(self, other, method):
         try:
             return method(self._cmpkey(), other._cmpkey())
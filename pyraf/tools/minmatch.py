@@ -18,11 +18,18 @@ The getall(key) method returns a list of all the matching values,
 containing a single entry for unambiguous matches and multiple entries
 for ambiguous matches.
 
+Abbreviations are looked up in a sorted list of the keys (_KeyIndex)
+that is created when the first abbreviation is used.  Dictionaries with
+identical keys share the same index.
+
 $Id$
 
 R. White, 2000 January 28
 """
 import copy
+import weakref
+from array import array
+from bisect import bisect_left
 from collections import UserDict
 
 
@@ -30,6 +37,103 @@ class AmbiguousKeyError(KeyError):
     pass
 
 
+class _KeyIndex:
+    """Sorted list of the keys of a MinMatchDict
+
+    The keys matching an abbreviation are found by bisection.  The serial
+    number of each key (its position in the order the keys were added) is
+    kept in a parallel array, so that matches are returned in that order.
+    The results of match() are remembered until the keys change (at most
+    maxMatches of them; all are forgotten when there are more).  Indexes
+    created by shared() may be used by several dictionaries and must be
+    copied before they are changed.
+    """
+
+    _shared = weakref.WeakValueDictionary()
+    maxMatches = 256
+
+    def __init__(self, keys, minkeylength, frozen=False):
+        keys = list(keys)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.serials = array('q', order)
+        self.nextSerial = len(keys)
+        self.minkeylength = minkeylength
+        self.frozen = frozen
+        self.matches = {}
+
+    @classmethod
+    def shared(cls, keys, minkeylength):
+        """Return a (frozen) index shared by all identical key sets"""
+        tkeys = (minkeylength,) + tuple(keys)
+        index = cls._shared.get(tkeys)
+        if index is None:
+            index = cls(tkeys[1:], minkeylength, frozen=True)
+            cls._shared[tkeys] = index
+        return index
+
+    def copy(self):
+        """Return a copy that can be changed"""
+        new = object.__new__(self.__class__)
+        new.keys = self.keys[:]
+        new.serials = array('q', self.serials)
+        new.nextSerial = self.nextSerial
+        new.minkeylength = self.minkeylength
+        new.frozen = False
+        new.matches = {}
+        return new
+
+    def add(self, key):
+        i = bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.serials.insert(i, self.nextSerial)
+        self.nextSerial += 1
+        self.matches.clear()
+
+    def remove(self, key):
+        i = bisect_left(self.keys, key)
+        del self.keys[i]
+        del self.serials[i]
+        self.matches.clear()
+
+    def match(self, key):
+        """Return list of the keys for which key is an abbreviation
+
+        Returns None if there are none.  Abbreviations must be at least
+        minkeylength characters long (or match a full key exactly).
+        """
+        if not isinstance(key, str):
+            return None
+        try:
+            return self.matches[key]
+        except KeyError:
+            pass
+        keys = self.keys
+        lo = bisect_left(keys, key)
+        if len(key) < self.minkeylength:
+            if lo < len(keys) and keys[lo] == key:
+                result = [key]
+            else:
+                result = None
+        else:
+            hi = lo
+            nkeys = len(keys)
+            while hi < nkeys and keys[hi].startswith(key):
+                hi += 1
+            if hi - lo == 1:
+                result = [keys[lo]]
+            elif hi == lo:
+                result = None
+            else:
+                serials = self.serials
+                result = [keys[i] for i in sorted(range(lo, hi),
+                                                  key=serials.__getitem__)]
+        if len(self.matches) >= self.maxMatches:
+            self.matches.clear()
+        self.matches[key] = result
+        return result
+
+
 class MinMatchDict(UserDict):
 
     def __init__(self,indict=None,minkeylength=1):
@@ -53,20 +157,26 @@ class MinMatchDict(UserDict):
         """Return __init__ args for pickle"""
         return (self.data, self.minkeylength)
 
+    def __getstate__(self):
+        """Return state for pickle (without the key index)"""
+        state = self.__dict__.copy()
+        state['mmkeys'] = None
+        return state
+
+    def __setstate__(self, state):
+        """Restore state from pickle (rebuild the key index when needed)"""
+        self.__dict__.update(state)
+        self.mmkeys = None
+
     def _mmInit(self):
-        """Create the minimum match dictionary of keys"""
-        # cache references to speed up loop a bit
-        mmkeys = {}
-        mmkeysGet = mmkeys.setdefault
-        minkeylength = self.minkeylength
-        for key in self.data.keys():
-            # add abbreviations as short as minkeylength
-            # always add at least one entry (even for key="")
-            lenkey = len(key)
-            start = min(minkeylength,lenkey)
-            for i in range(start,lenkey+1):
-                mmkeysGet(key[0:i],[]).append(key)
-        self.mmkeys = mmkeys
+        """Create the minimum match index of keys"""
+        self.mmkeys = _KeyIndex.shared(self.data.keys(), self.minkeylength)
+
+    def _mmWritable(self):
+        """Return the key index, copied first if it is shared"""
+        if self.mmkeys.frozen:
+            self.mmkeys = self.mmkeys.copy()
+        return self.mmkeys
 
     def getfullkey(self, key, new=0):
         # check for exact match first
@@ -76,7 +186,7 @@ class MinMatchDict(UserDict):
             raise KeyError("MinMatchDict keys must be strings")
         # no exact match, so look for unique minimum match
         if self.mmkeys is None: self._mmInit()
-        keylist = self.mmkeys.get(key)
+        keylist = self.mmkeys.match(key)
         if keylist is None:
             # no such key -- ok only if new flag is set
             if new: return key
@@ -95,16 +205,8 @@ class MinMatchDict(UserDict):
     def add(self, key, item):
         """Add a new key/item pair to the dictionary.  Resets an existing
         key value only if this is an exact match to a known key."""
-        mmkeys = self.mmkeys
-        if mmkeys is not None and not (key in self.data):
-            # add abbreviations as short as minkeylength
-            # always add at least one entry (even for key="")
-            lenkey = len(key)
-            start = min(self.minkeylength,lenkey)
-            # cache references to speed up loop a bit
-            mmkeysGet = mmkeys.setdefault
-            for i in range(start,lenkey+1):
-                mmkeysGet(key[0:i],[]).append(key)
+        if self.mmkeys is not None and not (key in self.data):
+            self._mmWritable().add(key)
         self.data[key] = item
 
     def __setitem__(self, key, item):
@@ -136,14 +238,7 @@ class MinMatchDict(UserDict):
         key = self.getfullkey(key)
         del self.data[key]
         if self.mmkeys is not None:
-            start = min(self.minkeylength,len(key))
-            for i in range(start,len(key)+1):
-                s = key[0:i]
-                value = self.mmkeys.get(s)
-                value.remove(key)
-                if not value:
-                    # delete entry from mmkeys if that was last value
-                    del self.mmkeys[s]
+            self._mmWritable().remove(key)
 
     def clear(self):
         self.mmkeys = None
@@ -186,7 +281,7 @@ class MinMatchDict(UserDict):
         containing a single entry for unambiguous matches and
         multiple entries for ambiguous matches."""
         if self.mmkeys is None: self._mmInit()
-        k = self.mmkeys.get(key)
+        k = self.mmkeys.match(key)
         if not k: return failobj
         return list(map(self.data.get, k))
 
@@ -196,7 +291,9 @@ class MinMatchDict(UserDict):
         contain a single entry for unambiguous matches and
         multiple entries for ambiguous matches."""
         if self.mmkeys is None: self._mmInit()
-        return self.mmkeys.get(key, failobj)
+        k = self.mmkeys.match(key)
+        if k is None: return failobj
+        return k[:]
 
 
 class QuietMinMatchDict(MinMatchDict):
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from ..minmatch import MinMatchDict, AmbiguousKeyError
@@ -100,3 +102,37 @@ def test_update_dict(mmd):
     new_dict = dict(ab=0)
     mmd.update(new_dict)
     assert 'test' in mmd and 'ab' in mmd
+
+
+def test_getallkeys_order_and_minkeylength():
+    d = MinMatchDict(minkeylength=2)
+    for key in ('text', 'te', 'test', 'ab', 't'):
+        d.add(key, len(key))
+    # matches are returned in the order the keys were added
+    assert d.getallkeys('te') == ['text', 'te', 'test']
+    assert d.getall('tes') == [4]
+    assert d.getallkeys('t') == ['t']
+    assert d.getallkeys('x', []) == []
+    del d['text']
+    d.add('texts', 5)
+    assert d.getallkeys('te') == ['te', 'test', 'texts']
+    assert d['tex'] == 5
+
+
+def test_shared_key_index():
+    d1 = MinMatchDict(dict(zip(BASEKEYS, BASEVALUES)))
+    d2 = MinMatchDict(dict(zip(BASEKEYS, BASEVALUES)))
+    assert d1['tes'] == d2['tes'] == 1
+    assert d1.mmkeys is d2.mmkeys
+    # a shared index is copied before it is changed
+    d1.add('tea', 3)
+    assert d1.mmkeys is not d2.mmkeys
+    assert d1.getallkeys('te') == ['test', 'text', 'ten', 'tea']
+    assert d2.getallkeys('te') == ['test', 'text', 'ten']
+
+
+def test_pickle_without_index(mmd):
+    mmd.getall('t')
+    copy = pickle.loads(pickle.dumps(mmd))
+    assert copy.mmkeys is None
+    assert copy['tex'] == 2
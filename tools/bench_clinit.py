@@ -0,0 +1,65 @@
+#! /usr/bin/env python3
+"""bench_clinit.py: Measure the setup cost of the CL compiler
+
+The first translation of a CL statement in a session used to build the
+Earley parser (reflection over the grammar docstrings, collectRules,
+augment, and makeFIRST/makeTokenRules on the first parse) and to compile
+the regular expressions of all seven scanner states.  Now the
+deterministic parser needs no setup (its tables are module constants;
+the Earley parser is only created if it is needed for a syntax error)
+and the scanner of a state is compiled when the state is first used.
+
+Both ways are measured in NREP (default 5) new processes: the import of
+pyraf.cl2py, the setup before the first translation (as before: the
+Earley parser and all the scanners; now: nothing) and the first
+translation of a typical statement, without the code cache.  Reported
+are the best times.  No IRAF installation is needed (set PYRAF_NO_IRAF=1
+to avoid the warning).
+
+Usage: bench_clinit.py [nrep]
+"""
+
+
+import os
+import subprocess
+import sys
+
+CODE = """\
+import sys, time
+sys.argv[0] = '-m'
+t0 = time.perf_counter()
+from pyraf import cl2py, clparse, clscan
+from pyraf.clast import AST
+t1 = time.perf_counter()
+if {old}:
+    cl2py._parser = clparse.CLParser(AST)
+    scanners = clscan._getScannerDict()
+    for mode in scanners.classes:
+        scanners[mode]
+t2 = time.perf_counter()
+cl2py.cl2py(string={line!r}, usecache=0)
+t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+LINE = 'imstatistics (images, fields="mean,stddev", lower=INDEF, >> "log")\n'
+
+
+def run(old):
+    """Return (import, setup, first translation) seconds in a new process"""
+    env = dict(os.environ, PYRAF_NO_IRAF='1')
+    proc = subprocess.run(
+        [sys.executable, '-c', CODE.format(old=old, line=LINE)],
+        env=env, capture_output=True, text=True, check=True)
+    return [float(t) for t in proc.stdout.split()[-3:]]
+
+
+if __name__ == '__main__':
+    nrep = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'':<8s} {'import s':>9s} {'setup ms':>9s} {'first ms':>9s} "
+          f"{'total ms':>9s}")
+    for label, old in (('before', True), ('after', False)):
+        times = [run(old) for i in range(nrep)]
+        timport, tsetup, tfirst = (min(t) for t in zip(*times))
+        print(f"{label:<8s} {timport:9.3f} {tsetup * 1000:9.1f} "
+              f"{tfirst * 1000:9.1f} {(tsetup + tfirst) * 1000:9.1f}")
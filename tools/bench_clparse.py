@@ -0,0 +1,132 @@
+#! /usr/bin/env python3
+"""bench_clparse.py: Compare and time the Earley and descent CL parsers
+
+Every .cl file in the given files and directories (searched recursively;
+default: the IRAF tree, iraf$, which is the small noiraf tree of PyRAF
+without an IRAF installation) and a generated procedure with NSTMT
+statements (default 2000)
+is tokenized and parsed with the Earley parser (clparse.CLParser, or
+EclParser with -e) and with clparse.CLDescentParser.  The trees must be
+identical (node types, shapes and tokens).  Reported are the number of
+files and tokens, mismatches, files the descent parser left to the
+Earley parser (fallbacks) and files that do not parse at all (errors),
+and the best of NREP (default 3) parse times.
+
+Usage: bench_clparse.py [-e] [-n nrep] [-s nstmt] [file or directory ...]
+"""
+
+
+import getopt
+import os
+import sys
+import time
+
+from pyraf import clparse, clscan, iraf
+from pyraf.clast import AST
+from pyraf.cltoken import Token
+
+STATEMENTS = """\
+    i = i + 1 ; s1 = "x" // str (i)
+    if (i > 5 && !access (s1)) {
+        print (s1, i, >> "log")
+    } else if (i == 3)
+        imstat (s1, fields="mean", lower=INDEF, format+) | match ("x")
+    else
+        x[i] = x[i - 1] * 2.5 ** 2
+    for (j = 1; j <= 10; j += 1) { next }
+    while (fscan (list, s1, i) != EOF) delete (s1, verify-)
+"""
+
+
+def same_tree(a, b):
+    """Compare trees: node types and shapes and token identity"""
+    # statement lists are deep, so no recursion
+    pairs = [(a, b)]
+    while pairs:
+        a, b = pairs.pop()
+        if isinstance(a, Token) or isinstance(b, Token):
+            if a is not b:
+                return False
+        elif a.type != b.type or len(a) != len(b):
+            return False
+        else:
+            pairs.extend(zip(a, b))
+    return True
+
+
+def sources(paths, nstmt):
+    """Return list of (name, CL source)"""
+    rv = []
+    for path in paths:
+        if os.path.isdir(path):
+            fnames = sorted(
+                os.path.join(dirpath, fname)
+                for dirpath, dirnames, filenames in os.walk(path)
+                for fname in filenames if fname.endswith('.cl'))
+        else:
+            fnames = [path]
+        for fname in fnames:
+            with open(fname, errors='ignore') as fh:
+                rv.append((fname, fh.read()))
+    nblock = STATEMENTS.count('\n')
+    rv.append(('generated', 'procedure gen(list)\nstruct *list\nbegin\n'
+               '    int i, j, x[10]\n    string s1\n' +
+               STATEMENTS * max(nstmt // nblock, 1) + 'end\n'))
+    return rv
+
+
+def besttime(parse, tokens, nrep):
+    """Return (tree, best seconds) of nrep parses"""
+    times = []
+    for i in range(nrep):
+        t0 = time.perf_counter()
+        tree = parse(list(tokens))
+        times.append(time.perf_counter() - t0)
+    return tree, min(times)
+
+
+def run(paths, ecl=False, nrep=3, nstmt=2000):
+    """Parse all sources with both parsers
+
+    Returns a dictionary with the counts and the total times.
+    """
+    fallback = clparse.EclParser if ecl else clparse.CLParser
+    earley = fallback(AST)
+    counts = dict.fromkeys(['files', 'tokens', 'mismatch', 'fallback',
+                            'error'], 0)
+    counts['earley'] = counts['descent'] = 0.0
+    for name, source in sources(paths, nstmt):
+        try:
+            tokens = clscan.CLScanner().tokenize(source)
+            tree1, t1 = besttime(earley.parse, tokens, nrep)
+        except SyntaxError:
+            counts['error'] += 1
+            continue
+        descent = clparse.CLDescentParser(fallback)
+        tree2, t2 = besttime(descent.parse, tokens, nrep)
+        counts['files'] += 1
+        counts['tokens'] += len(tokens)
+        counts['earley'] += t1
+        counts['descent'] += t2
+        if descent._earleyParser is not None:
+            counts['fallback'] += 1
+        if not same_tree(tree1, tree2):
+            counts['mismatch'] += 1
+            print('Trees differ:', name)
+    return counts
+
+
+if __name__ == '__main__':
+    opts, args = getopt.getopt(sys.argv[1:], 'en:s:')
+    opts = dict(opts)
+    args = args or [iraf.osfn('iraf$')]
+    counts = run(args, '-e' in opts, int(opts.get('-n', 3)),
+                 int(opts.get('-s', 2000)))
+    print(f"{counts['files']} files, {counts['tokens']} tokens, "
+          f"{counts['mismatch']} mismatches, {counts['fallback']} "
+          f"fallbacks, {counts['error']} errors")
+    print(f"{'':<8s} {'total s':>9s} {'tokens/s':>10s}")
+    for label in ('earley', 'descent'):
+        t = counts[label]
+        print(f"{label:<8s} {t:9.3f} {counts['tokens'] / t:10.0f}")
+    print(f"speedup  {counts['earley'] / counts['descent']:8.1f}x")
@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+"""bench_clscan.py: Compare and time the CL tokenizer dispatch
+
+Every .cl file in the given files and directories (searched recursively;
+default: the IRAF tree, iraf$, which is the small noiraf tree of PyRAF
+without an IRAF installation) and a generated procedure with NSTMT
+statements (default 2000; see bench_clparse.py) is tokenized with
+clscan.CLScanner as it is now (dispatch on m.lastgroup, tokens with
+__slots__) and as it was (a linear scan of m.groups() for the matching
+pattern, tokens with an instance dictionary).  The token streams (type,
+attr and line number) must be identical.  The rest of the scanner
+(actions, addToken) is the same in both.  Reported are the number of
+files and tokens, mismatches, the best of NREP (default 5) tokenizing
+times and the size of a token.
+
+Usage: bench_clscan.py [-n nrep] [-s nstmt] [file or directory ...]
+"""
+
+
+import getopt
+import sys
+import time
+
+from bench_clparse import sources
+from pyraf import cgeneric, clscan, iraf
+from pyraf.cltoken import Token
+
+
+class DictToken(Token):
+    """Token with an instance dictionary, as before"""
+
+
+def old_tokenize(self, s, start=None):
+    """ContextSensitiveScanner.tokenize with the scan of m.groups()"""
+    if start is None:
+        start = self.start
+    self.current = [start]
+    iend = 0
+    slen = len(s)
+    while iend < slen:
+        if not self.current:
+            self.current = [start]
+        scanner = self.scanners[self.current[-1]]
+        m = scanner.re.match(s, iend)
+        groups = m.groups()
+        for i, func in old_index(scanner):
+            if groups[i] is not None:
+                func(groups[i], m, self)
+                break
+        iend = m.end()
+
+
+_old_index = {}
+
+
+def old_index(scanner):
+    """Return the list of (group index, action) of a scanner"""
+    try:
+        return _old_index[id(scanner)]
+    except KeyError:
+        rv = _old_index[id(scanner)] = [
+            (scanner.re.groupindex[name] - 1, func)
+            for name, func in scanner.group2func.items()]
+        rv.sort(key=lambda item: item[0])
+        return rv
+
+
+def besttime(source, nrep):
+    """Return (tokens, best seconds) of nrep tokenizations"""
+    times = []
+    for i in range(nrep):
+        t0 = time.perf_counter()
+        tokens = clscan.CLScanner().tokenize(source)
+        times.append(time.perf_counter() - t0)
+    return tokens, min(times)
+
+
+def tokenize_old(source, nrep):
+    """besttime() with the old dispatch and tokens"""
+    new_tokenize = cgeneric.ContextSensitiveScanner.tokenize
+    cgeneric.ContextSensitiveScanner.tokenize = old_tokenize
+    clscan.Token = DictToken
+    try:
+        return besttime(source, nrep)
+    finally:
+        cgeneric.ContextSensitiveScanner.tokenize = new_tokenize
+        clscan.Token = Token
+
+
+def tokensize(token):
+    """Return bytes used by a token (not counting the attributes)"""
+    size = sys.getsizeof(token)
+    if hasattr(token, '__dict__'):
+        size += sys.getsizeof(token.__dict__)
+    return size
+
+
+def run(paths, nrep=5, nstmt=2000):
+    """Tokenize all sources both ways
+
+    Returns a dictionary with the counts and the total times.
+    """
+    counts = dict.fromkeys(['files', 'tokens', 'mismatch', 'error'], 0)
+    counts['before'] = counts['after'] = 0.0
+    for name, source in sources(paths, nstmt):
+        try:
+            tokens1, t1 = tokenize_old(source, nrep)
+            tokens2, t2 = besttime(source, nrep)
+        except SyntaxError:
+            counts['error'] += 1
+            continue
+        counts['files'] += 1
+        counts['tokens'] += len(tokens2)
+        counts['before'] += t1
+        counts['after'] += t2
+        if ([(t.type, t.attr, t.lineno) for t in tokens1] !=
+                [(t.type, t.attr, t.lineno) for t in tokens2]):
+            counts['mismatch'] += 1
+            print('Tokens differ:', name)
+    return counts
+
+
+if __name__ == '__main__':
+    opts, args = getopt.getopt(sys.argv[1:], 'n:s:')
+    opts = dict(opts)
+    args = args or [iraf.osfn('iraf$')]
+    counts = run(args, int(opts.get('-n', 5)), int(opts.get('-s', 2000)))
+    print(f"{counts['files']} files, {counts['tokens']} tokens, "
+          f"{counts['mismatch']} mismatches, {counts['error']} errors")
+    print(f"{'':<8s} {'total s':>9s} {'tokens/s':>10s} {'bytes/token':>12s}")
+    for label, token in (('before', DictToken('IDENT', 'x', 1)),
+                         ('after', Token('IDENT', 'x', 1))):
+        t = counts[label]
+        print(f"{label:<8s} {t:9.3f} {counts['tokens'] / t:10.0f} "
+              f"{tokensize(token):12d}")
+    print(f"speedup  {counts['before'] / counts['after']:8.1f}x")
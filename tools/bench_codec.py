@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+"""bench_codec.py: Measure the IRAF 16-bit string conversions
+
+The conversions are timed over a message size distribution like the one
+seen in the IRAF process protocol: mostly short control messages
+(parameter requests, xmit/xfer headers), some single lines of task
+output and a few full 2048-character output blocks.  The numpy based
+conversion used before is timed for comparison.
+"""
+
+
+import random
+import sys
+import time
+
+import numpy
+
+from pyraf import irafexecute
+
+# (message size, relative frequency)
+SIZES = [(8, 30), (16, 30), (40, 20), (80, 15), (2048, 5)]
+
+
+def numpy_bytes2iraf(b):
+    return numpy.frombuffer(b, numpy.int8).astype(numpy.int16).tobytes()
+
+
+def numpy_iraf2bytes(s):
+    return numpy.frombuffer(s, numpy.int16).astype(numpy.int8).tobytes()
+
+
+def messages(n, seed=1):
+    rng = random.Random(seed)
+    sizes = rng.choices([s for s, w in SIZES],
+                        weights=[w for s, w in SIZES],
+                        k=n)
+    text = b'xmit(4,2048)\n=par_name\nset ttynlines=24\n' * 100
+    return [text[:size] for size in sizes]
+
+
+def timeit(func, msgs):
+    t0 = time.perf_counter()
+    for msg in msgs:
+        func(msg)
+    return (time.perf_counter() - t0) / len(msgs) * 1e6
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    msgs = messages(n)
+    imsgs = [irafexecute.Bytes2Iraf(m) for m in msgs]
+    print(f"{'conversion':<12s} {'numpy':>10s} {'current':>10s}")
+    for name, old, new, data in [
+        ('Bytes2Iraf', numpy_bytes2iraf, irafexecute.Bytes2Iraf, msgs),
+        ('Iraf2Bytes', numpy_iraf2bytes, irafexecute.Iraf2Bytes, imsgs),
+        ('frameString',
+         lambda m: irafexecute.frameRecords(numpy_bytes2iraf(m)),
+         irafexecute.frameString, msgs),
+    ]:
+        print(f"{name:<12s} {timeit(old, data):7.2f} us "
+              f"{timeit(new, data):7.2f} us")
@@ -0,0 +1,68 @@
+#! /usr/bin/env python3
+"""bench_ipc.py: Measure the throughput of the IRAF IPC record framing
+
+The records are sent through a `cat` subprocess and read back, which
+exercises the same write/read path as the communication with an IRAF
+executable.  Two streams are timed: STDOUT text (converted to and from
+the IRAF 16-bit character format) and STDGRAPH metacode (binary 16-bit
+words).
+"""
+
+
+import sys
+import time
+
+import numpy
+
+
+def loopback():
+    """Return an IrafProcess talking to `cat` instead of an IRAF task"""
+    from pyraf import irafexecute, subproc
+    process = irafexecute.IrafProcess.__new__(irafexecute.IrafProcess)
+    process.executable = 'cat'
+    process.process = subproc.Subprocess(
+        'cat', maxChunkSize=irafexecute.IPC_READSIZE)
+    return process
+
+
+def bench_stdout(process, mbytes, msgsize=2048, batch=4):
+    """Stream text messages of msgsize characters through process"""
+    from pyraf.irafexecute import Bytes2Iraf, Iraf2Bytes
+    line = (b'x' * 79 + b'\n') * (msgsize // 80 + 1)
+    msg = line[:msgsize]
+    nmsg = (mbytes * 1024 * 1024) // msgsize
+    t0 = time.perf_counter()
+    for i in range(0, nmsg, batch):
+        for j in range(batch):
+            process.write(Bytes2Iraf(msg))
+        for j in range(batch):
+            got = b''
+            while len(got) < msgsize:
+                got = got + Iraf2Bytes(process.read())
+    return nmsg * msgsize / (time.perf_counter() - t0) / 2**20
+
+
+def bench_stdgraph(process, mbytes, nwords=8192, batch=2):
+    """Stream GKI metacode blocks of nwords 16-bit words through process"""
+    data = numpy.arange(nwords, dtype=numpy.int16).tobytes()
+    nmsg = (mbytes * 1024 * 1024) // len(data)
+    t0 = time.perf_counter()
+    for i in range(0, nmsg, batch):
+        for j in range(batch):
+            process.write(data)
+        for j in range(batch):
+            nread = 0
+            while nread < len(data):
+                nread = nread + len(
+                    numpy.frombuffer(process.read(), dtype=numpy.int16)) * 2
+    return nmsg * len(data) / (time.perf_counter() - t0) / 2**20
+
+
+if __name__ == '__main__':
+    mbytes = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    process = loopback()
+    try:
+        print(f"STDOUT   {bench_stdout(process, mbytes):8.1f} MB/s")
+        print(f"STDGRAPH {bench_stdgraph(process, mbytes):8.1f} MB/s")
+    finally:
+        process.process.die()
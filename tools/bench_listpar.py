@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+"""bench_listpar.py: Measure memory and speed of reading list parameters
+
+A list file of MBYTES megabytes (default 1024) is written to a temporary
+directory and read through a list-structured parameter, once with get()
+calls as CL scripts do and once with the iterValues() generator.  The
+read rate and the peak resident set size of the process are reported;
+the peak should not depend on the size of the list.
+
+Usage: bench_listpar.py [mbytes]
+"""
+
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from pyraf.irafpar import makeIrafPar
+
+LINE = "image{:010d}.fits[sci,1]\n"
+
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_get(par):
+    n = 0
+    try:
+        while True:
+            par.get()
+            n += 1
+    except EOFError:
+        return n
+
+
+def read_iter(par):
+    n = 0
+    for value in par.iterValues():
+        n += 1
+    return n
+
+
+if __name__ == '__main__':
+    mbytes = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    nlines = mbytes * 2**20 // len(LINE.format(0))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, 'big.lis')
+        with open(fname, 'w') as fh:
+            block = 10000
+            for i in range(0, nlines, block):
+                fh.write(''.join(LINE.format(j)
+                                 for j in range(i, min(i + block, nlines))))
+        print(f"{nlines} lines ({mbytes} MB), "
+              f"peak RSS before reading {peak_rss():.1f} MB")
+        for name, func in (('get', read_get), ('iterValues', read_iter)):
+            par = makeIrafPar('@' + fname, datatype='string', name='list',
+                              list_flag=1)
+            t0 = time.perf_counter()
+            n = func(par)
+            dt = time.perf_counter() - t0
+            if n != nlines:
+                raise RuntimeError(f"read {n} lines, expected {nlines}")
+            print(f"{name:<11s} {mbytes / dt:8.1f} MB/s, "
+                  f"peak RSS {peak_rss():.1f} MB")
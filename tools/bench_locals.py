@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+"""bench_locals.py: Measure loop-heavy CL procedures with native locals
+
+Each CL procedure below is translated twice, with its local variables
+kept in the Vars parameter list and as native Python variables (see
+cl2py.NativeLocals).  Both translations are run, their output is
+compared and the run times are reported.  No IRAF installation is
+needed (set PYRAF_NO_IRAF=1 to avoid the warning).
+
+Usage: bench_locals.py [n]
+"""
+
+
+import contextlib
+import io
+import sys
+import time
+
+from pyraf import cl2py, iraf, pyrafglobals
+
+SCRIPTS = {
+    'count': """procedure count(n)
+int n
+begin
+    int i, k = 0
+    for (i=1; i<=n; i+=1)
+        k += i % 3
+    print (k)
+end
+""",
+    'nested': """procedure nested(n)
+int n
+begin
+    int i, j, m, total = 0
+    m = n / 100
+    for (i=1; i<=100; i+=1) {
+        for (j=1; j<=m; j+=1) {
+            if (i == j)
+                next
+            total = total + i * j
+        }
+    }
+    print (total)
+end
+""",
+    'series': """procedure series(n)
+int n
+begin
+    int i
+    real sum = 0., term
+    for (i=1; i<=n; i+=1) {
+        term = 1. / (i * i)
+        sum = sum + term
+    }
+    print (sum)
+end
+""",
+    'flag': """procedure flag(n)
+int n
+begin
+    int i = 0, odd = 0
+    bool done = no
+    while (!done) {
+        i = i + 1
+        if (mod (i, 2) == 1)
+            odd += 1
+        done = (i >= n)
+    }
+    print (i, odd)
+end
+""",
+}
+
+
+def run(name, script, n, native):
+    """Translate and run script; return (output, seconds)"""
+    pyrafglobals._native_locals = native
+    pycode = cl2py.cl2py(string=script, usecache=False)
+    namespace = {}
+    exec(pycode.code, namespace)
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        t0 = time.perf_counter()
+        namespace[name](n, taskObj=iraf.cl)
+        dt = time.perf_counter() - t0
+    return stdout.getvalue(), dt
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    native_locals = pyrafglobals._native_locals
+    print(f"{'script':<8s} {'Vars':>10s} {'native':>10s} {'speedup':>8s}")
+    try:
+        for name, script in SCRIPTS.items():
+            vout, vtime = run(name, script, n, False)
+            nout, ntime = run(name, script, n, True)
+            if vout != nout:
+                raise RuntimeError(f"{name}: output differs: "
+                                   f"{vout!r} != {nout!r}")
+            print(f"{name:<8s} {vtime:8.3f} s {ntime:8.3f} s "
+                  f"{vtime / ntime:7.1f}x")
+    finally:
+        pyrafglobals._native_locals = native_locals
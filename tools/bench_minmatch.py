@@ -0,0 +1,132 @@
+#! /usr/bin/env python3
+"""bench_minmatch.py: Measure memory and lookups of MinMatchDict indexes
+
+The key index of a MinMatchDict (a sorted key list, minmatch._KeyIndex)
+is compared with the previous index, a dictionary with a list of keys for
+every abbreviation of every key (PrefixIndex below).  Measured are
+a task table with NTASKS names (default 5000): memory and time to build
+the index, and lookups with getall of the full names and their shortest
+unambiguous abbreviations (first and repeated lookups; the sorted key
+index remembers its results) and of ambiguous 2-character abbreviations
+(with many matches); and NDICTS parameter
+dictionaries (default 2000) with the same 40 keys: memory of their
+indexes.
+
+Usage: bench_minmatch.py [ntasks [ndicts]]
+"""
+
+
+import random
+import sys
+import time
+import tracemalloc
+
+from pyraf.tools import minmatch
+
+
+class PrefixIndex:
+    """The previous index: list of full keys for every abbreviation"""
+
+    frozen = False
+
+    def __init__(self, keys, minkeylength):
+        self.minkeylength = minkeylength
+        self.prefixes = {}
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        for i in range(min(self.minkeylength, len(key)), len(key) + 1):
+            self.prefixes.setdefault(key[:i], []).append(key)
+
+    def remove(self, key):
+        for i in range(min(self.minkeylength, len(key)), len(key) + 1):
+            value = self.prefixes[key[:i]]
+            value.remove(key)
+            if not value:
+                del self.prefixes[key[:i]]
+
+    def match(self, key):
+        return self.prefixes.get(key)
+
+
+class PrefixMinMatchDict(minmatch.MinMatchDict):
+
+    def _mmInit(self):
+        self.mmkeys = PrefixIndex(self.data.keys(), self.minkeylength)
+
+
+def tasknames(ntasks):
+    """Return ntasks distinct IRAF-like task names"""
+    random.seed(1)
+    syllables = ['im', 'stat', 'copy', 'del', 'ex', 'pr', 'list', 'hed',
+                 'it', 'set', 'fit', 'sp', 'ec', 'red', 'cal', 'comb',
+                 'ine', 'phot', 'ap', 'all', 'geo', 'xy', 'map', 'tran']
+    names = set()
+    while len(names) < ntasks:
+        names.add(''.join(random.sample(syllables, random.randint(2, 4))))
+    return sorted(names, key=lambda name: random.random())
+
+
+def indexsize(dicts):
+    """Return memory (bytes) allocated by creating the indexes of dicts"""
+    tracemalloc.start()
+    try:
+        for d in dicts:
+            d._mmInit()
+        size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size
+
+
+def abbreviations(names):
+    """Return the shortest unambiguous abbreviation of each name"""
+    snames = sorted(names)
+    abbrevs = []
+    for i, name in enumerate(snames):
+        n = 1
+        for other in snames[max(i - 1, 0):i + 2]:
+            if other != name:
+                while name[:n] == other[:n] and n < len(name):
+                    n += 1
+        abbrevs.append(name[:n])
+    return abbrevs
+
+
+def tasktable(cls, names):
+    """Return (index bytes, build ms, lookup us for full names and
+    abbreviations (first and repeated) and for ambiguous ones)"""
+    d = cls({name: name for name in names})
+    size = indexsize([d])
+    d.mmkeys = None
+    t0 = time.perf_counter()
+    d._mmInit()
+    times = [size, (time.perf_counter() - t0) * 1000]
+    keys = names + abbreviations(names)
+    ambiguous = [name[:2] for name in names]
+    for keys in (keys, keys, ambiguous):
+        t0 = time.perf_counter()
+        for key in keys:
+            d.getall(key)
+        times.append((time.perf_counter() - t0) / len(keys) * 1e6)
+    return times
+
+
+if __name__ == '__main__':
+    ntasks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    ndicts = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    names = tasknames(ntasks)
+    parnames = names[:40]
+    print(f"task table ({ntasks} names), "
+          f"{ndicts} parameter dictionaries (40 names)")
+    print(f"{'':<12s} {'index MB':>9s} {'build ms':>9s} {'first us':>9s} "
+          f"{'repeat us':>10s} {'ambig us':>9s} {'pardicts MB':>12s}")
+    for label, cls in (('prefix dict', PrefixMinMatchDict),
+                       ('sorted keys', minmatch.MinMatchDict)):
+        size, tbuild, tfirst, trepeat, tambig = tasktable(cls, names)
+        dicts = [cls({name: i for name in parnames}) for i in range(ndicts)]
+        psize = indexsize(dicts)
+        print(f"{label:<12s} {size / 2**20:9.2f} {tbuild:9.1f} "
+              f"{tfirst:9.2f} {trepeat:10.2f} {tambig:9.2f} "
+              f"{psize / 2**20:12.2f}")
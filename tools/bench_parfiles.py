@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+"""bench_parfiles.py: Measure reading of IRAF .par files
+
+All .par files below a directory (default $iraf/pkg) are read three
+times: parsed with the regular expression field matcher only (as
+before the fast field splitter), parsed with the fast field splitter
+(irafpar._splitFields), and loaded from a parameter list cache filled
+by an earlier session.  The cache is a temporary database, so the user
+cache is not touched.  No IRAF installation is needed apart from the
+.par files (set PYRAF_NO_IRAF=1 to avoid the warning).
+
+Usage: bench_parfiles.py [directory]
+"""
+
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+from pyraf import clcache, irafpar
+
+
+def readall(files, reader, nrep=3):
+    """Read all files nrep times; return (number of parameters, seconds)
+
+    The time is the best of the nrep runs.
+    """
+    times = []
+    for i in range(nrep):
+        t0 = time.perf_counter()
+        npars = sum(len(reader(fname)) for fname in files)
+        times.append(time.perf_counter() - t0)
+    return npars, min(times)
+
+
+def parse(files, fast):
+    """Parse all files with or without the fast field splitter"""
+    splitFields = irafpar._splitFields
+    try:
+        if not fast:
+            irafpar._splitFields = lambda line: None
+        return readall(files, irafpar._parsepar)
+    finally:
+        irafpar._splitFields = splitFields
+
+
+def load(files):
+    """Load all files from a parameter list cache filled beforehand"""
+    codeCache = clcache.codeCache
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cachefile = os.path.join(tmpdir, 'clcache')
+        try:
+            clcache.codeCache = clcache._CodeCache([cachefile])
+            readall(files, irafpar._readpar, 1)
+            clcache.codeCache.close()
+            # read the cache back in a new session (empty memory cache)
+            clcache.codeCache = clcache._CodeCache([cachefile])
+            return readall(files, irafpar._readpar, 1)
+        finally:
+            clcache.codeCache.close()
+            clcache.codeCache = codeCache
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        dirname = sys.argv[1]
+    else:
+        dirname = os.path.join(os.environ.get('iraf', ''), 'pkg')
+    files = glob.glob(os.path.join(dirname, '**', '*.par'), recursive=True)
+    if not files:
+        sys.exit(f"No .par files found in {dirname}")
+    npars, tregex = parse(files, False)
+    npars, tsplit = parse(files, True)
+    npars, tcache = load(files)
+    print(f"{len(files)} files, {npars} parameters")
+    print(f"{'regex parse':<14s} {tregex:8.3f} s")
+    print(f"{'fast parse':<14s} {tsplit:8.3f} s ({tregex / tsplit:.1f}x)")
+    print(f"{'cached':<14s} {tcache:8.3f} s ({tregex / tcache:.1f}x)")
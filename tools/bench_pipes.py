@@ -0,0 +1,48 @@
+#! /usr/bin/env python3
+"""bench_pipes.py: Compare streamed and buffered CL pipelines
+
+A text file of NLINES lines (default 500000) is sent through the CL
+pipeline "type | match | sort" once with each pipe mode.  Every run is
+done in a fresh Python process, so that the peak resident set size
+reported for it belongs to that pipeline alone.  A working IRAF
+installation is required.
+
+Usage: bench_pipes.py [nlines]
+"""
+
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PIPELINE = 'type {0} | match "7" | sort > dev$null'
+
+
+def run(mode, fname):
+    """Run the pipeline in this process; print wall time and peak RSS"""
+    os.environ['PYRAF_PIPE_MODE'] = mode
+    from pyraf import iraf
+    iraf.setPipeMode(mode)
+    t0 = time.perf_counter()
+    iraf.clExecute(PIPELINE.format(fname))
+    dt = time.perf_counter() - t0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<8s} {dt:8.2f} s {rss:9.1f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        run(sys.argv[1], sys.argv[2])
+        sys.exit()
+    nlines = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as fh:
+        for i in range(nlines):
+            fh.write(f"{i:10d} some text to fill up the line a bit\n")
+        fh.flush()
+        print(f"{'mode':<8s} {'time':>10s} {'peak RSS':>12s}")
+        for mode in ('buffer', 'stream'):
+            subprocess.run([sys.executable, __file__, mode, fh.name],
+                           check=True)
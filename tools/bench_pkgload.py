@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+"""bench_pkgload.py: Measure loading of packages with many tasks
+
+Packages the size of noao, imred and stsdas (NTASKS tasks each, default
+40, 150 and 600; a mix of executable, CL, foreign and pset tasks with
+parameter files) are loaded with the task names added to the iraf
+module through the iraf module proxy (as before, where every new name
+was looked up in the task lists) and directly.  The CL script of the
+package is compiled before the time is taken.  Also reported is the
+number of tasks that were initialized (paths and parameter files) by
+loading, which should be none: tasks are initialized when they are
+first used.  The packages and the cache are in a temporary directory,
+so the user cache is not touched.  No IRAF installation is needed (set
+PYRAF_NO_IRAF=1 to avoid the warning).
+
+Usage: bench_pkgload.py [ntasks ...]
+"""
+
+
+import os
+import sys
+import tempfile
+import time
+
+from pyraf import clcache, iraf, irafnames
+from pyraf.tools import irafglobals
+
+
+class ProxyNameClean(irafnames.IrafNameClean):
+    """The previous strategy: add names through the iraf module proxy"""
+
+    def addTask(self, task):
+        name = task.getName()
+        if hasattr(iraf, name):
+            p = getattr(iraf, name)
+        else:
+            p = None
+        if (p is None) or isinstance(p, irafglobals.IrafTask):
+            setattr(iraf, name, task)
+
+
+def makepkg(dirname, pkgname, ntasks):
+    """Create the package pkgname with ntasks tasks in dirname"""
+    lines = [f'package {pkgname}\n']
+    for i in range(ntasks):
+        name = f'{pkgname}t{i}'
+        kind = i % 4
+        if kind == 0:
+            lines.append(f'task {name} = "{pkgname}$x_{pkgname}.e"\n')
+            pars = ''.join(f'p{j},r,h,1.5,,,"P{j}"\n' for j in range(20))
+        elif kind == 1:
+            lines.append(f'task {name} = "{pkgname}${name}.cl"\n')
+            with open(os.path.join(dirname, f'{name}.cl'), 'w') as fh:
+                fh.write(f'procedure {name}(input)\nstring input\n'
+                         'begin\n  print(input)\nend\n')
+            continue
+        elif kind == 2:
+            lines.append(f'task ${name} = "$foreign"\n')
+            continue
+        else:
+            lines.append(f'task {name} = "{pkgname}${name}.par"\n')
+            pars = ''.join(f'q{j},i,h,{j},,,"Q{j}"\n' for j in range(10))
+        with open(os.path.join(dirname, f'{name}.par'), 'w') as fh:
+            fh.write('input,s,a,"",,,"Input"\n' + pars + 'mode,s,h,"ql"\n')
+    lines.append('clbye()\n')
+    with open(os.path.join(dirname, f'{pkgname}.cl'), 'w') as fh:
+        fh.writelines(lines)
+    iraf.set(**{pkgname: os.path.join(dirname, '')})
+    iraf.task(**{f'{pkgname}.pkg': f'{pkgname}${pkgname}.cl'})
+
+
+def load(pkgname):
+    """Load package; return (seconds, number of initialized tasks)"""
+    pkg = iraf.getPkg(pkgname)
+    # compile the package script beforehand
+    pkg.initTask(force=1)
+    t0 = time.perf_counter()
+    pkg.run(_doprint=0, _hush=1)
+    t = time.perf_counter() - t0
+    tasks = [iraf.getTask(f'{pkgname}.{name}') for name in pkg._tasks]
+    return t, sum(task._currentParList is not None for task in tasks)
+
+
+def run(sizes):
+    """Load packages of the given sizes with both strategies
+
+    Returns a list of (ntasks, [(seconds, initialized)] * 2) tuples.
+    """
+    codeCache = clcache.codeCache
+    strategy = irafnames.strategy
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            clcache.codeCache = clcache._CodeCache(
+                [os.path.join(tmpdir, 'clcache')])
+            for ntasks in sizes:
+                times = []
+                for mode, names in (('proxy', ProxyNameClean()),
+                                    ('direct', strategy)):
+                    pkgname = f'{mode}{ntasks}'
+                    makepkg(tmpdir, pkgname, ntasks)
+                    try:
+                        irafnames.strategy = names
+                        times.append(load(pkgname))
+                    finally:
+                        irafnames.strategy = strategy
+                results.append((ntasks, times))
+            clcache.codeCache.close()
+        finally:
+            clcache.codeCache = codeCache
+    return results
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [40, 150, 600]
+    results = run(sizes)
+    print(f"{'tasks':>6s} {'proxy ms':>9s} {'direct ms':>10s} "
+          f"{'speedup':>8s} {'initialized':>12s}")
+    for ntasks, ((tproxy, nproxy), (tdirect, ndirect)) in results:
+        print(f"{ntasks:6d} {tproxy * 1000:9.1f} {tdirect * 1000:10.1f} "
+              f"{tproxy / tdirect:7.1f}x {ndirect:12d}")
@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+"""bench_scan.py: Measure fscan loops in translated CL procedures
+
+A catalog of NLINES lines (default 200000) is read by a CL procedure
+with a "while (fscan(list, ...) != EOF)" loop.  The procedure is
+translated with the specialized scan code (iraf.fscanPars) and with the
+generic runtime path (iraf.fscan, which assigns the variables by name);
+the output of both is compared and the run times are reported.  No IRAF
+installation is needed (set PYRAF_NO_IRAF=1 to avoid the warning).
+
+Usage: bench_scan.py [nlines]
+"""
+
+
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+from pyraf import cl2py, iraf
+
+SCRIPT = """procedure catscan(list)
+struct *list
+begin
+    int id, n = 0
+    real ra, dec, sum = 0.
+    string name
+    struct rest
+    while (fscan(list, id, ra, dec, name, rest) != EOF) {
+        n += 1
+        sum = sum + ra * dec
+    }
+    print (n, sum, id, name, rest)
+end
+"""
+
+
+def run(fname, specialized):
+    """Translate and run the procedure; return (output, seconds)"""
+    scanTargets = cl2py.Tree2Python.scanTargets
+    if not specialized:
+        # translate all scan calls with the generic runtime path
+        cl2py.Tree2Python.scanTargets = lambda self, name, node: None
+    try:
+        pycode = cl2py.cl2py(string=SCRIPT, usecache=False)
+    finally:
+        cl2py.Tree2Python.scanTargets = scanTargets
+    namespace = {}
+    exec(pycode.code, namespace)
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        t0 = time.perf_counter()
+        namespace['catscan'](fname, taskObj=iraf.cl)
+        dt = time.perf_counter() - t0
+    return stdout.getvalue(), dt
+
+
+if __name__ == '__main__':
+    nlines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.NamedTemporaryFile('w', suffix='.dat') as fh:
+        for i in range(nlines):
+            fh.write(f"{i} {i * 0.001:.4f} {-i * 0.0005:.4f} "
+                     f"star{i} V mag {i % 20}\n")
+        fh.flush()
+        gout, gtime = run(fh.name, False)
+        sout, stime = run(fh.name, True)
+    if gout != sout:
+        raise RuntimeError(f"output differs: {gout!r} != {sout!r}")
+    print(f"{nlines} lines: fscan {gtime:.2f} s, "
+          f"fscanPars {stime:.2f} s ({gtime / stime:.1f}x)")
@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+"""bench_specialpar.py: Measure the search for special-use .par files
+
+A directory with NFILES .par files (default 10000, one in ten with a
+TASKMETA line) is searched for special-use parameter files.  The time of
+the previous search (glob and read every file completely) is compared
+with the indexed search (irafpar._updateSpecialParFileDict) on a new
+directory, on the same directory again (at once, and after the files
+are due to be checked again), and in a "new session" that has only the
+index kept in the cache.  The cache is a temporary database, so
+the user cache is not touched.  No IRAF installation is needed (set
+PYRAF_NO_IRAF=1 to avoid the warning).
+
+Usage: bench_specialpar.py [nfiles]
+"""
+
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+from pyraf import clcache, filecache, irafpar
+
+
+def makefiles(dirname, nfiles):
+    """Create nfiles .par files in dirname"""
+    for i in range(nfiles):
+        with open(os.path.join(dirname, f'file{i:05d}.par'), 'w') as fh:
+            if i % 10 == 0:
+                fh.write(f'# TASKMETA: task=task{i} package=pkg\n')
+            for j in range(20):
+                fh.write(f'par{j},s,h,"value {j}",,,"Parameter {j}"\n')
+            fh.write('mode,s,h,"al"\n')
+
+
+def globall(dirname):
+    """Find the special-use files as before, reading every file"""
+    found = {}
+    for supfname in glob.glob(dirname + "/*.par"):
+        with open(supfname, errors="ignore") as supfile:
+            buf = supfile.readlines()
+        for line in buf:
+            mo = irafpar._re_taskmeta.match(line)
+            if mo:
+                found.setdefault((mo.group(1), mo.group(2)),
+                                 []).append(supfname)
+                break
+    return found
+
+
+def search(dirname):
+    """Search dirname with the index; return (found, seconds)"""
+    irafpar._specialUseParFileDict = {}
+    t0 = time.perf_counter()
+    irafpar._updateSpecialParFileDict(dirname)
+    return irafpar._specialUseParFileDict, time.perf_counter() - t0
+
+
+def indexed(dirname, cachefile):
+    """Search with a new index, again, checking again, in a new session
+
+    Returns a list of (found, seconds) tuples.
+    """
+    codeCache = clcache.codeCache
+    try:
+        clcache.codeCache = clcache._CodeCache([cachefile])
+        results = [search(dirname), search(dirname)]
+        interval = filecache.statCache.interval
+        try:
+            filecache.statCache.interval = 0
+            results.append(search(dirname))
+        finally:
+            filecache.statCache.interval = interval
+        # a new session has only the index kept in the cache
+        irafpar._specialParIndex.clear()
+        clcache.codeCache.close()
+        clcache.codeCache = clcache._CodeCache([cachefile])
+        results.append(search(dirname))
+        clcache.codeCache.close()
+    finally:
+        clcache.codeCache = codeCache
+    return results
+
+
+if __name__ == '__main__':
+    nfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dirname = os.path.join(tmpdir, 'pars')
+        os.mkdir(dirname)
+        makefiles(dirname, nfiles)
+        t0 = time.perf_counter()
+        expected = globall(dirname)
+        tglob = time.perf_counter() - t0
+        results = indexed(dirname, os.path.join(tmpdir, 'clcache'))
+    print(f"{nfiles} files, {len(expected)} special-use files")
+    print(f"{'glob and read':<14s} {tglob * 1000:8.1f} ms")
+    for label, (found, t) in zip(('new index', 'repeated', 'checked again',
+                                  'new session'), results):
+        if found != expected:
+            raise RuntimeError(f"{label}: indexed search found other files")
+        print(f"{label:<14s} {t * 1000:8.1f} ms ({tglob / t:.1f}x)")
@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+"""bench_startup.py: Measure PyRAF startup with and without the snapshot
+
+python -c "from pyraf import iraf" is run NREP times (default 5) in new
+processes: with the startup snapshot disabled (clpackage and login.cl
+are run as before), with a snapshot that is written by the run (cold)
+and with a valid snapshot (warm).  Reported is the best wall time of the
+command and of iraf.Init alone.  The snapshot is a temporary file, so
+the user cache is not touched.
+
+Usage: bench_startup.py [nrep]
+"""
+
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Init alone: pyraf does not initialize itself if started as "-m"
+INIT = ("import sys, time; sys.argv[0] = '-m'; "
+        "from pyraf import iraf; t0 = time.perf_counter(); "
+        "iraf.Init(doprint=0, hush=1); print(time.perf_counter() - t0)")
+
+
+def run(code, snapshot, cold):
+    """Run code in a new process; return (wall time, last output line)"""
+    if snapshot is None:
+        env = dict(os.environ, PYRAF_STARTUP_SNAPSHOT='disable')
+    else:
+        if cold and os.path.exists(snapshot):
+            os.remove(snapshot)
+        env = dict(os.environ, PYRAF_STARTUP_SNAPSHOT=snapshot)
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code], env=env,
+                          capture_output=True, text=True, check=True)
+    return time.perf_counter() - t0, proc.stdout.splitlines()[-1:]
+
+
+def startup(snapshot, cold, nrep):
+    """Return best (command seconds, Init seconds) of nrep runs"""
+    if not cold:
+        run('from pyraf import iraf', snapshot, True)
+    tcmd = min(run('from pyraf import iraf', snapshot, cold)[0]
+               for i in range(nrep))
+    tinit = min(float(run(INIT, snapshot, cold)[1][0]) for i in range(nrep))
+    return tcmd, tinit
+
+
+if __name__ == '__main__':
+    nrep = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot = os.path.join(tmpdir, 'startup.pickle')
+        results = [('no snapshot', startup(None, True, nrep)),
+                   ('cold', startup(snapshot, True, nrep)),
+                   ('warm', startup(snapshot, False, nrep))]
+    print(f"{'':<12s} {'import s':>9s} {'Init ms':>9s}")
+    for label, (tcmd, tinit) in results:
+        print(f"{label:<12s} {tcmd:9.3f} {tinit * 1000:9.1f}")
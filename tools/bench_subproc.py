@@ -0,0 +1,44 @@
+#! /usr/bin/env python3
+"""bench_subproc.py: Measure the read throughput of subproc.Subprocess
+
+A child process writes MBYTES megabytes (default 100) to its stdout,
+which are read back in IRAF pipe record sized pieces and also as a
+single large message.  The rates are reported for several chunk sizes
+of the read buffer.
+
+Usage: bench_subproc.py [mbytes]
+"""
+
+
+import sys
+import time
+
+from pyraf import subproc
+
+
+def bench(nbytes, chunksize, recsize):
+    """Read nbytes from a child in pieces of recsize; return MB/s"""
+    cmd = ['head', '-c', str(nbytes), '/dev/zero']
+    process = subproc.Subprocess(cmd, maxChunkSize=chunksize)
+    t0 = time.perf_counter()
+    nread = 0
+    while nread < nbytes:
+        got = process.read(min(recsize, nbytes - nread))
+        if not got:
+            break
+        nread = nread + len(got)
+    dt = time.perf_counter() - t0
+    process.wait(1)
+    if nread != nbytes:
+        raise RuntimeError(f"read {nread} bytes, expected {nbytes}")
+    return nbytes / dt / 2**20
+
+
+if __name__ == '__main__':
+    mbytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    nbytes = mbytes * 2**20
+    print(f"{'chunk':>8s} {'4100-byte reads':>16s} {'single read':>12s}")
+    for chunksize in (1024, 16384, subproc.DEFAULT_CHUNKSIZE, 262144):
+        rec = bench(nbytes, chunksize, 4100)
+        big = bench(nbytes, chunksize, nbytes)
+        print(f"{chunksize:8d} {rec:11.1f} MB/s {big:7.1f} MB/s")
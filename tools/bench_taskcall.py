@@ -0,0 +1,76 @@
+#! /usr/bin/env python3
+"""bench_taskcall.py: Measure the per-call overhead of task parameter lists
+
+A no-op Python task with NPARS hidden parameters (default 40) is called
+repeatedly, with the running parameter list of each call built as a
+copy-on-write overlay of the current list (IrafParList.overlay) and as
+a deep copy of it.  The parameter setup and merge alone (setParList,
+_updateParList), which is what an IRAF executable task pays around its
+process communication, is timed too.  No IRAF installation is needed
+(set PYRAF_NO_IRAF=1 to avoid the warning).
+
+Usage: bench_taskcall.py [npars [ncalls]]
+"""
+
+
+import copy
+import os
+import sys
+import tempfile
+import time
+
+from pyraf import iraf, irafpar
+
+
+def noop(*args):
+    pass
+
+
+def maketask(dirname, npars):
+    """Create the no-op task with npars hidden parameters"""
+    parfile = os.path.join(dirname, 'noop.par')
+    with open(parfile, 'w') as fh:
+        fh.write('input,s,a,"",,,"Input"\n')
+        for i in range(npars):
+            ptype, value = (('s', 'x'), ('i', '1'), ('r', '1.5'),
+                            ('b', 'yes'))[i % 4]
+            fh.write(f'par{i},{ptype},h,{value},,,"Parameter {i}"\n')
+        fh.write('mode,s,h,"ql"\n')
+    return iraf.IrafTaskFactory(taskname='noop', value=parfile,
+                                pkgname='clpackage', function=noop)
+
+
+def timecalls(task, ncalls):
+    """Return the time per call in microseconds (call, setup and merge)"""
+    t0 = time.perf_counter()
+    for i in range(ncalls):
+        task('image.fits')
+    tcall = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(ncalls):
+        task.setParList('image.fits', _setMode=1)
+        task._updateParList()
+        task._deleteRunningParList()
+    tsetup = time.perf_counter() - t0
+    return tcall / ncalls * 1e6, tsetup / ncalls * 1e6
+
+
+if __name__ == '__main__':
+    npars = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    ncalls = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as dirname:
+        task = maketask(dirname, npars)
+        task('image.fits')
+        overlay = irafpar.IrafParList.overlay
+        try:
+            irafpar.IrafParList.overlay = copy.deepcopy
+            dcall, dsetup = timecalls(task, ncalls)
+        finally:
+            irafpar.IrafParList.overlay = overlay
+        ocall, osetup = timecalls(task, ncalls)
+    print(f"{npars} parameters, {ncalls} calls (us per call)")
+    print(f"{'':<14s} {'deepcopy':>10s} {'overlay':>10s} {'speedup':>8s}")
+    print(f"{'task call':<14s} {dcall:10.1f} {ocall:10.1f} "
+          f"{dcall / ocall:7.1f}x")
+    print(f"{'setup+merge':<14s} {dsetup:10.1f} {osetup:10.1f} "
+          f"{dsetup / osetup:7.1f}x")